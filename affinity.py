@@ -0,0 +1,66 @@
+# %%
+##############
+## AFFINITY ##
+##############
+# Expertise match between reviewers and submissions for the objective. Submission titles and abstracts and
+# reviewer interests or past submissions become sparse TF-IDF vectors over one shared vocabulary, and only the
+# pairs that can be assigned are kept, from a blocked product of the two sparse matrices.
+import re
+
+import numpy as np
+from scipy.sparse import csr_array
+
+# Words with at least one letter, so "3d" is a token but "2024" is not
+TOKEN = re.compile(r"[a-z0-9]*[a-z][a-z0-9]*")
+
+STOP_WORDS = frozenset("""
+    about above after again all also and any are because been before being between both but can could did does
+    doing down during each few for from further had has have having here how into its itself just more most new
+    not now off once only other our out over own same should some such than that the their them then there these
+    they this those through too under until use used using very was way well were what when where which while who
+    why will with would you your
+    """.split())
+
+
+def tokenize(text):
+    # Lowercase words of at least two characters that are not stop words
+    return [token for token in TOKEN.findall((text or "").lower()) if len(token) > 1 and token not in STOP_WORDS]
+
+
+def tfidf(*corpora):
+    # One L2-normalized sparse TF-IDF matrix per corpus (a list of texts), all over the vocabulary of every corpus,
+    # with sublinear term frequencies and smoothed inverse document frequencies
+    documents = [tokenize(text) for corpus in corpora for text in corpus]
+    lengths = np.fromiter((len(tokens) for tokens in documents), dtype=np.intp, count=len(documents))
+    vocabulary, terms = np.unique(
+        np.array([token for tokens in documents for token in tokens], dtype=str), return_inverse=True
+    )
+    rows = np.repeat(np.arange(len(documents)), lengths)
+
+    # Duplicate (document, term) entries are summed into term counts
+    counts = csr_array((np.ones(rows.size), (rows, terms)), shape=(len(documents), len(vocabulary)))
+    counts.sum_duplicates()
+    document_frequency = np.bincount(counts.indices, minlength=len(vocabulary))
+    idf = np.log((1 + len(documents)) / (1 + document_frequency)) + 1
+
+    counts.data = (1 + np.log(counts.data)) * idf[counts.indices]
+    entry_rows = np.repeat(np.arange(len(documents)), np.diff(counts.indptr))
+    norms = np.sqrt(np.bincount(entry_rows, weights=counts.data**2, minlength=len(documents)))
+    counts.data /= norms[entry_rows]
+
+    splits = np.cumsum([len(corpus) for corpus in corpora])
+    return [counts[start:stop] for start, stop in zip(np.r_[0, splits[:-1]], splits)]
+
+
+def affinity_matrix(reviewer_texts, submission_texts, ub, block_size=1024):
+    # (n_reviewers, n_submissions) matrix of TF-IDF cosine similarities in [0, 1], zero where ub is zero.
+    # The sparse product only has entries for pairs that share a term, and it is formed for a block of
+    # reviewers at a time, so memory stays at block_size dense rows.
+    reviewer_vectors, submission_vectors = tfidf(reviewer_texts, submission_texts)
+    submission_vectors = submission_vectors.T.tocsc()
+    affinity = np.zeros(ub.shape)
+    for start in range(0, ub.shape[0], block_size):
+        stop = start + block_size
+        scores = (reviewer_vectors[start:stop] @ submission_vectors).toarray()
+        affinity[start:stop] = np.where(ub[start:stop] > 0, np.clip(scores, 0.0, 1.0), 0.0)
+    return affinity
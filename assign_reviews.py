@@ -4,80 +4,180 @@
 ####################
 # Imports
 import json
+import resource
+import sys
+import time
+import tracemalloc
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import contextmanager
+from datetime import UTC, datetime
+from functools import partial
+from itertools import chain
 from pathlib import Path
 
 import numpy as np
-from scipy.optimize import Bounds, LinearConstraint, milp
+import pyarrow as pa
+import pyarrow.compute as pc
+from scipy.optimize import Bounds, LinearConstraint, linprog, milp
+from scipy.sparse import csr_array, vstack
+from scipy.sparse.csgraph import connected_components, maximum_flow
+
+from affinity import affinity_matrix
+from entities import entity_bounds, in_track, intern_entities, is_tutorial, submission_costs, track_matrix
+from min_cost_flow import min_cost_flow
+from model_cache import input_fingerprint, load_bounds, save_bounds
+from model_size import choose_model, count_pairs, describe_configuration, estimate_model, find_configuration
 
 DEBUG = True
 
+ENGINES = ("milp", "lp", "flow", "greedy", "auto")
 
-def create_objective_fun(df_reviewers, df_submissions, tutorial_coeff):
-    reviewers = df_reviewers.to_dict("records")
-    submissions = df_submissions.to_dict("records")
 
-    n_reviewers = len(reviewers)
-    n_submissions = len(submissions)
+def create_objective_fun(df_reviewers, df_submissions, tutorial_coeff):
+    # Works on pandas frames and Arrow tables alike
+    n_reviewers = len(df_reviewers)
 
     # Maximize the total number of reviews
-    objective_fun = -np.ones((n_reviewers, n_submissions))
-
     # Make tutorials more expensive to review
-    for n, reviewer in enumerate(reviewers):
-        objective_fun[n][df_submissions.track == "TUT"] *= tutorial_coeff
-
-    objective_fun = objective_fun.flatten()
+    costs = np.where(np.asarray(df_submissions["track"]) == "TUT", -tutorial_coeff, -1.0)
+    objective_fun = np.tile(costs, n_reviewers)
 
     return objective_fun
 
 
-def create_lb_ub(reviewers, submissions, assign_tutorials_to_anyone):
-    n_reviewers = len(reviewers)
-    n_submissions = len(submissions)
-    # both zero if reviewer cannot review submission, both one if reviewer is assigned to submission
-    lb = np.zeros((n_reviewers, n_submissions))  # lower bound
-    ub = np.zeros((n_reviewers, n_submissions))  # upper bound
+def _list_coordinates(records, column, index):
+    # Flatten a list-valued column into (row, index[value]) coordinates, dropping values missing from index
+    lengths = np.fromiter((len(record[column]) for record in records), dtype=np.intp, count=len(records))
+    rows = np.repeat(np.arange(len(records)), lengths)
+    values = chain.from_iterable(record[column] for record in records)
+    cols = np.fromiter((index.get(value, -1) for value in values), dtype=np.intp, count=rows.size)
+    found = cols >= 0
+    return rows[found], cols[found]
+
+
+def _create_lb_ub(
+    n_reviewers, submission_tracks, tutorial_track, reviewer_tracks, conflicts, assigned, assign_tutorials_to_anyone
+):
+    # submission_tracks holds the track index of every submission, the other arguments are
+    # (reviewer_idx, track_idx) and (reviewer_idx, submission_idx) coordinate pairs
+    n_tracks = submission_tracks.max(initial=-1) + 1
+
+    in_track = np.zeros((n_reviewers, n_tracks), dtype=bool)
+    in_track[reviewer_tracks] = True
 
-    # Establish lower and upper bounds
     # reviewer cannot be assigned out of domain
+    ub = in_track[:, submission_tracks]
+    # everyone can be assigned a tutorial because we're short on tutorial reviewers
+    if assign_tutorials_to_anyone and tutorial_track is not None:
+        ub[:, submission_tracks == tutorial_track] = True
+    # reviewer cannot be assigned a submission they have a conflict with
+    ub[conflicts] = False
+
     # reviewer must be re-assigned previous assignments
-    for i, reviewer in enumerate(reviewers):
-        for j, submission in enumerate(submissions):
-            # each variable is assignment of a submission j to a reviewer i
-            # everyone can be assigned a tutorial because we're short on tutorial reviewers
-            in_domain = submission["track"] in reviewer["tracks"] or (
-                assign_tutorials_to_anyone and submission["track"] == "TUT"
-            )
-            no_conflict = submission["submission_id"] not in reviewer["conflicts_submission_ids"]
-            ub[i, j] = in_domain and no_conflict
+    lb = np.zeros((n_reviewers, len(submission_tracks)), dtype=bool)
+    lb[assigned] = True
+
+    return lb.astype(float), ub.astype(float)
 
-            already_assigned = submission["submission_id"] in reviewer["assigned_submission_ids"]
-            lb[i, j] = already_assigned
 
-    return lb, ub
+def create_lb_ub(reviewers, submissions, assign_tutorials_to_anyone):
+    # both zero if reviewer cannot review submission, both one if reviewer is assigned to submission
+    # Map submission and track IDs to integer indices once so the bounds can be built with fancy indexing
+    submission_index = {submission["submission_id"]: j for j, submission in enumerate(submissions)}
+    track_index = {}
+    submission_tracks = np.fromiter(
+        (track_index.setdefault(submission["track"], len(track_index)) for submission in submissions),
+        dtype=np.intp,
+        count=len(submissions),
+    )
+
+    return _create_lb_ub(
+        len(reviewers),
+        submission_tracks,
+        track_index.get("TUT"),
+        _list_coordinates(reviewers, "tracks", track_index),
+        _list_coordinates(reviewers, "conflicts_submission_ids", submission_index),
+        _list_coordinates(reviewers, "assigned_submission_ids", submission_index),
+        assign_tutorials_to_anyone,
+    )
+
+
+def load_tables(con, reviewers_table="reviewers_to_assign", submissions_table="submissions_to_assign"):
+    # Fetch the solver inputs from DuckDB as Arrow tables, where list columns stay flat offsets/values buffers
+    # instead of becoming pandas object columns. Missing assignment columns are added as empty lists.
+    tables = []
+    for table_name, assigned_column in [
+        (reviewers_table, "assigned_submission_ids"),
+        (submissions_table, "assigned_reviewer_ids"),
+    ]:
+        table = con.sql(f"table {table_name}").to_arrow_table()
+        if assigned_column not in table.column_names:
+            empty = pa.ListArray.from_arrays(np.zeros(table.num_rows + 1, np.int32), pa.array([], pa.string()))
+            table = table.append_column(assigned_column, empty)
+        tables.append(table)
+    return tuple(tables)
+
+
+def load_feasible_pairs(con):
+    # COO arrays of the feasible_pairs table built by preprocessing.create_feasible_pairs, plus the reviewer and
+    # submission IDs in the order of reviewer_idx and submission_idx
+    pairs = con.sql("select * from feasible_pairs").fetchnumpy()
+    for entity in ["reviewer", "submission"]:
+        query = f"select {entity}_id from {entity}_index order by {entity}_idx"
+        pairs[f"{entity}_ids"] = con.sql(query).fetchnumpy()[f"{entity}_id"]
+    return pairs
+
+
+def matrices_from_pairs(pairs, reviewer_ids, submission_ids):
+    # objective_fun, lb and ub as (n_reviewers, n_submissions) matrices in the order of reviewer_ids and
+    # submission_ids, from the COO arrays of load_feasible_pairs. Every engine reads dense matrices, so the pairs
+    # are scattered into them here and the solvers never see the COO arrays.
+    reviewer_positions = pc.index_in(pa.array(pairs["reviewer_ids"]), value_set=pa.array(reviewer_ids))
+    submission_positions = pc.index_in(pa.array(pairs["submission_ids"]), value_set=pa.array(submission_ids))
+    if reviewer_positions.null_count or submission_positions.null_count:
+        raise ValueError("feasible_pairs was built for other reviewers or submissions")
+    rows = reviewer_positions.to_numpy()[pairs["reviewer_idx"]]
+    cols = submission_positions.to_numpy()[pairs["submission_idx"]]
+
+    shape = (len(reviewer_ids), len(submission_ids))
+    objective_fun = np.zeros(shape)
+    objective_fun[rows, cols] = -np.asarray(pairs["weight"], dtype=float)
+    lb = np.zeros(shape)
+    lb[rows, cols] = pairs["is_preassigned"]
+    ub = np.zeros(shape)
+    ub[rows, cols] = pairs["is_eligible"]
+    return objective_fun, lb, ub
 
 
-def create_constraints(reviewers, submissions, min_reviews, max_reviews, min_reviewers, max_reviewers):
+def create_lb_ub_arrow(reviewers, submissions, assign_tutorials_to_anyone):
+    # Same bounds as create_lb_ub, built from the Arrow tables returned by load_tables
+    return entity_bounds(intern_entities(reviewers, submissions), assign_tutorials_to_anyone)
+
+
+def create_constraints(reviewers, submissions, min_reviews, max_reviews, min_reviewers, max_reviewers, pairs=None):
     n_reviewers = len(reviewers)
     n_submissions = len(submissions)
 
-    submission_constraints = np.zeros(
-        (n_submissions, n_reviewers, n_submissions)
-    )  # constraints on reviews per submission
-    reviewer_constraints = np.zeros(
-        (n_reviewers, n_reviewers, n_submissions)
-    )  # constraints on submissions per reviewer. 1 in all the places where reviewer could be assigned
+    # Variable k is the assignment of submission pairs[1][k] to reviewer pairs[0][k]. By default every
+    # reviewer x submission pair is a variable, with k = i * n_submissions + j.
+    # Every variable shows up in exactly one reviewer row and one submission row, so both
+    # constraint matrices are built directly in sparse form with one nonzero per variable
+    if pairs is None:
+        reviewer_idx = np.repeat(np.arange(n_reviewers), n_submissions)
+        submission_idx = np.tile(np.arange(n_submissions), n_reviewers)
+    else:
+        reviewer_idx, submission_idx = pairs
+    n_variables = len(reviewer_idx)
+    variable_idx = np.arange(n_variables)
+    ones = np.ones(n_variables)
 
     # Constraints
     # each reviewer assigned < max reviews
-    for i, reviewer in enumerate(reviewers):
-        reviewer_constraints[i, i, :] = 1
-    reviewer_constraints = reviewer_constraints.reshape(n_reviewers, -1)
+    reviewer_constraints = csr_array((ones, (reviewer_idx, variable_idx)), shape=(n_reviewers, n_variables))
 
     # each paper assigned to 4 reviewers
-    for j, _ in enumerate(submissions):
-        submission_constraints[j, :, j] = 1
-    submission_constraints = submission_constraints.reshape(n_submissions, -1)
+    submission_constraints = csr_array((ones, (submission_idx, variable_idx)), shape=(n_submissions, n_variables))
 
     submission_per_reviewer_constraint = LinearConstraint(reviewer_constraints, min_reviews, max_reviews)
     reviews_per_paper_constraint = LinearConstraint(submission_constraints, min_reviewers, max_reviewers)
@@ -86,6 +186,77 @@ def create_constraints(reviewers, submissions, min_reviews, max_reviews, min_rev
     return constraints
 
 
+def _peak_rss():
+    # Peak resident memory of the process in bytes, ru_maxrss is in KiB on Linux and in bytes on macOS
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * (1 if sys.platform == "darwin" else 1024)
+
+
+@contextmanager
+def _phase(report, name, trace=True):
+    # Record the wall-clock time and peak traced memory of a phase in report["phases"]. HiGHS allocates outside
+    # the Python allocator and tracing slows its wrapper down several times, so solver phases run with
+    # trace=False and record how much the peak resident memory of the process grew instead.
+    if report is None:
+        yield
+        return
+    tracing = tracemalloc.is_tracing()
+    if not trace:
+        if tracing:
+            tracemalloc.stop()
+        memory = _peak_rss()
+    elif tracing:
+        tracemalloc.reset_peak()
+    else:
+        tracemalloc.start()
+    if trace:
+        memory, _ = tracemalloc.get_traced_memory()
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        seconds = time.perf_counter() - start
+        if trace:
+            _, peak = tracemalloc.get_traced_memory()
+            if not tracing:
+                tracemalloc.stop()
+        else:
+            peak = _peak_rss()
+            if tracing:
+                tracemalloc.start()
+        report.setdefault("phases", {})[name] = {"seconds": seconds, "peak_mib": (peak - memory) / 2**20}
+
+
+def _write_report(report, output_dir):
+    # Append the run report as one JSON line, so runs can be compared across review cycles
+    with open(output_dir / "solver-report.jsonl", "a") as fp:
+        fp.write(json.dumps(report, default=lambda value: value.tolist()) + "\n")
+
+
+def _plan_model(estimate, report, engine, feasible_pairs_only, decompose, memory_limit=None, time_limit=None):
+    # With engine="auto", the fastest engine and representation that fits in memory_limit bytes (see
+    # model_size.py), otherwise the given ones. The plan is printed for "auto" and whenever a warning applies.
+    if engine == "auto":
+        configuration = choose_model(estimate, memory_limit)
+        engine = configuration["engine"]
+        feasible_pairs_only = configuration["feasible_pairs_only"]
+        decompose = configuration["decompose"]
+        print(describe_configuration(estimate, configuration, memory_limit, time_limit))
+    else:
+        configuration = find_configuration(estimate, engine, feasible_pairs_only, decompose)
+        message = configuration and describe_configuration(estimate, configuration, memory_limit, time_limit)
+        if message and "warning" in message:
+            print(message)
+    if report is not None:
+        report.update(
+            engine=engine,
+            feasible_pairs_only=feasible_pairs_only,
+            decompose=decompose,
+            model_estimate=estimate,
+            model_choice=configuration,
+        )
+    return engine, feasible_pairs_only, decompose
+
+
 def solve_milp(
     df_reviewers,
     df_submissions,
@@ -95,66 +266,932 @@ def solve_milp(
     max_reviewers,
     tutorial_coeff,
     assign_tutorials_to_anyone,
+    feasible_pairs_only=False,
+    engine="milp",
+    decompose=False,
+    n_jobs=None,
+    memory_limit=None,
+    time_limit=None,
+    mip_rel_gap=None,
+    presolve=True,
+    polish=False,
+    screen=True,
+    cache_dir=None,
+    texts=None,
+    affinity_weight=0.5,
+    feasible_pairs=None,
+    return_report=False,
+    output_dir=None,
 ):
-    reviewers = df_reviewers.to_dict("records")
-    submissions = df_submissions.to_dict("records")
+    # With return_report, returns (solution, report) where report holds the time and memory per phase,
+    # the model size and the solver outcome. With output_dir, the report is also appended to
+    # output_dir / "solver-report.jsonl".
+    # time_limit (seconds), mip_rel_gap and presolve are passed on to HiGHS; when the time limit is hit
+    # the best feasible assignment found so far is returned and the limit shows up in the report status.
+    # With decompose, time_limit is for all components together, each one gets what is left when it starts.
+    # engine="greedy" returns a heuristic assignment in milliseconds, with polish=True it also bounds a MILP solve.
+    # engine="lp" solves the LP relaxation, which is integral for this model, and only falls back to the MILP if not.
+    # If the LP itself fails (infeasible, unbounded or out of time) None is returned with report["lp_status"].
+    # engine="auto" estimates the model size first and picks the fastest engine, representation and decomposition
+    # whose projected peak memory fits in memory_limit bytes (default: the physical memory), see model_size.py.
+    # With screen, degree bounds that can't all be met are rejected before solving and the submissions,
+    # tracks and reviewers that cause it are printed and added to the report.
+    # With cache_dir, the bounds are cached on disk by a fingerprint of the inputs (see model_cache.py), so
+    # re-runs that only change tutorial_coeff or the limits skip rebuilding them.
+    # texts is an optional (reviewer texts, submission texts) pair of lists in the order of the frames. The value
+    # of a review is then scaled by 1 + affinity_weight * the TF-IDF similarity of the two texts (see affinity.py).
+    # feasible_pairs from load_feasible_pairs replaces the objective and bounds built here, including tutorial_coeff
+    # and assign_tutorials_to_anyone, by the ones DuckDB built. The bounds cache is not used then, report["cache"]
+    # is "unused".
+    if engine not in ENGINES:
+        raise ValueError(f"Unknown engine {engine!r}, expected one of {ENGINES}")
 
-    objective_fun = create_objective_fun(df_reviewers, df_submissions, tutorial_coeff)
-    lb, ub = create_lb_ub(reviewers, submissions, assign_tutorials_to_anyone)
-    bounds = Bounds(lb.ravel(), ub.ravel())
-    constraints = create_constraints(reviewers, submissions, min_reviews, max_reviews, min_reviewers, max_reviewers)
+    # df_reviewers and df_submissions may also be Arrow tables from load_tables
+    arrow = isinstance(df_reviewers, pa.Table)
+    n_reviewers = len(df_reviewers)
+    n_submissions = len(df_submissions)
+
+    report = None
+    if return_report or output_dir is not None:
+        report = {
+            "created": datetime.now(UTC).isoformat(),
+            "n_reviewers": n_reviewers,
+            "n_submissions": n_submissions,
+            "min_reviews": min_reviews,
+            "max_reviews": max_reviews,
+            "min_reviewers": min_reviewers,
+            "max_reviewers": max_reviewers,
+            "tutorial_coeff": tutorial_coeff,
+            "assign_tutorials_to_anyone": assign_tutorials_to_anyone,
+            "feasible_pairs_only": feasible_pairs_only,
+            "engine": engine,
+            "decompose": decompose,
+            "time_limit": time_limit,
+            "mip_rel_gap": mip_rel_gap,
+            "presolve": presolve,
+            "polish": polish,
+            "affinity_weight": affinity_weight if texts is not None else None,
+        }
+
+    if feasible_pairs is not None:
+        estimate = estimate_model(n_reviewers, n_submissions, len(feasible_pairs["weight"]))
+        engine, feasible_pairs_only, decompose = _plan_model(
+            estimate, report, engine, feasible_pairs_only, decompose, memory_limit, time_limit
+        )
+        with _phase(report, "feasible_pairs"):
+            objective_fun, lb, ub = matrices_from_pairs(
+                feasible_pairs, np.asarray(df_reviewers["reviewer_id"]), np.asarray(df_submissions["submission_id"])
+            )
+        # DuckDB rebuilt the bounds already, there is nothing left for the cache to skip
+        if report is not None and cache_dir is not None:
+            report["cache"] = "unused"
+    else:
+        with _phase(report, "create_objective_fun"):
+            # Integer IDs, track masks and sparse conflicts, the string IDs are only looked up for the output
+            entities = intern_entities(df_reviewers, df_submissions)
+            # Size the model before any (n_reviewers, n_submissions) matrix is allocated
+            estimate = estimate_model(n_reviewers, n_submissions, *count_pairs(entities, assign_tutorials_to_anyone))
+            engine, feasible_pairs_only, decompose = _plan_model(
+                estimate, report, engine, feasible_pairs_only, decompose, memory_limit, time_limit
+            )
+            objective_fun = np.tile(submission_costs(entities, tutorial_coeff), (n_reviewers, 1))
+        with _phase(report, "create_lb_ub"):
+            cached = None
+            if cache_dir is not None:
+                key = input_fingerprint(entities, assign_tutorials_to_anyone)
+                cached = load_bounds(cache_dir, key)
+            if cached is not None:
+                lb, ub, *_ = cached
+            else:
+                lb, ub = entity_bounds(entities, assign_tutorials_to_anyone)
+            if cache_dir is not None and cached is None:
+                save_bounds(cache_dir, key, lb, ub, entities["reviewer_ids"], entities["submission_ids"])
+        if report is not None and cache_dir is not None:
+            report["cache"] = "hit" if cached is not None else "miss"
+    if texts is not None:
+        with _phase(report, "affinity"):
+            # Break the ties between equally good pairs in favour of matching expertise
+            affinity = affinity_matrix(*texts, ub)
+            objective_fun = objective_fun * (1 + affinity_weight * affinity)
+    limits = (min_reviews, max_reviews, min_reviewers, max_reviewers)
+    args = (objective_fun, lb, ub, *limits, feasible_pairs_only, engine)
+    solver_options = dict(time_limit=time_limit, mip_rel_gap=mip_rel_gap, presolve=presolve, polish=polish)
+
+    screening = None
+    if screen:
+        with _phase(report, "screen"):
+            columns = df_submissions.column_names if arrow else df_submissions.columns
+            tracks = np.asarray(df_submissions["track"]) if "track" in columns else None
+            screening = screen_feasibility(lb, ub, *limits, submission_tracks=tracks)
+
+    if screening is not None and not screening["feasible"]:
+        screening = _name_bottlenecks(
+            screening, np.asarray(df_reviewers["reviewer_id"]), np.asarray(df_submissions["submission_id"])
+        )
+        message = _describe_screening(screening)
+        print(message)
+        solution = None
+        if report is not None:
+            report.update(status=2, message=message, screening=screening)
+    elif decompose:
+        solution = solve_decomposed(*args, n_jobs=n_jobs, report=report, **solver_options)
+    else:
+        solution = solve_model(*args, report=report, **solver_options)
+
+    if output_dir is not None:
+        _write_report(report, output_dir)
+    if return_report:
+        return solution, report
+    return solution
+
+
+def solve_model(
+    objective_fun,
+    lb,
+    ub,
+    min_reviews,
+    max_reviews,
+    min_reviewers,
+    max_reviewers,
+    feasible_pairs_only=False,
+    engine="milp",
+    report=None,
+    time_limit=None,
+    mip_rel_gap=None,
+    presolve=True,
+    polish=False,
+):
+    # objective_fun, lb and ub are (n_reviewers, n_submissions) matrices.
+    # The model size and solver outcome are added to report if one is passed.
+    n_reviewers, n_submissions = lb.shape
+    limits = (min_reviews, max_reviews, min_reviewers, max_reviewers)
+
+    if engine == "flow":
+        return solve_flow(objective_fun, lb, ub, *limits, report=report)
+
+    heuristic = None
+    if engine == "greedy":
+        heuristic = solve_greedy(objective_fun, lb, ub, *limits, report=report)
+        if not polish or heuristic is None:
+            return heuristic
+        cutoff = objective_fun[heuristic].sum()
 
-    # Run MILP
-    res = milp(objective_fun, integrality=True, bounds=bounds, constraints=constraints)
+    with _phase(report, "build_model"):
+        if feasible_pairs_only:
+            # Only create variables for pairs that can be assigned. Pinned pairs are kept as well,
+            # so a previous assignment that now conflicts still makes the model infeasible.
+            pairs = np.nonzero((ub > 0) | (lb > 0))
+            objective_fun = objective_fun[pairs]
+            bounds = Bounds(lb[pairs], ub[pairs])
+        else:
+            pairs = None
+            objective_fun = objective_fun.ravel()
+            bounds = Bounds(lb.ravel(), ub.ravel())
+        constraints = create_constraints(
+            range(n_reviewers),
+            range(n_submissions),
+            min_reviews,
+            max_reviews,
+            min_reviewers,
+            max_reviewers,
+            pairs=pairs,
+        )
+        if heuristic is not None:
+            # Polish the heuristic: the MILP only has to look at assignments at least as good
+            cutoff += 1e-9 * max(1.0, abs(cutoff))
+            constraints.append(LinearConstraint(csr_array(objective_fun[np.newaxis, :]), -np.inf, cutoff))
+
+    options = {"presolve": presolve}
+    if time_limit is not None:
+        options["time_limit"] = time_limit
+    if mip_rel_gap is not None:
+        options["mip_rel_gap"] = mip_rel_gap
+
+    # Run MILP, or with engine="lp" the LP relaxation first and the MILP only if it solved to a fractional vertex.
+    # An infeasible, unbounded or unfinished LP is final, the MILP would only fail the same way more slowly.
+    lp_failed = False
+    with _phase(report, "solve", trace=False):
+        if engine == "lp":
+            start = time.perf_counter()
+            res = solve_relaxation(objective_fun, bounds, constraints, time_limit=time_limit, presolve=presolve)
+            if report is not None:
+                report.update(lp_status=res.status, lp_integral=res.integral)
+            lp_failed = res.status != 0
+            if not lp_failed and not res.integral:
+                # The MILP only gets the time the LP left over
+                if time_limit is not None:
+                    options["time_limit"] = max(time_limit - (time.perf_counter() - start), 0.0)
+                res = milp(objective_fun, integrality=True, bounds=bounds, constraints=constraints, options=options)
+        else:
+            res = milp(objective_fun, integrality=True, bounds=bounds, constraints=constraints, options=options)
     print(res)
-    n_reviewers = len(reviewers)
-    n_submissions = len(submissions)
+
+    if report is not None:
+        report.update(
+            n_variables=len(objective_fun),
+            n_constraints=sum(constraint.A.shape[0] for constraint in constraints),
+            nonzeros=sum(constraint.A.nnz for constraint in constraints),
+            status=res.status,
+            message=res.message,
+            objective=res.fun,
+            mip_gap=getattr(res, "mip_gap", None),
+            mip_node_count=getattr(res, "mip_node_count", None),
+            mip_dual_bound=getattr(res, "mip_dual_bound", None),
+        )
 
     # %%
-    if res.success:
+    # Keep the best feasible incumbent when a limit stopped the search early
+    if not lp_failed and (res.success or res.x is not None):
         x = np.round(res.x).astype(bool)
-        solution = x.reshape(n_reviewers, n_submissions)
+        if pairs is not None:
+            # Map the compact variables back onto the reviewer x submission matrix
+            solution = np.zeros((n_reviewers, n_submissions), dtype=bool)
+            solution[pairs[0][x], pairs[1][x]] = True
+        else:
+            solution = x.reshape(n_reviewers, n_submissions)
+        return solution
+
+    # An unfinished polish still has the heuristic assignment to fall back on
+    if heuristic is not None and report is not None:
+        report["message"] = f"{report['message']} Kept the heuristic assignment."
+    return heuristic
+
+
+def solve_relaxation(
+    objective_fun, bounds, constraints, time_limit=None, presolve=True, method="highs-ipm", tolerance=1e-6
+):
+    # The degree constraints form the incidence matrix of a bipartite graph, which is totally unimodular, so with
+    # integral bounds and limits every vertex of the LP relaxation is integral. The interior point method ends
+    # with a crossover to a vertex, and on these highly degenerate models it is much faster than the dual simplex
+    # ("highs-ds"). res.integral says whether the vertex is integral, it is False as soon as a side constraint
+    # breaks that structure and the caller has to fall back to the MILP.
+    A_ub, b_ub, A_eq, b_eq = [], [], [], []
+    for constraint in constraints:
+        A = csr_array(constraint.A)
+        lower = np.broadcast_to(constraint.lb, A.shape[0])
+        upper = np.broadcast_to(constraint.ub, A.shape[0])
+        equal = lower == upper
+        A_eq.append(A[equal])
+        b_eq.append(upper[equal])
+        for sign, limit in [(1, upper), (-1, lower)]:
+            finite = np.isfinite(limit) & ~equal
+            A_ub.append(sign * A[finite])
+            b_ub.append(sign * limit[finite])
+
+    options = {"presolve": presolve}
+    if time_limit is not None:
+        options["time_limit"] = time_limit
+    res = linprog(
+        objective_fun,
+        A_ub=vstack(A_ub, format="csr"),
+        b_ub=np.concatenate(b_ub),
+        A_eq=vstack(A_eq, format="csr"),
+        b_eq=np.concatenate(b_eq),
+        bounds=np.column_stack([bounds.lb, bounds.ub]),
+        method=method,
+        options=options,
+    )
+    res.integral = res.x is not None and np.abs(res.x - np.round(res.x)).max(initial=0.0) <= tolerance
+    return res
+
+
+def _degree_bounds(minimum, maximum, n_nodes, n_neighbours):
+    # Integral per-node degree bounds, with infinite maxima capped at the number of possible neighbours
+    minimum = np.ceil(np.broadcast_to(minimum, n_nodes)).astype(np.int64)
+    maximum = np.floor(np.minimum(np.broadcast_to(maximum, n_nodes), n_neighbours)).astype(np.int64)
+    return minimum, maximum
+
+
+def screen_feasibility(lb, ub, min_reviews, max_reviews, min_reviewers, max_reviewers, submission_tracks=None):
+    # Check whether the degree bounds can all be met on the feasible-pair graph before handing the model to a
+    # solver. Returns a dict with "feasible" and the bottlenecks found, as shortfalls by index: submissions and
+    # reviewers that can't reach their minimum, tracks (if submission_tracks is given) whose submissions need
+    # more reviews than their eligible reviewers can give, and pinned pairs that are no longer allowed.
+    n_reviewers, n_submissions = lb.shape
+    reviewer_min, reviewer_max = _degree_bounds(min_reviews, max_reviews, n_reviewers, n_submissions)
+    submission_min, submission_max = _degree_bounds(min_reviewers, max_reviewers, n_submissions, n_reviewers)
+    pinned = lb > 0
+    available = (ub > 0) | pinned
+
+    # Counting bounds first, they are enough to name most bottlenecks without building the flow network
+    submission_shortfall = submission_min - np.minimum(available.sum(axis=0), submission_max)
+    reviewer_shortfall = reviewer_min - np.minimum(available.sum(axis=1), reviewer_max)
+    conflicting_pins = np.argwhere(pinned & (ub < lb))
+
+    # Hall condition per track: the reviews the submissions of a track need against what the reviewers
+    # eligible for the track can give, each up to their own maximum
+    track_shortfall = {}
+    if submission_tracks is not None:
+        tracks, track_idx = np.unique(np.asarray(submission_tracks), return_inverse=True)
+        order = np.argsort(track_idx, kind="stable")
+        starts = np.searchsorted(track_idx[order], np.arange(len(tracks)))
+        eligible_per_track = np.add.reduceat(available[:, order], starts, axis=1)
+        capacity = np.minimum(eligible_per_track, reviewer_max[:, np.newaxis]).sum(axis=0)
+        shortfall = np.add.reduceat(submission_min[order], starts) - capacity
+        track_shortfall = {track: int(short) for track, short in zip(tracks.tolist(), shortfall) if short > 0}
+
+    if not ((submission_shortfall > 0).any() or (reviewer_shortfall > 0).any() or track_shortfall):
+        # Exact check: a feasible circulation source -> reviewers -> submissions -> sink -> source with the
+        # degree bounds as arc bounds, found as a max-flow from a super source to a super sink after moving the
+        # lower bounds into node excesses. Nodes are source 0, sink 1, the reviewers, the submissions, then the
+        # super source and super sink. Minimums the max-flow can't route are the shortfalls.
+        reviewer_nodes = 2 + np.arange(n_reviewers)
+        submission_nodes = 2 + n_reviewers + np.arange(n_submissions)
+        super_source, super_sink = 2 + n_reviewers + n_submissions, 3 + n_reviewers + n_submissions
+        pair_reviewers, pair_submissions = np.nonzero(available)
+        tails = np.concatenate([np.zeros(n_reviewers, np.intp), reviewer_nodes[pair_reviewers], submission_nodes, [1]])
+        heads = np.concatenate(
+            [reviewer_nodes, submission_nodes[pair_submissions], np.ones(n_submissions, np.intp), [0]]
+        )
+        lower = np.concatenate([reviewer_min, pinned[pair_reviewers, pair_submissions], submission_min, [0]])
+        upper = np.concatenate([reviewer_max, np.ones(len(pair_reviewers), np.int64), submission_max, [lb.size]])
+
+        excess = np.zeros(super_sink + 1, dtype=np.int64)
+        np.add.at(excess, heads, lower)
+        np.subtract.at(excess, tails, lower)
+        (supply_nodes,) = np.nonzero(excess > 0)
+        (demand_nodes,) = np.nonzero(excess < 0)
+        tails = np.concatenate([tails, np.full(len(supply_nodes), super_source), demand_nodes])
+        heads = np.concatenate([heads, supply_nodes, np.full(len(demand_nodes), super_sink)])
+        capacity = np.concatenate([upper - lower, excess[supply_nodes], -excess[demand_nodes]])
+        graph = csr_array((capacity.astype(np.int32), (tails, heads)), shape=(super_sink + 1, super_sink + 1))
+        flow = maximum_flow(graph, super_source, super_sink).flow
+
+        unmet = np.zeros(super_sink + 1, dtype=np.int64)
+        unmet[supply_nodes] = excess[supply_nodes] - flow[np.full(len(supply_nodes), super_source), supply_nodes]
+        unmet[demand_nodes] = -excess[demand_nodes] - flow[demand_nodes, np.full(len(demand_nodes), super_sink)]
+        submission_shortfall = unmet[submission_nodes]
+        reviewer_shortfall = unmet[reviewer_nodes]
+        # Excess left on the source or sink means the totals don't add up, even if no single node can be blamed
+        flow_feasible = not unmet.any()
+    else:
+        flow_feasible = False
+
+    return {
+        "feasible": flow_feasible and not len(conflicting_pins),
+        "submissions": {int(j): int(submission_shortfall[j]) for j in np.flatnonzero(submission_shortfall > 0)},
+        "tracks": track_shortfall,
+        "reviewers": {int(i): int(reviewer_shortfall[i]) for i in np.flatnonzero(reviewer_shortfall > 0)},
+        "conflicting_pins": conflicting_pins.tolist(),
+    }
+
+
+def _name_bottlenecks(screening, reviewer_ids, submission_ids):
+    # Replace the indices in a screen_feasibility result by submission and reviewer IDs
+    return {
+        **screening,
+        "submissions": {str(submission_ids[j]): short for j, short in screening["submissions"].items()},
+        "reviewers": {str(reviewer_ids[i]): short for i, short in screening["reviewers"].items()},
+        "conflicting_pins": [[str(reviewer_ids[i]), str(submission_ids[j])] for i, j in screening["conflicting_pins"]],
+    }
+
+
+def _describe_screening(screening, max_names=10):
+    def names(shortfalls):
+        listed = ", ".join(f"{name} ({short} short)" for name, short in list(shortfalls.items())[:max_names])
+        return listed + (f" and {len(shortfalls) - max_names} more" if len(shortfalls) > max_names else "")
+
+    lines = ["screening: the degree bounds can't all be met"]
+    if screening["submissions"]:
+        lines.append(f"  submissions without enough eligible reviewers: {names(screening['submissions'])}")
+    if screening["tracks"]:
+        lines.append(f"  tracks without enough reviewer capacity: {names(screening['tracks'])}")
+    if screening["reviewers"]:
+        lines.append(f"  reviewers who can't reach their minimum: {names(screening['reviewers'])}")
+    if screening["conflicting_pins"]:
+        lines.append(f"  pinned assignments that are no longer allowed: {screening['conflicting_pins'][:max_names]}")
+    return "\n".join(lines)
+
+
+def solve_flow(objective_fun, lb, ub, min_reviews, max_reviews, min_reviewers, max_reviewers, report=None):
+    # The model is a bipartite b-matching, so it is solved exactly as a min-cost circulation:
+    # source -> reviewer i (degree bounds) -> submission j (lb/ub, objective) -> sink -> source
+    n_reviewers, n_submissions = lb.shape
+    reviewer_idx, submission_idx = np.nonzero((ub > 0) | (lb > 0))
+    n_pairs = len(reviewer_idx)
+    n_nodes = 2 + n_reviewers + n_submissions
+
+    source, sink = 0, 1
+    reviewer_nodes = 2 + np.arange(n_reviewers)
+    submission_nodes = 2 + n_reviewers + np.arange(n_submissions)
+    with _phase(report, "build_model"):
+        reviewer_lower, reviewer_upper = _degree_bounds(min_reviews, max_reviews, n_reviewers, n_submissions)
+        submission_lower, submission_upper = _degree_bounds(min_reviewers, max_reviewers, n_submissions, n_reviewers)
+        tails = np.concatenate([np.full(n_reviewers, source), reviewer_nodes[reviewer_idx], submission_nodes, [sink]])
+        heads = np.concatenate(
+            [reviewer_nodes, submission_nodes[submission_idx], np.full(n_submissions, sink), [source]]
+        )
+        lower = np.concatenate([reviewer_lower, lb[reviewer_idx, submission_idx], submission_lower, [0]])
+        upper = np.concatenate(
+            [reviewer_upper, ub[reviewer_idx, submission_idx], submission_upper, [reviewer_upper.sum()]]
+        )
+        cost = np.concatenate(
+            [np.zeros(n_reviewers), objective_fun[reviewer_idx, submission_idx], np.zeros(n_submissions + 1)]
+        )
+
+    with _phase(report, "solve"):
+        flow = min_cost_flow(n_nodes, tails, heads, lower, upper, cost)
+
+    if flow is not None:
+        x = flow[n_reviewers : n_reviewers + n_pairs] > 0
+        objective = cost[n_reviewers : n_reviewers + n_pairs] @ x
+        status, message = 0, f"min-cost flow: optimal, objective {objective}"
+    else:
+        objective = None
+        status, message = 2, "min-cost flow: infeasible"
+    print(message)
+
+    if report is not None:
+        # One variable per arc and one flow conservation constraint per node
+        report.update(
+            n_variables=len(tails),
+            n_constraints=n_nodes,
+            nonzeros=2 * len(tails),
+            status=status,
+            message=message,
+            objective=objective,
+        )
+
+    if flow is not None:
+        solution = np.zeros((n_reviewers, n_submissions), dtype=bool)
+        solution[reviewer_idx[x], submission_idx[x]] = True
         return solution
 
 
+def _augment(x, eligible, pinned, start, load, minimum, other_load, other_maximum):
+    # Breadth-first search from row `start`, which is below its minimum, for an alternating path that adds a
+    # pair to a column with room, or drops a pinned-free pair from a column whose row can spare one.
+    # Flips the path in x and updates the loads, returning whether a path was found.
+    row_parent = {start: None}
+    column_parent = {}
+    queue = deque([start])
+    end = None
+    while queue and end is None:
+        row = queue.popleft()
+        for column in np.flatnonzero(eligible[row] & ~x[row]):
+            if column in column_parent:
+                continue
+            column_parent[column] = row
+            if other_load[column] < other_maximum[column]:
+                end = ("column", column)
+                break
+            for other_row in np.flatnonzero(x[:, column] & ~pinned[:, column]):
+                if other_row in row_parent:
+                    continue
+                row_parent[other_row] = column
+                if load[other_row] > minimum[other_row]:
+                    end = ("row", other_row)
+                    break
+                queue.append(other_row)
+            if end is not None:
+                break
+    if end is None:
+        return False
+
+    kind, node = end
+    if kind == "row":
+        # The last row gives up one of its pairs
+        x[node, row_parent[node]] = False
+        load[node] -= 1
+        node = row_parent[node]
+    else:
+        other_load[node] += 1
+    # Walk back to the start, adding and dropping pairs alternately
+    while True:
+        row = column_parent[node]
+        x[row, node] = True
+        if row_parent[row] is None:
+            load[row] += 1
+            return True
+        node = row_parent[row]
+        x[row, node] = False
+
+
+def solve_greedy(
+    objective_fun, lb, ub, min_reviews, max_reviews, min_reviewers, max_reviewers, max_rounds=20, report=None
+):
+    # Heuristic for quick previews: a greedy pass that fills submissions with the fewest eligible reviewers
+    # first, followed by a local search that swaps single assignments while that improves the objective
+    n_reviewers, n_submissions = lb.shape
+    reviewer_min, reviewer_max = _degree_bounds(min_reviews, max_reviews, n_reviewers, n_submissions)
+    submission_min, submission_max = _degree_bounds(min_reviewers, max_reviewers, n_submissions, n_reviewers)
+
+    with _phase(report, "heuristic"):
+        pinned = lb > 0
+        eligible = (ub > 0) & ~pinned
+        x = pinned.copy()
+        reviewer_load = x.sum(axis=1)
+        submission_load = x.sum(axis=0)
+
+        def assign(i, j, value=True):
+            i, j = np.broadcast_arrays(i, j)
+            x[i, j] = value
+            np.add.at(reviewer_load, i, 1 if value else -1)
+            np.add.at(submission_load, j, 1 if value else -1)
+
+        # Cover the hardest submissions first, preferring reviewers that are still short of their own
+        # minimum, then the least loaded ones, then the cheapest pairs
+        for j in np.argsort(eligible.sum(axis=0), kind="stable"):
+            need = submission_min[j] - submission_load[j]
+            candidates = np.flatnonzero(eligible[:, j] & ~x[:, j] & (reviewer_load < reviewer_max))
+            if need > 0 and candidates.size:
+                order = np.lexsort(
+                    (
+                        objective_fun[candidates, j],
+                        reviewer_load[candidates],
+                        reviewer_load[candidates] >= reviewer_min[candidates],
+                    )
+                )
+                assign(candidates[order[:need]], j)
+
+        # Bring every reviewer up to their minimum with the cheapest, least covered submissions
+        for i in np.argsort(eligible.sum(axis=1), kind="stable"):
+            need = reviewer_min[i] - reviewer_load[i]
+            candidates = np.flatnonzero(eligible[i] & ~x[i] & (submission_load < submission_max))
+            if need > 0 and candidates.size:
+                order = np.lexsort((submission_load[candidates], objective_fun[i, candidates]))
+                assign(i, candidates[order[:need]])
+
+        # Add every remaining assignment that lowers the objective, cheapest submissions first
+        for j in np.argsort(objective_fun.min(axis=0, initial=0.0), kind="stable"):
+            spare = submission_max[j] - submission_load[j]
+            candidates = np.flatnonzero(
+                eligible[:, j] & ~x[:, j] & (reviewer_load < reviewer_max) & (objective_fun[:, j] < 0)
+            )
+            if spare > 0 and candidates.size:
+                order = np.lexsort((reviewer_load[candidates], objective_fun[candidates, j]))
+                assign(candidates[order[:spare]], j)
+
+        # Repair the minimums the greedy passes could not reach along alternating add/drop paths, which
+        # shift one assignment along a chain of reviewers and submissions without breaking any other limit
+        for j in np.flatnonzero(submission_load < submission_min):
+            while submission_load[j] < submission_min[j]:
+                if not _augment(
+                    x.T, eligible.T, pinned.T, j, submission_load, submission_min, reviewer_load, reviewer_max
+                ):
+                    break
+        for i in np.flatnonzero(reviewer_load < reviewer_min):
+            while reviewer_load[i] < reviewer_min[i]:
+                if not _augment(x, eligible, pinned, i, reviewer_load, reviewer_min, submission_load, submission_max):
+                    break
+
+        # Local search: move a reviewer from their worst removable submission to their best open one,
+        # or add an open one while they have room and it lowers the objective
+        for _ in range(max_rounds):
+            changed = False
+            for i in range(n_reviewers):
+                addable = eligible[i] & ~x[i] & (submission_load < submission_max)
+                if not addable.any():
+                    continue
+                k = np.flatnonzero(addable)[np.argmin(objective_fun[i, addable])]
+                removable = x[i] & ~pinned[i] & (submission_load > submission_min)
+                if reviewer_load[i] < reviewer_max[i] and objective_fun[i, k] < 0:
+                    assign(i, k)
+                    changed = True
+                elif removable.any():
+                    j = np.flatnonzero(removable)[np.argmax(objective_fun[i, removable])]
+                    if objective_fun[i, k] < objective_fun[i, j]:
+                        assign(i, j, False)
+                        assign(i, k)
+                        changed = True
+            if not changed:
+                break
+
+    short_submissions = int((submission_load < submission_min).sum())
+    short_reviewers = int((reviewer_load < reviewer_min).sum())
+    feasible = short_submissions == 0 and short_reviewers == 0
+    objective = objective_fun[x].sum()
+    if feasible:
+        status, message = 0, f"heuristic: feasible, objective {objective}"
+    else:
+        status = 2
+        message = f"heuristic: {short_submissions} submissions and {short_reviewers} reviewers are below their minimum"
+    print(message)
+
+    if report is not None:
+        report.update(
+            n_variables=int(eligible.sum()),
+            n_constraints=n_reviewers + n_submissions,
+            nonzeros=2 * int(eligible.sum()),
+            status=status,
+            message=message,
+            objective=objective if feasible else None,
+            heuristic_objective=objective if feasible else None,
+        )
+
+    if feasible:
+        return x
+
+
+def find_components(lb, ub):
+    # Connected components of the bipartite graph of feasible reviewer x submission pairs,
+    # returned as component labels for the reviewers and for the submissions
+    n_reviewers, n_submissions = lb.shape
+    n_nodes = n_reviewers + n_submissions
+    reviewer_idx, submission_idx = np.nonzero((ub > 0) | (lb > 0))
+    graph = csr_array(
+        (np.ones(len(reviewer_idx)), (reviewer_idx, n_reviewers + submission_idx)), shape=(n_nodes, n_nodes)
+    )
+    n_components, labels = connected_components(graph, directed=False)
+    return n_components, labels[:n_reviewers], labels[n_reviewers:]
+
+
+def _group_by_label(labels, n_components):
+    # Indices belonging to each component label
+    order = np.argsort(labels, kind="stable")
+    return np.split(order, np.cumsum(np.bincount(labels, minlength=n_components))[:-1])
+
+
+def _solve_component(*args, deadline=None, **kwargs):
+    # Solve one component with its own report, so reports come back from worker processes too. deadline is the
+    # wall-clock time.time() at which the whole time limit runs out, the component gets the time that is left.
+    if deadline is not None:
+        kwargs["time_limit"] = max(deadline - time.time(), 0.0)
+    report = {}
+    return solve_model(*args, report=report, **kwargs), report
+
+
+def _merge_reports(report, component_reports):
+    # Model sizes, solver effort and phases add up over the components, the worst status wins
+    report["n_components"] = len(component_reports)
+    for key in ["n_variables", "n_constraints", "nonzeros", "mip_node_count", "objective"]:
+        values = [component[key] for component in component_reports if component.get(key) is not None]
+        report[key] = sum(values) if values else None
+    gaps = [component["mip_gap"] for component in component_reports if component.get("mip_gap") is not None]
+    report["mip_gap"] = max(gaps, default=None)
+    report["status"] = max((component["status"] for component in component_reports), default=0)
+    report["message"] = f"{sum(component['status'] == 0 for component in component_reports)} components optimal"
+    for component in component_reports:
+        for name, phase in component.get("phases", {}).items():
+            merged = report.setdefault("phases", {}).setdefault(name, {"seconds": 0.0, "peak_mib": 0.0})
+            merged["seconds"] += phase["seconds"]
+            merged["peak_mib"] = max(merged["peak_mib"], phase["peak_mib"])
+
+
+def solve_decomposed(
+    objective_fun,
+    lb,
+    ub,
+    min_reviews,
+    max_reviews,
+    min_reviewers,
+    max_reviewers,
+    feasible_pairs_only=False,
+    engine="milp",
+    n_jobs=None,
+    report=None,
+    **solver_options,
+):
+    # Reviewers and submissions in different connected components never interact, so each
+    # component is solved as its own model in a process pool and the results are stitched back together.
+    # time_limit in solver_options is for all components together, not per component.
+    time_limit = solver_options.pop("time_limit", None)
+    deadline = None if time_limit is None else time.time() + time_limit
+    n_reviewers, n_submissions = lb.shape
+    with _phase(report, "decompose"):
+        n_components, reviewer_labels, submission_labels = find_components(lb, ub)
+    min_reviews, max_reviews = np.broadcast_to(min_reviews, n_reviewers), np.broadcast_to(max_reviews, n_reviewers)
+    min_reviewers = np.broadcast_to(min_reviewers, n_submissions)
+    max_reviewers = np.broadcast_to(max_reviewers, n_submissions)
+
+    components = []
+    for rows, cols in zip(
+        _group_by_label(reviewer_labels, n_components), _group_by_label(submission_labels, n_components)
+    ):
+        if len(rows) == 0 or len(cols) == 0:
+            # An isolated reviewer or submission is only feasible if it needs no assignments
+            if (min_reviews[rows] > 0).any() or (min_reviewers[cols] > 0).any():
+                message = (
+                    "decomposition: infeasible, a reviewer or submission that needs assignments has no feasible pairs"
+                )
+                print(message)
+                if report is not None:
+                    report.update(status=2, message=message)
+                return None
+            continue
+        components.append((rows, cols))
+    print(f"decomposition: {len(components)} components")
+
+    jobs = [
+        (
+            objective_fun[np.ix_(rows, cols)],
+            lb[np.ix_(rows, cols)],
+            ub[np.ix_(rows, cols)],
+            min_reviews[rows],
+            max_reviews[rows],
+            min_reviewers[cols],
+            max_reviewers[cols],
+        )
+        for rows, cols in components
+    ]
+    solve_component = partial(
+        _solve_component, feasible_pairs_only=feasible_pairs_only, engine=engine, deadline=deadline, **solver_options
+    )
+    if len(jobs) > 1 and n_jobs != 1:
+        with ProcessPoolExecutor(max_workers=n_jobs) as pool:
+            results = list(pool.map(solve_component, *zip(*jobs)))
+    else:
+        results = [solve_component(*job) for job in jobs]
+    if report is not None:
+        _merge_reports(report, [component_report for _, component_report in results])
+
+    solution = np.zeros((n_reviewers, n_submissions), dtype=bool)
+    for (rows, cols), (component_solution, _) in zip(components, results):
+        if component_solution is None:
+            return None
+        solution[np.ix_(rows, cols)] = component_solution
+    return solution
+
+
+def repair_assignments(
+    df_reviewers,
+    df_submissions,
+    previous_assignments,
+    min_reviews,
+    max_reviews,
+    min_reviewers,
+    max_reviewers,
+    tutorial_coeff,
+    assign_tutorials_to_anyone,
+    removed_reviewer_ids=(),
+    removed_submission_ids=(),
+    added_conflicts=(),
+    engine="milp",
+):
+    # Re-solve a stage after a late change without reshuffling the assignments the change does not touch.
+    # previous_assignments maps reviewer_id -> submission IDs, as written by format_and_output_result.
+    # Reviewers missing from previous_assignments and submissions nobody was assigned to count as added,
+    # removed reviewers and submissions are dropped and added_conflicts holds (reviewer_id, submission_id) pairs.
+    # Returns the updated reviewer and submission frames and the solution for them, or None for the solution.
+    df_reviewers = df_reviewers[~df_reviewers.reviewer_id.isin(removed_reviewer_ids)].reset_index(drop=True)
+    df_submissions = df_submissions[~df_submissions.submission_id.isin(removed_submission_ids)].reset_index(drop=True)
+    new_conflicts = {}
+    for reviewer_id, submission_id in added_conflicts:
+        new_conflicts.setdefault(reviewer_id, []).append(submission_id)
+    df_reviewers = df_reviewers.assign(
+        conflicts_submission_ids=[
+            list(conflicts) + new_conflicts.get(reviewer_id, [])
+            for reviewer_id, conflicts in zip(df_reviewers.reviewer_id, df_reviewers.conflicts_submission_ids)
+        ]
+    )
+
+    reviewers = df_reviewers.to_dict("records")
+    submissions = df_submissions.to_dict("records")
+    n_reviewers = len(reviewers)
+    n_submissions = len(submissions)
+
+    objective_fun = create_objective_fun(df_reviewers, df_submissions, tutorial_coeff)
+    objective_fun = objective_fun.reshape(n_reviewers, n_submissions)
+    lb, ub = create_lb_ub(reviewers, submissions, assign_tutorials_to_anyone)
+
+    # Previous assignments as a matrix over the updated reviewers and submissions
+    submission_index = {submission["submission_id"]: j for j, submission in enumerate(submissions)}
+    previous_records = [
+        {"assigned_submission_ids": previous_assignments.get(reviewer["reviewer_id"], [])} for reviewer in reviewers
+    ]
+    previous = np.zeros((n_reviewers, n_submissions), dtype=bool)
+    previous[_list_coordinates(previous_records, "assigned_submission_ids", submission_index)] = True
+
+    # Reviewers and submissions are affected when they are new, lost an assignment
+    # to a removed counterpart, or hold a previous pair that is no longer allowed
+    lost_submission = np.array(
+        [
+            reviewer["reviewer_id"] not in previous_assignments
+            or not set(previous_assignments[reviewer["reviewer_id"]]).isdisjoint(removed_submission_ids)
+            for reviewer in reviewers
+        ],
+        dtype=bool,
+    )
+    lost_reviewer = {
+        submission_id
+        for reviewer_id in removed_reviewer_ids
+        for submission_id in previous_assignments.get(reviewer_id, ())
+    }
+    invalidated = previous & (ub == 0)
+    affected_reviewers = lost_submission | invalidated.any(axis=1)
+    affected_submissions = (
+        np.array([submission["submission_id"] in lost_reviewer for submission in submissions], dtype=bool)
+        | ~previous.any(axis=0)
+        | invalidated.any(axis=0)
+    )
+
+    feasible = ub > 0
+    while True:
+        # Unaffected reviewers keep their previous assignments to unaffected submissions through lb,
+        # like assignments from earlier stages, and every other pair between them stays unassigned
+        frozen = np.outer(~affected_reviewers, ~affected_submissions)
+        pinned_lb = np.where(frozen & previous, 1.0, lb)
+        pinned_ub = np.where(frozen, pinned_lb, ub)
+
+        # Fixed pairs leave the model and count against the degree limits instead
+        fixed = (pinned_lb > 0) & (pinned_ub > 0)
+        reviewer_fixed = fixed.sum(axis=1)
+        submission_fixed = fixed.sum(axis=0)
+        print(
+            f"repair: {affected_reviewers.sum()} reviewers and {affected_submissions.sum()} submissions affected, "
+            f"{fixed.sum()} assignments pinned"
+        )
+        solution = solve_model(
+            objective_fun,
+            np.where(fixed, 0.0, pinned_lb),
+            np.where(fixed, 0.0, pinned_ub),
+            np.maximum(min_reviews - reviewer_fixed, 0),
+            max_reviews - reviewer_fixed,
+            np.maximum(min_reviewers - submission_fixed, 0),
+            max_reviewers - submission_fixed,
+            feasible_pairs_only=True,
+            engine=engine,
+        )
+        if solution is not None:
+            return df_reviewers, df_submissions, solution | fixed
+
+        # Grow the neighbourhood by one step along the feasible pairs and try again
+        grown_reviewers = affected_reviewers | (feasible & affected_submissions).any(axis=1)
+        grown_submissions = affected_submissions | (feasible & affected_reviewers[:, None]).any(axis=0)
+        if (grown_reviewers == affected_reviewers).all() and (grown_submissions == affected_submissions).all():
+            return df_reviewers, df_submissions, None
+        affected_reviewers, affected_submissions = grown_reviewers, grown_submissions
+
+
 # %%
 ############################
 ## FORMAT AND OUTPUT DATA ##
 ############################
+def write_json(path, mapping):
+    # Writes the same text as json.dumps(mapping, indent=4) for a dict of lists of strings or bools,
+    # streaming one entry at a time instead of building the whole document in memory
+    encode = json.JSONEncoder().encode
+    with open(path, "w") as fp:
+        if not mapping:
+            fp.write("{}")
+            return
+        separator = "{\n    "
+        for key, values in mapping.items():
+            fp.write(separator + encode(key) + ": ")
+            if values:
+                fp.write("[\n        " + ",\n        ".join(map(encode, values)) + "\n    ]")
+            else:
+                fp.write("[]")
+            separator = ",\n    "
+        fp.write("\n}")
+
+
+def _records(table):
+    # Row dicts of a pandas frame or an Arrow table from load_tables
+    return table.to_pylist() if isinstance(table, pa.Table) else table.to_dict("records")
+
+
 def format_and_output_result(df_reviewers, df_submissions, solution, post_fix="", output_dir=Path.cwd() / "output"):
-    reviewers = df_reviewers.to_dict("records")
-    submissions = df_submissions.to_dict("records")
+    reviewers = _records(df_reviewers)
+    submissions = _records(df_submissions)
+    entities = intern_entities(df_reviewers, df_submissions)
+    reviewer_ids = entities["reviewer_ids"].astype(object)
+    submission_ids = entities["submission_ids"].astype(object)
 
-    for reviewer, assignments in zip(reviewers, solution):
-        # reviewer["assigned_submission_ids"] = reviewer["assigned_submission_ids"] + \
-        # df_submissions.submission_id[assignments].values.tolist()
-        reviewer["assigned_submission_ids"] = df_submissions.submission_id[assignments].values.tolist()
-        if DEBUG:
-            # Check how many tutorials everyone got
-            reviewer["is_tutorial"] = [t == "TUT" for t in df_submissions.track[assignments]]
-            reviewer["num_tutorials"] = sum(reviewer["is_tutorial"])
-            reviewer["num_submissions"] = len(reviewer["assigned_submission_ids"])
-            reviewer["tutorial_reviewer"] = "TUT" in reviewer["tracks"]
-            # Check that each reviewer actually was assigned a submission in their domain
-            reviewer["track_in_domain"] = [t in reviewer["tracks"] for t in df_submissions.track[assignments]]
+    # One pass over the assigned pairs: np.nonzero lists them by reviewer, a stable sort regroups them by
+    # submission, and both keep the row order of the other table within a group
+    rows, cols = np.nonzero(solution)
+    by_submission = np.argsort(cols, kind="stable")
+    reviewer_splits = np.searchsorted(rows, np.arange(1, len(reviewers)))
+    submission_splits = np.searchsorted(cols[by_submission], np.arange(1, len(submissions)))
 
-    if DEBUG:
-        result = {reviewer["reviewer_id"]: sorted(reviewer["is_tutorial"]) for reviewer in reviewers}
+    assigned_submission_ids = np.split(submission_ids[cols], reviewer_splits)
+    for reviewer, assigned in zip(reviewers, assigned_submission_ids):
+        reviewer["assigned_submission_ids"] = assigned.tolist()
 
-        with open(output_dir / f"review-assignments-debug{post_fix}.json", "w") as fp:
-            fp.write(json.dumps(result, indent=4))
+    if DEBUG:
+        # Check how many tutorials everyone got
+        tutorial = is_tutorial(entities)[cols]
+        num_tutorials = np.bincount(rows[tutorial], minlength=len(reviewers))
+        num_submissions = np.bincount(rows, minlength=len(reviewers))
+        # Check that each reviewer actually was assigned a submission in their domain
+        track_in_domain = in_track(entities, rows, cols)
+        # The tutorial track is interned also when only talks are assigned
+        tutorial_reviewer = track_matrix(entities)[:, entities["tutorial_track"]]
 
-    result = {reviewer["reviewer_id"]: reviewer["assigned_submission_ids"] for reviewer in reviewers}
+        for n, (reviewer, tutorials, in_domain) in enumerate(
+            zip(reviewers, np.split(tutorial, reviewer_splits), np.split(track_in_domain, reviewer_splits))
+        ):
+            reviewer["is_tutorial"] = tutorials.tolist()
+            reviewer["num_tutorials"] = int(num_tutorials[n])
+            reviewer["num_submissions"] = int(num_submissions[n])
+            reviewer["tutorial_reviewer"] = bool(tutorial_reviewer[n])
+            reviewer["track_in_domain"] = in_domain.tolist()
 
-    with open(output_dir / f"review-assignments{post_fix}.json", "w") as fp:
-        fp.write(json.dumps(result, indent=4))
+        result = {
+            reviewer_id: [False] * int(n_assigned - n_tutorials) + [True] * int(n_tutorials)
+            for reviewer_id, n_assigned, n_tutorials in zip(reviewer_ids, num_submissions, num_tutorials)
+        }
+        write_json(output_dir / f"review-assignments-debug{post_fix}.json", result)
 
-    for submission, assignments in zip(submissions, solution.T):
-        submission["assigned_reviewer_ids"] = df_reviewers.reviewer_id[assignments].values.tolist()
+    result = dict(zip(reviewer_ids, (reviewer["assigned_submission_ids"] for reviewer in reviewers)))
+    write_json(output_dir / f"review-assignments{post_fix}.json", result)
 
-    result = {submission["submission_id"]: submission["assigned_reviewer_ids"] for submission in submissions}
+    assigned_reviewer_ids = np.split(reviewer_ids[rows[by_submission]], submission_splits)
+    for submission, assigned in zip(submissions, assigned_reviewer_ids):
+        submission["assigned_reviewer_ids"] = assigned.tolist()
 
-    with open(output_dir / f"submission-assignments{post_fix}.json", "w") as fp:
-        fp.write(json.dumps(result, indent=4))
+    result = dict(zip(submission_ids, (submission["assigned_reviewer_ids"] for submission in submissions)))
+    write_json(output_dir / f"submission-assignments{post_fix}.json", result)
 
     return reviewers, submissions
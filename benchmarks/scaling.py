@@ -0,0 +1,177 @@
+# %%
+########################
+## SCALING BENCHMARKS ##
+########################
+# Time and memory-profile every phase of the assignment on synthetic conferences of growing size:
+#
+#   python benchmarks/scaling.py --scales 1 10 100 --output output/benchmark-scaling.json
+#
+# Phases whose projected peak memory exceeds --memory-limit (default: the physical memory) are skipped and
+# recorded with "skipped" and "projected_mib". The dense objective, lower and upper bound matrices take 24 bytes
+# per reviewer x submission pair (~9 GB at 100x) and create_constraints over all pairs another 64 (~24 GB at
+# 100x), so on a laptop the 100x conference is only sized, not solved. The default engine="auto" picks the
+# engine that fits from the estimates of model_size.py, usually the min-cost flow.
+import argparse
+import json
+import platform
+import sys
+import tempfile
+from datetime import UTC, datetime
+from pathlib import Path
+
+import numpy as np
+import scipy
+
+sys.path.append(str(Path(__file__).resolve().parent.parent))
+from assign_reviews import (  # noqa: E402
+    _phase,
+    create_constraints,
+    create_lb_ub,
+    create_objective_fun,
+    format_and_output_result,
+    solve_model,
+)
+from entities import intern_entities  # noqa: E402
+from model_size import (  # noqa: E402
+    BYTES_PER_CELL,
+    choose_model,
+    count_pairs,
+    estimate_model,
+    find_configuration,
+    physical_memory,
+)
+from synthetic import generate_conference  # noqa: E402
+
+# Stage 2 limits from run-assignments.py, with a zero minimum so every synthetic size stays feasible
+MIN_REVIEWS_PER_PERSON = 0
+MAX_REVIEWS_PER_PERSON = 9
+MIN_REVIEWERS_PER_SUBMISSION = 0
+MAX_REVIEWERS_PER_SUBMISSION = 4
+TUTORIAL_COEFF = 0.8
+ASSIGN_TUTORIALS_TO_ANYONE = False
+
+# Peak bytes per reviewer x submission pair of create_constraints over all pairs, measured at 10x and 20x
+CONSTRAINT_BYTES_PER_CELL = 64
+
+
+def measure(func, *args, trace=True, **kwargs):
+    # Wall-clock time and peak memory of a single call, like the phases of solve_milp: traced with tracemalloc,
+    # or with trace=False the growth of the peak resident memory, since tracing slows HiGHS down several times
+    report = {}
+    with _phase(report, "call", trace=trace):
+        result = func(*args, **kwargs)
+    return result, report["phases"]["call"]
+
+
+def skipped(projected_bytes, memory_limit):
+    # Record of a phase that isn't run because its projected peak memory exceeds memory_limit bytes
+    if memory_limit is None or projected_bytes <= memory_limit:
+        return None
+    return {"skipped": True, "projected_mib": projected_bytes / 2**20}
+
+
+def run_scale(scale, seed, engine, feasible_pairs_only, memory_limit=None):
+    df_reviewers, df_submissions = generate_conference(scale, seed=seed)
+    reviewers = df_reviewers.to_dict("records")
+    submissions = df_submissions.to_dict("records")
+    limits = (
+        MIN_REVIEWS_PER_PERSON,
+        MAX_REVIEWS_PER_PERSON,
+        MIN_REVIEWERS_PER_SUBMISSION,
+        MAX_REVIEWERS_PER_SUBMISSION,
+    )
+    size = {"scale": scale, "n_reviewers": len(reviewers), "n_submissions": len(submissions)}
+    n_cells = len(reviewers) * len(submissions)
+
+    # Size the model before anything dense is allocated. solve_model doesn't decompose, so one component.
+    entities = intern_entities(df_reviewers, df_submissions)
+    n_pairs, _ = count_pairs(entities, ASSIGN_TUTORIALS_TO_ANYONE)
+    estimate = estimate_model(len(reviewers), len(submissions), n_pairs)
+    size["n_pairs"] = n_pairs
+    skip = skipped(BYTES_PER_CELL * n_cells, memory_limit)
+    if skip is not None:
+        return [{**size, "phase": "create_objective_fun", **skip}]
+
+    records = []
+    objective_fun, stats = measure(create_objective_fun, df_reviewers, df_submissions, TUTORIAL_COEFF)
+    records.append({**size, "phase": "create_objective_fun", **stats})
+    (lb, ub), stats = measure(create_lb_ub, reviewers, submissions, ASSIGN_TUTORIALS_TO_ANYONE)
+    records.append({**size, "phase": "create_lb_ub", "feasible_pairs": int((ub > 0).sum()), **stats})
+    skip = skipped((BYTES_PER_CELL + CONSTRAINT_BYTES_PER_CELL) * n_cells, memory_limit)
+    if skip is None:
+        constraints, stats = measure(create_constraints, reviewers, submissions, *limits)
+        nonzeros = sum(c.A.nnz for c in constraints)
+        records.append({**size, "phase": "create_constraints", "nonzeros": nonzeros, **stats})
+        del constraints
+    else:
+        records.append({**size, "phase": "create_constraints", **skip})
+
+    if engine == "auto":
+        configuration = choose_model(estimate, memory_limit)
+        engine, feasible_pairs_only = configuration["engine"], configuration["feasible_pairs_only"]
+    else:
+        configuration = find_configuration(estimate, engine, feasible_pairs_only, False)
+    solve = {"engine": engine, "feasible_pairs_only": feasible_pairs_only}
+    # The greedy heuristic has no estimate, it needs little beyond the dense matrices
+    skip = configuration and skipped(configuration["peak_mib"] * 2**20, memory_limit)
+    if skip:
+        records.append({**size, "phase": "solve", **solve, **skip})
+        return records
+
+    objective_fun = objective_fun.reshape(len(reviewers), len(submissions))
+    solution, stats = measure(
+        solve_model,
+        objective_fun,
+        lb,
+        ub,
+        *limits,
+        feasible_pairs_only=feasible_pairs_only,
+        engine=engine,
+        trace=False,
+    )
+    records.append({**size, "phase": "solve", **solve, "solved": solution is not None, **stats})
+
+    if solution is not None:
+        with tempfile.TemporaryDirectory() as output_dir:
+            _, stats = measure(
+                format_and_output_result, df_reviewers, df_submissions, solution, output_dir=Path(output_dir)
+            )
+        records.append({**size, "phase": "format_and_output_result", **stats})
+    return records
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Time and memory-profile the assignment phases")
+    parser.add_argument("--scales", type=float, nargs="+", default=[1, 10, 100], help="multiples of a SciPy conference")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--engine", choices=["auto", "milp", "lp", "flow", "greedy"], default="auto")
+    parser.add_argument("--all-pairs", action="store_true", help="create a variable for every pair")
+    parser.add_argument(
+        "--memory-limit", type=float, help="GiB a phase may use before it is skipped (default: physical memory)"
+    )
+    parser.add_argument("--output", type=Path, default=Path("output") / "benchmark-scaling.json")
+    args = parser.parse_args(argv)
+
+    memory_limit = physical_memory() if args.memory_limit is None else args.memory_limit * 2**30
+
+    results = []
+    for scale in args.scales:
+        for record in run_scale(scale, args.seed, args.engine, not args.all_pairs, memory_limit):
+            print(json.dumps(record))
+            results.append(record)
+
+    report = {
+        "created": datetime.now(UTC).isoformat(),
+        "python": platform.python_version(),
+        "numpy": np.__version__,
+        "scipy": scipy.__version__,
+        "seed": args.seed,
+        "results": results,
+    }
+    args.output.parent.mkdir(parents=True, exist_ok=True)
+    with open(args.output, "w") as fp:
+        fp.write(json.dumps(report, indent=4))
+
+
+if __name__ == "__main__":
+    main()
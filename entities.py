@@ -0,0 +1,123 @@
+# %%
+##############
+## ENTITIES ##
+##############
+# Compact core representation of the reviewers and submissions of one assignment step. Reviewers, submissions
+# and tracks get dense integer IDs (their position), the tracks of a reviewer are one uint64 bitmask (a row of
+# a boolean matrix past 64 tracks), and conflicts and pre-assigned pairs are sparse boolean matrices. The string
+# IDs are only kept in lookup arrays for the output, so membership tests compare integers and bits instead of
+# Python strings.
+import numpy as np
+import pyarrow as pa
+import pyarrow.compute as pc
+from scipy.sparse import csr_array
+
+TUTORIAL_TRACK = "TUT"
+
+# One bit per track in a uint64, more tracks than that are kept as a boolean matrix
+MAX_TRACKS = 64
+
+
+def _column(table, name, list_column=False):
+    # Arrow array of a column of a pandas frame or an Arrow table
+    column = table[name]
+    if isinstance(column, pa.ChunkedArray):
+        column = column.combine_chunks()
+    elif not isinstance(column, pa.Array):
+        # List values may be NumPy arrays when the frames come from DuckDB
+        column = pa.array(np.asarray(column, dtype=object), from_pandas=True)
+    if list_column:
+        return column.cast(pa.list_(pa.string()))
+    return column.cast(pa.string())
+
+
+def _list_coordinates(column, value_set):
+    # The row of every list element comes from the list offsets and its index from a hash lookup in value_set,
+    # elements missing from value_set are dropped
+    rows = pc.list_parent_indices(column)
+    cols = pc.index_in(pc.list_flatten(column), value_set=value_set)
+    found = pc.is_valid(cols)
+    return rows.filter(found).to_numpy().astype(np.intp), cols.filter(found).to_numpy().astype(np.intp)
+
+
+def intern_entities(reviewers, submissions):
+    # reviewers and submissions are pandas frames or Arrow tables shaped like reviewers_to_assign and
+    # submissions_to_assign, reviewers may also have an assigned_submission_ids column
+    submission_ids = _column(submissions, "submission_id")
+    tracks = pc.dictionary_encode(_column(submissions, "track"))
+    track_ids = tracks.dictionary
+    # The tutorial track is always interned, so tutorial reviewers are known in steps without tutorials too
+    if not pc.is_in(pa.array([TUTORIAL_TRACK]), value_set=track_ids)[0].as_py():
+        track_ids = pa.concat_arrays([track_ids, pa.array([TUTORIAL_TRACK])])
+    n_reviewers, n_submissions, n_tracks = len(reviewers), len(submission_ids), len(track_ids)
+
+    rows, track_idx = _list_coordinates(_column(reviewers, "tracks", list_column=True), track_ids)
+    if n_tracks <= MAX_TRACKS:
+        reviewer_tracks = np.zeros(n_reviewers, dtype=np.uint64)
+        np.bitwise_or.at(reviewer_tracks, rows, np.left_shift(np.uint64(1), track_idx.astype(np.uint64)))
+    else:
+        reviewer_tracks = np.zeros((n_reviewers, n_tracks), dtype=bool)
+        reviewer_tracks[rows, track_idx] = True
+
+    columns = reviewers.column_names if isinstance(reviewers, pa.Table) else reviewers.columns
+
+    def pair_matrix(column):
+        if column not in columns:
+            return csr_array((n_reviewers, n_submissions), dtype=bool)
+        rows, cols = _list_coordinates(_column(reviewers, column, list_column=True), submission_ids)
+        matrix = csr_array((np.ones(len(rows), dtype=bool), (rows, cols)), shape=(n_reviewers, n_submissions))
+        matrix.sum_duplicates()
+        return matrix
+
+    return dict(
+        reviewer_ids=_column(reviewers, "reviewer_id").to_numpy(zero_copy_only=False),
+        submission_ids=submission_ids.to_numpy(zero_copy_only=False),
+        track_ids=track_ids.to_numpy(zero_copy_only=False),
+        submission_track=tracks.indices.to_numpy().astype(np.int32),
+        tutorial_track=pc.index(track_ids, TUTORIAL_TRACK).as_py(),
+        reviewer_tracks=reviewer_tracks,
+        conflicts=pair_matrix("conflicts_submission_ids"),
+        assigned=pair_matrix("assigned_submission_ids"),
+    )
+
+
+def track_matrix(entities):
+    # (n_reviewers, n_tracks) boolean matrix unpacked from the track masks
+    if entities["reviewer_tracks"].ndim == 2:
+        return entities["reviewer_tracks"].copy()
+    bits = np.arange(len(entities["track_ids"]), dtype=np.uint64)
+    return ((entities["reviewer_tracks"][:, np.newaxis] >> bits) & np.uint64(1)).astype(bool)
+
+
+def in_track(entities, rows, cols):
+    # Whether reviewer rows[k] signed up for the track of submission cols[k]
+    if entities["reviewer_tracks"].ndim == 2:
+        return entities["reviewer_tracks"][rows, entities["submission_track"][cols]]
+    bits = entities["submission_track"][cols].astype(np.uint64)
+    return ((entities["reviewer_tracks"][rows] >> bits) & np.uint64(1)).astype(bool)
+
+
+def is_tutorial(entities):
+    return entities["submission_track"] == entities["tutorial_track"]
+
+
+def submission_costs(entities, tutorial_coeff):
+    # Objective coefficient of a review of every submission: maximize the number of reviews, tutorials cost more
+    return np.where(is_tutorial(entities), -tutorial_coeff, -1.0)
+
+
+def entity_bounds(entities, assign_tutorials_to_anyone):
+    # both zero if reviewer cannot review submission, both one if reviewer is assigned to submission
+    # reviewer cannot be assigned out of domain
+    ub = track_matrix(entities)[:, entities["submission_track"]]
+    # everyone can be assigned a tutorial because we're short on tutorial reviewers
+    if assign_tutorials_to_anyone:
+        ub[:, is_tutorial(entities)] = True
+    # reviewer cannot be assigned a submission they have a conflict with
+    ub[entities["conflicts"].nonzero()] = False
+
+    # reviewer must be re-assigned previous assignments
+    lb = np.zeros(ub.shape, dtype=bool)
+    lb[entities["assigned"].nonzero()] = True
+
+    return lb.astype(float), ub.astype(float)
@@ -1,2 +1,101 @@
+# %%
+##########
+## MAIN ##
+##########
+# Headless entry point for cron and CI runs:
+#
+#   python main.py run --data-dir data --output-dir output --config assign-reviews.toml
+#
+# Parameters come from the flags, then the config file, then the defaults in pipeline.py.
+# Only the standard library is imported here, the stages import DuckDB, pandas and SciPy when they run.
+import argparse
+import sys
+from pathlib import Path
+
+import pipeline
+
+
 def add_numbers(a, b):
     return a + b
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Pre-process the pretalx exports and assign reviewers")
+    parser.add_argument("command", choices=["preprocess", "assign", "run"], help="run does preprocess, then assign")
+    parser.add_argument("--config", type=Path, help="TOML file with [preprocess] and [assign] tables")
+    parser.add_argument("--data-dir", type=Path, help="directory with the pretalx exports (default: data)")
+    parser.add_argument("--database", type=Path, help="DuckDB file (default: <data-dir>/assign_reviews.db)")
+    parser.add_argument("--output-dir", type=Path, help="directory for the assignments (default: output)")
+    parser.add_argument("--force", action="store_true", default=None, help="reload and rebuild every table")
+    parser.add_argument("--max-memory", help='DuckDB memory limit while loading the exports, like "1GB"')
+    parser.add_argument("--engine", choices=["auto", "milp", "lp", "flow", "greedy"])
+    parser.add_argument("--time-limit", type=float, help="seconds per solve")
+    parser.add_argument("--mip-rel-gap", type=float)
+    parser.add_argument("--no-presolve", dest="presolve", action="store_false", default=None)
+    parser.add_argument("--no-cache", dest="cache", action="store_false", default=None, help="rebuild every model")
+    parser.add_argument("--tutorial-coeff", type=float)
+    parser.add_argument("--eligibility", choices=["duckdb", "python"], help="where the feasible pairs are found")
+    parser.add_argument("--affinity-weight", type=float, help="weight of the expertise match, 0 turns it off")
+    parser.add_argument(
+        "--assign-tutorials-to-anyone", dest="assign_tutorials_to_anyone", action="store_true", default=None
+    )
+    return parser.parse_args(argv)
+
+
+def resolve_settings(args, config=None):
+    # Merge the flags over the config file over the defaults
+    config = config or {}
+    preprocess = config.get("preprocess", {})
+    assign = dict(config.get("assign", {}))
+    stages = assign.pop("stages", {})
+    output_dir = assign.pop("output_dir", "output")
+
+    data_dir = Path(args.data_dir or preprocess.get("data_dir", "data"))
+    settings = dict(
+        data_dir=data_dir,
+        database_file=Path(args.database or preprocess.get("database", data_dir / "assign_reviews.db")),
+        output_dir=Path(args.output_dir or output_dir),
+        force=bool(args.force if args.force is not None else preprocess.get("force", False)),
+        max_memory=args.max_memory or preprocess.get("max_memory"),
+        stages=stages,
+    )
+    for option in [
+        "engine",
+        "time_limit",
+        "mip_rel_gap",
+        "presolve",
+        "cache",
+        "tutorial_coeff",
+        "affinity_weight",
+        "eligibility",
+        "assign_tutorials_to_anyone",
+    ]:
+        value = getattr(args, option)
+        if value is not None:
+            assign[option] = value
+    settings["options"] = assign
+    return settings
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    config = pipeline.load_config(args.config) if args.config is not None else None
+    settings = resolve_settings(args, config)
+
+    if args.command in ("preprocess", "run"):
+        loaded, rebuilt = pipeline.preprocess(
+            settings["data_dir"], settings["database_file"], force=settings["force"], max_memory=settings["max_memory"]
+        )
+        print(f"reloaded: {', '.join(loaded) or 'nothing'}")
+        print(f"rebuilt: {', '.join(rebuilt) or 'nothing'}")
+    if args.command in ("assign", "run"):
+        assignments = pipeline.assign(
+            settings["database_file"], settings["output_dir"], stages=settings["stages"], **settings["options"]
+        )
+        n_assignments = sum(len(submission_ids) for submission_ids in assignments.values())
+        print(f"assigned {n_assignments} reviews to {len(assignments)} reviewers in {settings['output_dir']}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
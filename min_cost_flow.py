@@ -0,0 +1,99 @@
+# %%
+###################
+## MIN COST FLOW ##
+###################
+# Min-cost circulation with arc lower bounds, solved with the primal-dual method on top of the
+# compiled shortest path and max-flow routines in scipy.sparse.csgraph
+import numpy as np
+from scipy.sparse import csr_array
+from scipy.sparse.csgraph import dijkstra, maximum_flow
+
+
+def min_cost_flow(n_nodes, tails, heads, lower, upper, cost):
+    """Return the arc flows of a min-cost circulation, or None if no feasible circulation exists.
+
+    Arc k goes from tails[k] to heads[k] and carries an integer flow between lower[k] and upper[k]
+    at cost[k] per unit. Costs may be negative. The network must have at most one arc per
+    unordered pair of nodes.
+    """
+    tails = np.asarray(tails, dtype=np.intp)
+    heads = np.asarray(heads, dtype=np.intp)
+    lower = np.asarray(lower, dtype=np.int64)
+    upper = np.asarray(upper, dtype=np.int64)
+    cost = np.asarray(cost, dtype=float)
+
+    pair_keys = np.minimum(tails, heads) * n_nodes + np.maximum(tails, heads)
+    if np.unique(pair_keys).size != pair_keys.size:
+        raise ValueError("min_cost_flow needs at most one arc per unordered pair of nodes")
+
+    if (lower > upper).any():
+        return None
+
+    capacity = upper - lower
+    excess = np.zeros(n_nodes, dtype=np.int64)
+
+    # Demand transformation: send the lower bound through every arc up front
+    np.add.at(excess, heads, lower)
+    np.subtract.at(excess, tails, lower)
+
+    # Saturate negative cost arcs and replace them by their reverse, so all costs are nonnegative
+    negative = cost < 0
+    np.add.at(excess, heads[negative], capacity[negative])
+    np.subtract.at(excess, tails[negative], capacity[negative])
+    tails, heads = np.where(negative, heads, tails), np.where(negative, tails, heads)
+
+    # Route the excess from a super source to a super sink
+    source, sink = n_nodes, n_nodes + 1
+    (supply_nodes,) = np.nonzero(excess > 0)
+    (demand_nodes,) = np.nonzero(excess < 0)
+    n_arcs = len(capacity)
+    tails = np.concatenate([tails, np.full(len(supply_nodes), source), demand_nodes])
+    heads = np.concatenate([heads, supply_nodes, np.full(len(demand_nodes), sink)])
+    capacity = np.concatenate([capacity, excess[supply_nodes], -excess[demand_nodes]])
+    abs_cost = np.concatenate([np.abs(cost), np.zeros(len(supply_nodes) + len(demand_nodes))])
+
+    flow, flow_value = _primal_dual(n_nodes + 2, tails, heads, capacity, abs_cost, source, sink)
+    if flow_value < excess[supply_nodes].sum():
+        return None
+
+    flow = flow[:n_arcs]
+    return lower + np.where(negative, upper - lower - flow, flow)
+
+
+def _primal_dual(n_nodes, tails, heads, capacity, cost, source, sink):
+    # Successive shortest paths with node potentials, where every phase pushes a maximum flow
+    # through all arcs of zero reduced cost at once instead of augmenting one path at a time
+    flow = np.zeros(len(capacity), dtype=np.int64)
+    flow_value = 0
+    potential = np.zeros(n_nodes)
+    tolerance = 1e-9 * max(1.0, cost.max(initial=0.0))
+
+    while True:
+        forward = flow < capacity
+        backward = flow > 0
+        reduced_cost = cost + potential[tails] - potential[heads]
+
+        rows = np.concatenate([tails[forward], heads[backward]])
+        cols = np.concatenate([heads[forward], tails[backward]])
+        weights = np.concatenate([reduced_cost[forward], -reduced_cost[backward]])
+        graph = csr_array((np.maximum(weights, 0.0), (rows, cols)), shape=(n_nodes, n_nodes))
+        distance = dijkstra(graph, indices=source)
+        if not np.isfinite(distance[sink]):
+            return flow, flow_value
+        potential += np.minimum(distance, distance[sink])
+
+        # Admissible residual arcs have zero reduced cost under the updated potentials
+        reduced_cost = cost + potential[tails] - potential[heads]
+        forward &= reduced_cost <= tolerance
+        backward &= reduced_cost >= -tolerance
+        rows = np.concatenate([tails[forward], heads[backward]])
+        cols = np.concatenate([heads[forward], tails[backward]])
+        residual = np.concatenate([capacity[forward] - flow[forward], flow[backward]]).astype(np.int32)
+        graph = csr_array((residual, (rows, cols)), shape=(n_nodes, n_nodes))
+        result = maximum_flow(graph, source, sink)
+        if result.flow_value == 0:
+            raise RuntimeError("min_cost_flow made no progress on a shortest path phase")
+
+        # The max-flow result is antisymmetric, so it gives the net flow change on every arc
+        flow += np.asarray(result.flow[tails, heads]).ravel().astype(np.int64)
+        flow_value += result.flow_value
@@ -0,0 +1,93 @@
+# %%
+#################
+## MODEL CACHE ##
+#################
+# On-disk cache of the assignment bounds, keyed by a fingerprint of the interned reviewer, submission and
+# conflict inputs. The bounds are the expensive part of a model and don't depend on the tutorial coefficient
+# or the min/max limits, so a re-run that only changes those reuses them. Every entry is one .npz file with the
+# sparse coordinates of the bounds and the reviewer and submission IDs they are indexed by. The least
+# recently used entries are evicted once there are more than max_entries.
+import hashlib
+import os
+from pathlib import Path
+
+import numpy as np
+
+# Bump when the layout of an entry changes, so old entries are never read
+CACHE_VERSION = 1
+
+
+def input_fingerprint(entities, assign_tutorials_to_anyone):
+    # Key of the bounds of the interned entities of entities.py (see entity_bounds): the track masks and codes,
+    # the tutorial track and the conflict and pinned pairs, hashed from their NumPy buffers, so no row is turned
+    # into Python objects. The bounds are positional, so the key covers the order of the reviewers and
+    # submissions, a reordered table is a miss, but not their IDs.
+    conflicts, assigned = entities["conflicts"], entities["assigned"]
+    digest = hashlib.sha256(
+        f"{CACHE_VERSION}:{bool(assign_tutorials_to_anyone)}:{len(entities['track_ids'])}:"
+        f"{entities['tutorial_track']}:{conflicts.shape}".encode()
+    )
+    for array in [
+        entities["reviewer_tracks"],
+        entities["submission_track"],
+        conflicts.indptr,
+        conflicts.indices,
+        assigned.indptr,
+        assigned.indices,
+    ]:
+        # Dtype and shape first, so the boundary between two arrays is part of the key
+        array = np.ascontiguousarray(array)
+        digest.update(f"{array.dtype}{array.shape}".encode())
+        digest.update(array.data)
+    return digest.hexdigest()
+
+
+def load_bounds(cache_dir, key):
+    # Returns (lb, ub, reviewer_ids, submission_ids) or None on a miss
+    path = Path(cache_dir) / f"{key}.npz"
+    try:
+        with np.load(path, allow_pickle=False) as entry:
+            shape = tuple(entry["shape"])
+            lb = np.zeros(shape)
+            lb[entry["lb_rows"], entry["lb_cols"]] = 1.0
+            ub = np.zeros(shape)
+            ub[entry["ub_rows"], entry["ub_cols"]] = 1.0
+            reviewer_ids, submission_ids = entry["reviewer_ids"], entry["submission_ids"]
+    except (FileNotFoundError, ValueError, KeyError, OSError):
+        return None
+    # Mark as recently used
+    os.utime(path)
+    return lb, ub, reviewer_ids, submission_ids
+
+
+def save_bounds(cache_dir, key, lb, ub, reviewer_ids, submission_ids, max_entries=8):
+    cache_dir = Path(cache_dir)
+    cache_dir.mkdir(parents=True, exist_ok=True)
+    lb_rows, lb_cols = np.nonzero(lb)
+    ub_rows, ub_cols = np.nonzero(ub)
+    index_dtype = np.int32 if max(lb.shape, default=0) < 2**31 else np.int64
+
+    # Write to a temporary file first, so a concurrent reader never sees half an entry
+    path = cache_dir / f"{key}.npz"
+    tmp_path = cache_dir / f"{key}.{os.getpid()}.tmp.npz"
+    np.savez(
+        tmp_path,
+        shape=np.array(lb.shape),
+        lb_rows=lb_rows.astype(index_dtype),
+        lb_cols=lb_cols.astype(index_dtype),
+        ub_rows=ub_rows.astype(index_dtype),
+        ub_cols=ub_cols.astype(index_dtype),
+        reviewer_ids=np.asarray(reviewer_ids, dtype=str),
+        submission_ids=np.asarray(submission_ids, dtype=str),
+    )
+    os.replace(tmp_path, path)
+    evict(cache_dir, max_entries)
+    return path
+
+
+def evict(cache_dir, max_entries):
+    # Remove the least recently used entries beyond max_entries
+    entries = [path for path in Path(cache_dir).glob("*.npz") if not path.name.endswith(".tmp.npz")]
+    entries.sort(key=lambda path: path.stat().st_mtime_ns, reverse=True)
+    for path in entries[max_entries:]:
+        path.unlink(missing_ok=True)
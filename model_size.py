@@ -0,0 +1,157 @@
+# %%
+################
+## MODEL SIZE ##
+################
+# Size, memory and time estimates for an assignment model before any matrix is built, from the interned
+# entities of entities.py, and the choice of the cheapest engine and representation that fits in memory.
+# The costs per variable were measured on the talks step of synthetic conferences (synthetic.py) at 1x to 6x
+# the size of a SciPy conference, on one core. They are rough, the point is to rank the options and to warn
+# before a model that can't fit is allocated.
+import os
+
+import numpy as np
+from scipy.sparse import csr_array
+from scipy.sparse.csgraph import connected_components
+
+from entities import track_matrix
+
+# objective_fun, lb and ub are dense float64 matrices in every configuration
+BYTES_PER_CELL = 24
+
+# (engine, feasible_pairs_only) -> peak bytes per variable and seconds = a * n_pairs ** b. The MILP presolve
+# drops the variables fixed at zero, so its time depends on the feasible pairs in either representation.
+MODEL_COSTS = {
+    ("flow", True): dict(bytes_per_variable=250, seconds=(9.3e-7, 1.0)),
+    ("lp", True): dict(bytes_per_variable=1450, seconds=(1.15e-5, 1.0)),
+    ("lp", False): dict(bytes_per_variable=1350, seconds=(2.8e-5, 1.0)),
+    ("milp", True): dict(bytes_per_variable=1600, seconds=(2.4e-9, 1.9)),
+    ("milp", False): dict(bytes_per_variable=850, seconds=(2.4e-9, 1.9)),
+}
+
+
+def physical_memory():
+    # Bytes of physical memory, or None where the platform doesn't say
+    try:
+        return os.sysconf("SC_PAGE_SIZE") * os.sysconf("SC_PHYS_PAGES")
+    except (ValueError, OSError, AttributeError):
+        return None
+
+
+def count_pairs(entities, assign_tutorials_to_anyone):
+    # Number of feasible (or pinned) reviewer x submission pairs, and the pairs per connected component of the
+    # track graph (tracks sharing a reviewer), largest first, counted per track instead of per pair
+    in_track = track_matrix(entities)
+    if assign_tutorials_to_anyone:
+        in_track[:, entities["tutorial_track"]] = True
+    n_tracks = in_track.shape[1]
+    submission_track = entities["submission_track"]
+    submissions_per_track = np.bincount(submission_track, minlength=n_tracks)
+    pairs_per_track = in_track.sum(axis=0) * submissions_per_track
+
+    # Conflicts remove eligible pairs, pins that aren't eligible add them back
+    conflicts = entities["conflicts"]
+    rows, cols = conflicts.nonzero()
+    eligible = in_track[rows, submission_track[cols]]
+    pairs_per_track -= np.bincount(submission_track[cols[eligible]], minlength=n_tracks)
+    for pins, blocked in [(entities["assigned"], False), (csr_array(entities["assigned"].multiply(conflicts)), True)]:
+        rows, cols = pins.nonzero()
+        # Pinned conflicts were only removed above if they were in track
+        pinned = in_track[rows, submission_track[cols]] == blocked
+        pairs_per_track += np.bincount(submission_track[cols[pinned]], minlength=n_tracks)
+
+    # Tracks without submissions (the tutorial track in steps without tutorials) connect nothing
+    in_track, pairs_per_track = in_track[:, submissions_per_track > 0], pairs_per_track[submissions_per_track > 0]
+    shared = csr_array(in_track.T.astype(np.int64) @ in_track.astype(np.int64))
+    n_components, labels = connected_components(shared, directed=False)
+    component_pairs = np.bincount(labels, weights=pairs_per_track, minlength=n_components).astype(np.int64)
+    component_pairs = np.sort(component_pairs[component_pairs > 0])[::-1]
+    return int(pairs_per_track.sum()), component_pairs
+
+
+def estimate_model(n_reviewers, n_submissions, n_pairs, component_pairs=None):
+    # Variables, constraints, constraint nonzeros, projected peak memory and solve time of every engine and
+    # representation. Components are only solved on their own with the feasible pairs as variables.
+    component_pairs = np.asarray([n_pairs] if component_pairs is None else component_pairs, dtype=np.int64)
+    n_cells = n_reviewers * n_submissions
+    configurations = []
+    for (engine, feasible_pairs_only), costs in MODEL_COSTS.items():
+        for decompose in [False, True] if engine != "flow" and feasible_pairs_only else [False]:
+            if decompose and len(component_pairs) < 2:
+                continue
+            a, b = costs["seconds"]
+            if engine == "flow":
+                # One arc per pair and per reviewer and submission, one node per reviewer and submission
+                variables = n_pairs + n_reviewers + n_submissions + 1
+                constraints = n_reviewers + n_submissions + 2
+            else:
+                # One row per reviewer and per submission, every variable shows up in one of each
+                variables = n_pairs if feasible_pairs_only else n_cells
+                constraints = n_reviewers + n_submissions
+            largest = component_pairs[0] if decompose else variables
+            seconds = (a * component_pairs.astype(float) ** b).sum() if decompose else a * float(n_pairs) ** b
+            configurations.append(
+                dict(
+                    engine=engine,
+                    feasible_pairs_only=feasible_pairs_only,
+                    decompose=decompose,
+                    variables=int(variables),
+                    constraints=int(constraints),
+                    nonzeros=int(2 * variables),
+                    peak_mib=(BYTES_PER_CELL * n_cells + costs["bytes_per_variable"] * int(largest)) / 2**20,
+                    seconds=float(seconds),
+                )
+            )
+    return dict(
+        n_reviewers=n_reviewers,
+        n_submissions=n_submissions,
+        n_cells=n_cells,
+        n_pairs=n_pairs,
+        n_components=len(component_pairs),
+        largest_component=int(component_pairs[0]) if len(component_pairs) else 0,
+        configurations=configurations,
+    )
+
+
+def find_configuration(estimate, engine, feasible_pairs_only, decompose):
+    # The estimate of one configuration, a flow model always has the feasible pairs as variables
+    for configuration in estimate["configurations"]:
+        if configuration["engine"] == engine and (
+            engine == "flow"
+            or (configuration["feasible_pairs_only"], configuration["decompose"])
+            == (bool(feasible_pairs_only), bool(decompose) and estimate["n_components"] > 1)
+        ):
+            return configuration
+    return None
+
+
+def choose_model(estimate, memory_limit=None, engines=("flow", "lp", "milp")):
+    # The fastest configuration that fits in memory_limit bytes (default: the physical memory), or the
+    # smallest one if none fits. Returns a copy with "fits" set.
+    memory_limit = physical_memory() if memory_limit is None else memory_limit
+    candidates = [configuration for configuration in estimate["configurations"] if configuration["engine"] in engines]
+    fitting = [
+        configuration
+        for configuration in candidates
+        if memory_limit is None or configuration["peak_mib"] * 2**20 <= memory_limit
+    ]
+    if fitting:
+        return {**min(fitting, key=lambda configuration: configuration["seconds"]), "fits": True}
+    return {**min(candidates, key=lambda configuration: configuration["peak_mib"]), "fits": False}
+
+
+def describe_configuration(estimate, configuration, memory_limit=None, time_limit=None):
+    # One line for the run output, plus warnings when the model won't fit or won't finish in time
+    memory_limit = physical_memory() if memory_limit is None else memory_limit
+    representation = "feasible pairs" if configuration["feasible_pairs_only"] else "all pairs"
+    structure = f", {estimate['n_components']} components" if configuration["decompose"] else ""
+    lines = [
+        f"model: engine={configuration['engine']} ({representation}{structure}), "
+        f"{configuration['variables']} variables, {configuration['nonzeros']} nonzeros, "
+        f"{estimate['n_pairs']} of {estimate['n_cells']} pairs feasible, "
+        f"~{configuration['peak_mib']:.0f} MiB, ~{configuration['seconds']:.1f} s"
+    ]
+    if memory_limit is not None and configuration["peak_mib"] * 2**20 > memory_limit:
+        lines.append(f"  warning: projected peak memory exceeds the limit of {memory_limit / 2**20:.0f} MiB")
+    if time_limit is not None and configuration["seconds"] > time_limit:
+        lines.append(f"  warning: projected solve time exceeds the time limit of {time_limit} s")
+    return "\n".join(lines)
@@ -23,11 +23,15 @@
 # ---
 
 # %%
+import sys
 from pathlib import Path
 
 import duckdb
 from IPython import display
 
+sys.path.append("..")
+from preprocessing import preview_table, update_database
+
 # %%
 data_dir = Path.cwd() / ".." / "data"
 
@@ -49,17 +53,21 @@ database_file = data_dir / "assign_reviews.db"
 con = duckdb.connect(str(database_file))
 
 
-# %%
-def create_and_show_table(file_name, table_name, show=True):
-    con.sql(f'create or replace table {table_name} as select * from read_csv("{file_name}", header=true)')
-    if show is True:
-        return con.sql(f"table {table_name}")
+# %% [markdown]
+# Raw files are only re-read when their content hash differs from the one recorded in the database, and
+# only the tables built from them are rebuilt. Pass `force=True` to rebuild everything, and `max_memory="1GB"`
+# to bound DuckDB while it loads large exports. Columns are read with the types in `preprocessing.RAW_SCHEMAS`.
 
+# %%
+loaded, rebuilt = update_database(con, raw_files)
+print("reloaded:", loaded)
+print("rebuilt:", rebuilt)
 
 # %%
-for table_name, file_name in raw_files.items():
-    print(table_name)
-    display.display(create_and_show_table(file_name, table_name).df())
+for table_name in raw_files:
+    preview = preview_table(con, table_name)
+    print(f"{table_name}: {preview['n_rows']} rows")
+    display.display(preview["head"])
     print("\n")
 
 # %%
@@ -124,20 +132,6 @@ select count(*) from coi_reviewers
 # 3. submitted the COI form
 
 # %%
-con.sql(
-    """
-create or replace table reviewers as
-    select
-        scipy_reviewers.Name as name,
-        scipy_reviewers.Email as email,
-        \"Track(s) to review for (check all that apply)\" as tracks,
-        \"Mark the speaker(s) or company/organization/affiliation(s) that could pose a conflict of interest\" as coi
-    from scipy_reviewers
-    join pretalx_reviewers on scipy_reviewers.Email = pretalx_reviewers.Email
-    join coi_reviewers on coi_reviewers.Email = pretalx_reviewers.Email
-"""
-)
-
 df = con.sql("select distinct * from reviewers").df()
 num_reviewers = len(df)
 df
@@ -300,68 +294,31 @@ select * from dupes
 ).df().T.to_json()
 
 # %%
-con.sql("create or replace table reviewers as (select distinct * from reviewers)")
-
-# %%
-con.sql(
-    """
-create or replace table reviewers_with_tracks as
-with reviewers_no_dupes as (select distinct * from reviewers)
-select reviewers_no_dupes.name, email, list(tracks.name) as tracks, list(tracks.track_id) as track_ids from reviewers_no_dupes
-    join tracks on instr(reviewers_no_dupes.tracks, tracks.name)
-    group by reviewers_no_dupes.name, email
-"""  # noqa: E501
-)
-
 con.sql("select distinct * from reviewers_with_tracks")
 
 # %%
 con.sql('select ID as submission_id, "Speaker IDs" as speaker_ids from pretalx_sessions')
 
+# %% [markdown]
+# Conflicts of interest are resolved on normalized names and speaker IDs: the speakers of every
+# submission, the speakers named in every author entry of the COI form and the author entries named in
+# every reviewer's answer are exploded into key tables and joined on equality
+
 # %%
-con.sql(
-    """
-create or replace table reviewers_with_coi as
-
-with submissions_with_authors as (
-    select
-        ID as submission_id,
-        \"Speaker IDs\" as speaker_ids
-    from
-        pretalx_sessions
-)
-select
-    reviewers.name,
-    reviewers.email,
-    list(pretalx_speakers.Name) as speakers,
-    list(pretalx_speakers.ID) AS speaker_ids,
-    list(submissions_with_authors.submission_id) as submission_ids
-from
-    reviewers
-    left join coi_authors on instr(coi, coi_authors.author)
-    left join pretalx_speakers on contains(coi_authors.author, pretalx_speakers.Name)
-    left join submissions_with_authors on contains(submissions_with_authors.speaker_ids, pretalx_speakers.ID)
-group by reviewers.name, reviewers.email
-order by reviewers.name
-"""
-)
+con.sql("table reviewer_coi_authors")
 
+# %%
 con.sql("table reviewers_with_coi")
 
 # %%
 con.sql(
     """
-with reviewers_with_coi_pre as (
-    select name, email, author
-    from reviewers
-    join coi_authors on instr(coi, coi_authors.author)
-)
-select count(*), author from reviewers_with_coi_pre anti join pretalx_speakers on contains(reviewers_with_coi_pre.author, pretalx_speakers.Name) group by author
-"""  # noqa: E501
+select count(*), author from reviewer_coi_authors anti join coi_author_speakers using (author) group by author
+"""
 )
 
 # %%
-con.sql("table reviewers_with_tracks").df()
+preview_table(con, "reviewers_with_tracks")
 
 # %%
 con.sql("select email as reviewer_id, list(track_ids) as tracks from reviewers_with_tracks group by email")
@@ -373,19 +330,7 @@ con.sql("select email as reviewer_id, list(track_ids) as tracks from reviewers_w
 # ## reviewers_to_assign
 
 # %%
-con.sql(
-    """
-create or replace table reviewers_to_assign as
-select
-    reviewers_with_coi.email as reviewer_id,
-    reviewers_with_tracks.track_ids as tracks,
-    reviewers_with_coi.submission_ids as conflicts_submission_ids
-from reviewers_with_coi
-join reviewers_with_tracks on reviewers_with_tracks.email = reviewers_with_coi.email
-"""
-)
-
-con.sql("table reviewers_to_assign").df()
+preview_table(con, "reviewers_to_assign")
 
 # %%
 # con.sql("table reviewers_to_assign").df().to_csv("input/reviewers_to_assign.csv")
@@ -394,19 +339,7 @@ con.sql("table reviewers_to_assign").df()
 # ## submissions_to_assign
 
 # %%
-con.sql(
-    """
-create or replace table submissions_to_assign as
-select
-    ID as submission_id,
-    string_split(\"Speaker IDs\", '\n') as author_ids,
-    track_id as track
-from pretalx_sessions
-    join tracks on pretalx_sessions.Track = tracks.name
-"""
-)
-
-con.sql("table submissions_to_assign").df()
+preview_table(con, "submissions_to_assign")
 
 # %%
 # con.sql("table submissions_to_assign").df().to_csv("input/submissions_to_assign.csv")
@@ -35,6 +35,9 @@ import pandas as pd
 
 sys.path.append("..")
 from assign_reviews import format_and_output_result, solve_milp
+from entities import intern_entities
+from pipeline import final_limits
+from validation import describe_violations, validate_assignments
 
 # %% [markdown]
 # # Start script
@@ -48,6 +51,15 @@ output_dir.mkdir(exist_ok=True)
 ASSIGN_TUTORIALS_TO_ANYONE = False
 TUTORIAL_COEFF = 0.8
 
+# Solver budget: stop after TIME_LIMIT seconds or once within MIP_REL_GAP of the optimum,
+# keeping the best assignment found so far. Set both to None to search until proven optimal.
+TIME_LIMIT = 600
+MIP_REL_GAP = 0.01
+PRESOLVE = True
+
+# Limits of each step as it runs, for the validation of all steps together at the end
+stages = {}
+
 DEBUG = True
 
 database_file = data_dir / "assign_reviews.db"
@@ -71,6 +83,12 @@ MIN_TUTORIALS_PER_PERSON = 0
 MAX_TUTORIALS_PER_PERSON = 5
 MIN_REVIEWERS_PER_TUTORIAL = 3
 MAX_REVIEWERS_PER_TUTORIAL = 4
+stages["tutorials"] = dict(
+    min_reviews=MIN_TUTORIALS_PER_PERSON,
+    max_reviews=MAX_TUTORIALS_PER_PERSON,
+    min_reviewers=MIN_REVIEWERS_PER_TUTORIAL,
+    max_reviewers=MAX_REVIEWERS_PER_TUTORIAL,
+)
 
 df_submissions_tutorials = df_submissions[df_submissions.track == "TUT"]
 
@@ -83,6 +101,11 @@ solution = solve_milp(
     MAX_REVIEWERS_PER_TUTORIAL,
     TUTORIAL_COEFF,
     ASSIGN_TUTORIALS_TO_ANYONE,
+    time_limit=TIME_LIMIT,
+    mip_rel_gap=MIP_REL_GAP,
+    presolve=PRESOLVE,
+    cache_dir=output_dir / "model-cache",
+    output_dir=output_dir,
 )
 reviewers, submissions = format_and_output_result(
     df_reviewers, df_submissions_tutorials, solution, post_fix="00", output_dir=output_dir
@@ -129,6 +152,12 @@ MIN_REVIEWS_PER_PERSON = 5
 MAX_REVIEWS_PER_PERSON = 9
 MIN_REVIEWERS_PER_SUBMISSION = 2
 MAX_REVIEWERS_PER_SUBMISSION = 4
+stages["talks"] = dict(
+    min_reviews=MIN_REVIEWS_PER_PERSON,
+    max_reviews=MAX_REVIEWS_PER_PERSON,
+    min_reviewers=MIN_REVIEWERS_PER_SUBMISSION,
+    max_reviewers=MAX_REVIEWERS_PER_SUBMISSION,
+)
 
 df_reviewers_no_submissions = df_reviewers_with_tut[df_reviewers_with_tut.assigned_submission_ids.apply(len) == 0]
 df_submissions_no_tutorials = df_submissions[df_submissions.track != "TUT"]
@@ -142,6 +171,11 @@ solution = solve_milp(
     MAX_REVIEWERS_PER_SUBMISSION,
     TUTORIAL_COEFF,
     ASSIGN_TUTORIALS_TO_ANYONE,
+    time_limit=TIME_LIMIT,
+    mip_rel_gap=MIP_REL_GAP,
+    presolve=PRESOLVE,
+    cache_dir=output_dir / "model-cache",
+    output_dir=output_dir,
 )
 if solution is not None:
     reviewers, submissions = format_and_output_result(
@@ -205,6 +239,12 @@ MIN_REVIEWS_PER_PERSON = 0
 MAX_REVIEWS_PER_PERSON = 4
 MIN_REVIEWERS_PER_SUBMISSION = 1
 MAX_REVIEWERS_PER_SUBMISSION = 2
+stages["tutorial_reviewer_talks"] = dict(
+    min_reviews=MIN_REVIEWS_PER_PERSON,
+    max_reviews=MAX_REVIEWS_PER_PERSON,
+    min_reviewers=MIN_REVIEWERS_PER_SUBMISSION,
+    max_reviewers=MAX_REVIEWERS_PER_SUBMISSION,
+)
 
 df_reviewers_only_tut = df_reviewers_with_tut[df_reviewers_with_tut.assigned_submission_ids.apply(len) > 0]
 
@@ -217,6 +257,11 @@ solution = solve_milp(
     MAX_REVIEWERS_PER_SUBMISSION,
     TUTORIAL_COEFF,
     ASSIGN_TUTORIALS_TO_ANYONE,
+    time_limit=TIME_LIMIT,
+    mip_rel_gap=MIP_REL_GAP,
+    presolve=PRESOLVE,
+    cache_dir=output_dir / "model-cache",
+    output_dir=output_dir,
 )
 
 if solution is not None:
@@ -311,6 +356,21 @@ select string_agg(reviewer_id), count(reviewer_id), string_agg(tracks), len(assi
 """  # noqa: E501
 )
 
+# %% [markdown]
+# All steps together: no conflicts, duplicates or pairs outside the tracks, and every reviewer and submission
+# within the limits of its steps
+
+# %%
+reviewer_assignments_final = con.sql("table reviewer_assignments_02").df()
+has_tutorial = df_reviewers.reviewer_id.isin(df_reviewers_only_tut.reviewer_id)
+report = validate_assignments(
+    intern_entities(df_reviewers, df_submissions),
+    dict(zip(reviewer_assignments_final.reviewer_id, reviewer_assignments_final.assigned_submission_ids.map(list))),
+    *final_limits(stages, has_tutorial, df_submissions.track == "TUT"),
+    assign_tutorials_to_anyone=ASSIGN_TUTORIALS_TO_ANYONE,
+)
+print(describe_violations(report))
+
 # %%
 con.close()
 
@@ -0,0 +1,285 @@
+# %%
+##############
+## PIPELINE ##
+##############
+# The pre-processing and staged assignment of the notebooks without the notebook machinery, for main.py.
+# DuckDB, pandas and the solver are imported by the stages that need them, so the command line starts fast.
+from pathlib import Path
+
+RAW_FILES = dict(
+    scipy_reviewers="scipy_reviewers.csv",  # people who signed up as reviewers
+    pretalx_sessions="sessions.csv",  # all proposal exported from pretalx
+    pretalx_speakers="speakers.csv",  # all speakers exported from pretalx
+    pretalx_reviewers="pretalx_reviewers.csv",  # all reviewers copy-pasted from pretalx
+    coi_reviewers="scipy_coi_export.csv",  # all responses to the coi form
+    coi_authors="coi_authors.csv",  # copy pasted values of author names from coi form
+    tracks="tracks.csv",  # manually entered track IDs
+)
+
+# Defaults from run-assignments.py
+ASSIGN_DEFAULTS = dict(
+    tutorial_coeff=0.8,
+    assign_tutorials_to_anyone=False,
+    engine="auto",
+    time_limit=600,
+    mip_rel_gap=0.01,
+    presolve=True,
+    cache=True,
+    # Scale of the expertise match on top of the value of a review, 0 turns it off
+    affinity_weight=0.5,
+    # Where the feasible pairs are found: "python" (create_lb_ub) or "duckdb" (preprocessing.create_feasible_pairs).
+    # "duckdb" is opt-in: its pairs are scattered into the same dense bounds as the python path, since screening,
+    # affinity, decomposition and every engine read dense matrices, so it saves no memory, its joins are slower
+    # than the interned masks and it doesn't use the bounds cache. It stays as a check of the rules in SQL.
+    eligibility="python",
+)
+
+# Step 1. tutorials go to everyone, step 2. talks go to reviewers without a tutorial, step 3. talks that are
+# still at the minimum of step 2 get extra reviewers from the tutorial reviewers
+STAGES = dict(
+    tutorials=dict(min_reviews=0, max_reviews=5, min_reviewers=3, max_reviewers=4),
+    talks=dict(min_reviews=5, max_reviews=9, min_reviewers=2, max_reviewers=4),
+    tutorial_reviewer_talks=dict(min_reviews=0, max_reviews=4, min_reviewers=1, max_reviewers=2),
+)
+
+
+def preprocess(data_dir, database_file, force=False, max_memory=None):
+    # Returns (loaded raw tables, rebuilt derived tables). max_memory (like "1GB") bounds DuckDB while loading.
+    import duckdb
+
+    from preprocessing import update_database
+
+    raw_files = {table_name: Path(data_dir) / file_name for table_name, file_name in RAW_FILES.items()}
+    con = duckdb.connect(str(database_file))
+    try:
+        return update_database(con, raw_files, force=force, max_memory=max_memory)
+    finally:
+        con.close()
+
+
+def _load_texts(con):
+    # reviewer_id -> text and submission_id -> text from the tables of preprocessing.py, None if there are none
+    tables = {table_name for (table_name,) in con.sql("select table_name from information_schema.tables").fetchall()}
+    if not {"reviewer_texts", "submission_texts"} <= tables:
+        return None
+    return (
+        dict(con.sql("select reviewer_id, text from reviewer_texts").fetchall()),
+        dict(con.sql("select submission_id, text from submission_texts").fetchall()),
+    )
+
+
+def _feasible_pairs(con, reviewers_table, submissions_table, options):
+    from assign_reviews import load_feasible_pairs
+    from preprocessing import create_feasible_pairs
+
+    con.register("stage_reviewers", reviewers_table)
+    con.register("stage_submissions", submissions_table)
+    try:
+        create_feasible_pairs(
+            con,
+            "stage_reviewers",
+            "stage_submissions",
+            assign_tutorials_to_anyone=options["assign_tutorials_to_anyone"],
+            tutorial_coeff=options["tutorial_coeff"],
+        )
+    finally:
+        con.unregister("stage_reviewers")
+        con.unregister("stage_submissions")
+    return load_feasible_pairs(con)
+
+
+def _solve_stage(con, reviewers_table, submissions_table, limits, options, output_dir, post_fix, texts=None):
+    from assign_reviews import format_and_output_result, solve_milp
+
+    if texts is not None:
+        reviewer_texts, submission_texts = texts
+        texts = (
+            [reviewer_texts.get(reviewer_id, "") for reviewer_id in reviewers_table["reviewer_id"].to_pylist()],
+            [
+                submission_texts.get(submission_id, "")
+                for submission_id in submissions_table["submission_id"].to_pylist()
+            ],
+        )
+    feasible_pairs = None
+    if options["eligibility"] == "duckdb":
+        feasible_pairs = _feasible_pairs(con, reviewers_table, submissions_table, options)
+
+    solution = solve_milp(
+        reviewers_table,
+        submissions_table,
+        limits["min_reviews"],
+        limits["max_reviews"],
+        limits["min_reviewers"],
+        limits["max_reviewers"],
+        options["tutorial_coeff"],
+        options["assign_tutorials_to_anyone"],
+        engine=options["engine"],
+        time_limit=options["time_limit"],
+        mip_rel_gap=options["mip_rel_gap"],
+        presolve=options["presolve"],
+        cache_dir=output_dir / "model-cache" if options["cache"] else None,
+        texts=texts,
+        affinity_weight=options["affinity_weight"],
+        feasible_pairs=feasible_pairs,
+        output_dir=output_dir,
+    )
+    if solution is None:
+        raise RuntimeError(f"No assignment found for stage {post_fix}, see {output_dir / 'solver-report.jsonl'}")
+    return format_and_output_result(
+        reviewers_table, submissions_table, solution, post_fix=post_fix, output_dir=output_dir
+    )
+
+
+def final_limits(stages, has_tutorial, is_tutorial):
+    # Per reviewer and per submission (min, max) of all steps together: tutorial reviewers get their tutorials
+    # plus the talks of step 3, the others the talks of step 2, and talks at the minimum of step 2 get topped up
+    import numpy as np
+
+    tutorials, talks, extra = stages["tutorials"], stages["talks"], stages["tutorial_reviewer_talks"]
+    has_tutorial, is_tutorial = np.asarray(has_tutorial, dtype=bool), np.asarray(is_tutorial, dtype=bool)
+    return (
+        np.where(has_tutorial, tutorials["min_reviews"], talks["min_reviews"]),
+        np.where(has_tutorial, tutorials["max_reviews"] + extra["max_reviews"], talks["max_reviews"]),
+        np.where(is_tutorial, tutorials["min_reviewers"], talks["min_reviewers"]),
+        np.where(
+            is_tutorial,
+            tutorials["max_reviewers"],
+            max(talks["max_reviewers"], talks["min_reviewers"] + extra["max_reviewers"]),
+        ),
+    )
+
+
+def _validate(reviewers_table, submissions_table, assignments, limits, options):
+    from entities import intern_entities
+    from validation import describe_violations, validate_assignments
+
+    entities = intern_entities(reviewers_table, submissions_table)
+    report = validate_assignments(
+        entities, assignments, *limits, assign_tutorials_to_anyone=options["assign_tutorials_to_anyone"]
+    )
+    if not report["valid"]:
+        raise RuntimeError(describe_violations(report))
+    print(describe_violations(report))
+    return report
+
+
+def _store_assignments(con, table_name, df):
+    con.register("assignments_view", df)
+    con.sql(f"create or replace table {table_name} as select * from assignments_view")
+    con.unregister("assignments_view")
+
+
+def assign(database_file, output_dir, stages=None, **options):
+    # Runs the three assignment steps of run-assignments.py on reviewers_to_assign and submissions_to_assign,
+    # writes the per-step JSON files, the reviewer_assignments_0x and submission_assignments_0x tables and
+    # output_dir / "reviewer-assignments.json". Returns the final reviewer -> submission IDs map.
+    import duckdb
+    import numpy as np
+    import pyarrow as pa
+
+    from assign_reviews import load_tables, write_json
+
+    options = {**ASSIGN_DEFAULTS, **options}
+    stages = {name: {**limits, **(stages or {}).get(name, {})} for name, limits in STAGES.items()}
+    output_dir = Path(output_dir)
+    output_dir.mkdir(parents=True, exist_ok=True)
+
+    con = duckdb.connect(str(database_file))
+    try:
+        # Arrow tables straight from DuckDB, with empty assignment columns
+        reviewers_table, submissions_table = load_tables(con)
+        reviewer_ids = reviewers_table["reviewer_id"].to_pylist()
+        submission_ids = submissions_table["submission_id"].to_pylist()
+        assigned_submissions = {reviewer_id: [] for reviewer_id in reviewer_ids}
+        assigned_reviewers = {submission_id: [] for submission_id in submission_ids}
+        texts = _load_texts(con) if options["affinity_weight"] else None
+
+        def with_assignments(table, column, ids, assigned):
+            values = pa.array([assigned[key] for key in ids], type=pa.list_(pa.string()))
+            return table.set_column(table.schema.get_field_index(column), column, values)
+
+        def record(reviewers, submissions, post_fix):
+            for reviewer in reviewers:
+                assigned_submissions[reviewer["reviewer_id"]] += reviewer["assigned_submission_ids"]
+            for submission in submissions:
+                assigned_reviewers[submission["submission_id"]] += submission["assigned_reviewer_ids"]
+            _store_assignments(
+                con,
+                f"reviewer_assignments_{post_fix}",
+                with_assignments(reviewers_table, "assigned_submission_ids", reviewer_ids, assigned_submissions),
+            )
+            _store_assignments(
+                con,
+                f"submission_assignments_{post_fix}",
+                with_assignments(submissions_table, "assigned_reviewer_ids", submission_ids, assigned_reviewers),
+            )
+
+        def subset(table, mask):
+            return table.filter(pa.array(mask))
+
+        # Step 1. Assign tutorial reviewers
+        is_tutorial = submissions_table["track"].to_numpy() == "TUT"
+        reviewers, submissions = _solve_stage(
+            con,
+            reviewers_table,
+            subset(submissions_table, is_tutorial),
+            stages["tutorials"],
+            options,
+            output_dir,
+            "00",
+            texts,
+        )
+        record(reviewers, submissions, "00")
+
+        # Step 2. Assign talk reviewers to everyone without a tutorial
+        has_tutorial = np.array([len(assigned_submissions[reviewer_id]) > 0 for reviewer_id in reviewer_ids], bool)
+        reviewers, submissions = _solve_stage(
+            con,
+            subset(reviewers_table, ~has_tutorial),
+            subset(submissions_table, ~is_tutorial),
+            stages["talks"],
+            options,
+            output_dir,
+            "01",
+            texts,
+        )
+        record(reviewers, submissions, "01")
+
+        # Step 3. Assign talks that only got the minimum number of reviewers to tutorial reviewers
+        n_reviewers = np.array([len(assigned_reviewers[submission_id]) for submission_id in submission_ids], int)
+        few_reviewers = ~is_tutorial & (n_reviewers <= stages["talks"]["min_reviewers"])
+        if few_reviewers.any():
+            reviewers, submissions = _solve_stage(
+                con,
+                subset(reviewers_table, has_tutorial),
+                subset(submissions_table, few_reviewers),
+                stages["tutorial_reviewer_talks"],
+                options,
+                output_dir,
+                "02",
+                texts,
+            )
+        else:
+            reviewers, submissions = [], []
+        record(reviewers, submissions, "02")
+
+        # All steps together, before anything is written
+        limits = final_limits(stages, has_tutorial, is_tutorial)
+        _validate(reviewers_table, submissions_table, assigned_submissions, limits, options)
+    finally:
+        con.close()
+
+    write_json(output_dir / "reviewer-assignments.json", assigned_submissions)
+    return assigned_submissions
+
+
+def load_config(config_file):
+    # TOML file with a [preprocess] table, an [assign] table and optional [assign.stages.<name>] tables
+    import tomllib
+
+    with open(config_file, "rb") as fp:
+        config = tomllib.load(fp)
+    unknown = set(config.get("assign", {}).get("stages", {})) - set(STAGES)
+    if unknown:
+        raise ValueError(f"Unknown stages {sorted(unknown)} in {config_file}, expected some of {list(STAGES)}")
+    return config
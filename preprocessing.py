@@ -0,0 +1,446 @@
+# %%
+###################
+## PREPROCESSING ##
+###################
+# SQL for the pre-processing stage. Raw CSV exports are only re-read when their content hash changes,
+# and only the derived tables downstream of a changed file are rebuilt. Raw files are read with declared
+# column types instead of sniffed ones, and tables are shown as a preview instead of a full DataFrame.
+# Conflicts of interest are resolved with equality joins on exploded key tables of normalized names and
+# speaker IDs, which DuckDB runs as hash joins, instead of substring joins, which it can only run as
+# nested loops and which match one name or ID inside another.
+import csv
+import hashlib
+import json
+from contextlib import contextmanager
+from pathlib import Path
+
+MANIFEST = """
+create table if not exists ingest_manifest (
+    table_name varchar primary key,
+    file_name varchar,
+    sha256 varchar,
+    size_bytes bigint,
+    columns varchar,
+    loaded_at timestamp
+)
+"""
+
+MACROS = [
+    # Lowercase, strip accents and collapse everything but letters and digits into single spaces
+    """
+    create or replace macro normalize_name(name) as
+        trim(regexp_replace(lower(strip_accents(name)), '[^a-z0-9]+', ' ', 'g'))
+    """,
+    # Every run of n consecutive words of a normalized text
+    """
+    create or replace macro word_ngrams(text, n) as
+        list_transform(
+            range(1, len(string_split(text, ' ')) - n + 2),
+            i -> array_to_string(string_split(text, ' ')[i:i + n - 1], ' ')
+        )
+    """,
+]
+
+COI_KEY_TABLES = dict(
+    # One row per speaker of a submission, split on the newlines of the pretalx export
+    submission_speakers="""
+        select distinct submission_id, trim(speaker_id) as speaker_id
+        from (select ID as submission_id, unnest(string_split("Speaker IDs", '\n')) as speaker_id from pretalx_sessions)
+        where trim(speaker_id) <> ''
+    """,
+    speaker_keys="""
+        select
+            ID as speaker_id,
+            Name as speaker_name,
+            normalize_name(Name) as name_key,
+            len(string_split(normalize_name(Name), ' ')) as n_words
+        from pretalx_speakers
+        where normalize_name(Name) <> ''
+    """,
+    coi_author_keys="""
+        select distinct
+            author,
+            normalize_name(author) as author_key,
+            len(string_split(normalize_name(author), ' ')) as n_words
+        from coi_authors
+        where normalize_name(author) <> ''
+    """,
+    # Speakers whose whole name shows up as consecutive words of an author entry of the COI form, which
+    # may also name an affiliation. Only n-grams as long as some speaker name are generated.
+    coi_author_speakers="""
+        with author_ngrams as (
+            select author, unnest(word_ngrams(author_key, n)) as key
+            from coi_author_keys, (select distinct n_words as n from speaker_keys)
+            where n <= n_words
+        )
+        select distinct author, speaker_id, speaker_name
+        from author_ngrams
+        join speaker_keys on author_ngrams.key = speaker_keys.name_key
+    """,
+    # Author entries of the COI form that show up as consecutive words of a reviewer's answer
+    reviewer_coi_authors="""
+        with coi_ngrams as (
+            select distinct name, email, unnest(word_ngrams(normalize_name(coi), n)) as key
+            from reviewers, (select distinct n_words as n from coi_author_keys)
+        )
+        select distinct name, email, author
+        from coi_ngrams
+        join coi_author_keys on coi_ngrams.key = coi_author_keys.author_key
+    """,
+    # Submissions of the reviewers who are also speakers, matched on normalized names: their own talks
+    reviewer_submissions="""
+        select distinct reviewers.name, reviewers.email, submission_speakers.submission_id
+        from reviewers
+        join speaker_keys on speaker_keys.name_key = normalize_name(reviewers.name)
+        join submission_speakers on submission_speakers.speaker_id = speaker_keys.speaker_id
+    """,
+)
+
+# The submissions of the speakers named in a reviewer's COI answer, plus the reviewer's own submissions
+REVIEWERS_WITH_COI = """
+with
+    coi as (
+        select
+            reviewers.name,
+            reviewers.email,
+            list(coi_author_speakers.speaker_name) as speakers,
+            list(coi_author_speakers.speaker_id) as speaker_ids,
+            list(submission_speakers.submission_id) as submission_ids
+        from
+            reviewers
+            left join reviewer_coi_authors
+                on reviewer_coi_authors.name = reviewers.name and reviewer_coi_authors.email = reviewers.email
+            left join coi_author_speakers on coi_author_speakers.author = reviewer_coi_authors.author
+            left join submission_speakers on submission_speakers.speaker_id = coi_author_speakers.speaker_id
+        group by reviewers.name, reviewers.email
+    ),
+    own as (select name, email, list(submission_id) as submission_ids from reviewer_submissions group by name, email)
+select
+    coi.name,
+    coi.email,
+    coi.speakers,
+    coi.speaker_ids,
+    if(
+        own.submission_ids is null,
+        coi.submission_ids,
+        list_distinct(list_concat(coi.submission_ids, own.submission_ids))
+    ) as submission_ids
+from coi
+    left join own on own.name = coi.name and own.email = coi.email
+order by coi.name
+"""
+
+
+def create_reviewers_with_coi(con):
+    # Needs the reviewers, coi_authors, pretalx_speakers and pretalx_sessions tables
+    for macro in MACROS:
+        con.sql(macro)
+    for table_name, query in COI_KEY_TABLES.items():
+        con.sql(f"create or replace table {table_name} as {query}")
+    con.sql(f"create or replace table reviewers_with_coi as {REVIEWERS_WITH_COI}")
+
+
+# All reviewers who signed up, created an account on pretalx and submitted the COI form
+REVIEWERS = """
+select distinct
+    scipy_reviewers.Name as name,
+    scipy_reviewers.Email as email,
+    "Track(s) to review for (check all that apply)" as tracks,
+    "Mark the speaker(s) or company/organization/affiliation(s) that could pose a conflict of interest" as coi
+from scipy_reviewers
+join pretalx_reviewers on scipy_reviewers.Email = pretalx_reviewers.Email
+join coi_reviewers on coi_reviewers.Email = pretalx_reviewers.Email
+"""
+
+REVIEWERS_WITH_TRACKS = """
+select reviewers.name, email, list(tracks.name) as tracks, list(tracks.track_id) as track_ids from reviewers
+    join tracks on instr(reviewers.tracks, tracks.name)
+    group by reviewers.name, email
+"""
+
+REVIEWERS_TO_ASSIGN = """
+select
+    reviewers_with_coi.email as reviewer_id,
+    reviewers_with_tracks.track_ids as tracks,
+    reviewers_with_coi.submission_ids as conflicts_submission_ids
+from reviewers_with_coi
+join reviewers_with_tracks on reviewers_with_tracks.email = reviewers_with_coi.email
+"""
+
+SUBMISSIONS_TO_ASSIGN = """
+select
+    ID as submission_id,
+    string_split("Speaker IDs", '\n') as author_ids,
+    track_id as track
+from pretalx_sessions
+    join tracks on pretalx_sessions.Track = tracks.name
+"""
+
+# Columns of the pretalx session export that describe a submission, those missing from the export are skipped
+SUBMISSION_TEXT_COLUMNS = ("Proposal title", "Title", "Abstract", "Description")
+
+
+def create_submission_texts(con):
+    # Needs the pretalx_sessions table
+    columns = {name for name, *_ in con.sql("describe pretalx_sessions").fetchall()}
+    texts = [f"coalesce(\"{column}\", '')" for column in SUBMISSION_TEXT_COLUMNS if column in columns]
+    text = f"concat_ws(' ', {', '.join(texts)})" if texts else "''"
+    con.sql(
+        f"create or replace table submission_texts as select ID as submission_id, {text} as text from pretalx_sessions"
+    )
+
+
+# The texts of the submissions of every reviewer who is also a speaker, as a description of their expertise.
+# Those submissions are conflicts of the reviewer (see REVIEWERS_WITH_COI), so they never score against themselves.
+REVIEWER_TEXTS = """
+select
+    reviewers.email as reviewer_id,
+    coalesce(string_agg(distinct submission_texts.text, ' '), '') as text
+from
+    reviewers
+    left join reviewer_submissions on reviewer_submissions.name = reviewers.name
+        and reviewer_submissions.email = reviewers.email
+    left join submission_texts on submission_texts.submission_id = reviewer_submissions.submission_id
+group by reviewers.email
+"""
+
+# Derived tables in build order, with the tables they are built from and their query, or a function that
+# creates them from a connection
+DERIVED_TABLES = dict(
+    reviewers=(("scipy_reviewers", "pretalx_reviewers", "coi_reviewers"), REVIEWERS),
+    reviewers_with_tracks=(("reviewers", "tracks"), REVIEWERS_WITH_TRACKS),
+    reviewers_with_coi=(
+        ("reviewers", "coi_authors", "pretalx_speakers", "pretalx_sessions"),
+        create_reviewers_with_coi,
+    ),
+    reviewers_to_assign=(("reviewers_with_coi", "reviewers_with_tracks"), REVIEWERS_TO_ASSIGN),
+    submissions_to_assign=(("pretalx_sessions", "tracks"), SUBMISSIONS_TO_ASSIGN),
+    submission_texts=(("pretalx_sessions",), create_submission_texts),
+    reviewer_texts=(("reviewers", "reviewers_with_coi", "submission_texts"), REVIEWER_TEXTS),
+)
+
+
+# Eligible reviewer x submission pairs of one assignment step, set-based: reviewer tracks are unnested and joined
+# to the submission tracks, tutorials optionally go to everyone, and declared conflicts are anti-joined away.
+# Pre-assigned pairs are always kept, is_eligible tells whether they may still be assigned. Reviewers and
+# submissions are numbered in the order of their IDs (see reviewer_index and submission_index), and IDs are
+# swapped for those numbers before the big joins, so those only compare integers.
+FEASIBLE_PAIRS = """
+with
+    reviewer_tracks as (
+        select distinct reviewer_idx, unnest(tracks)::varchar as track
+        from {reviewers} join reviewer_index using (reviewer_id)
+    ),
+    conflicts as (
+        select distinct reviewer_idx, submission_idx
+        from (select reviewer_id, unnest(conflicts_submission_ids)::varchar as submission_id from {reviewers})
+        join reviewer_index using (reviewer_id)
+        join submission_index using (submission_id)
+    ),
+    preassigned as (
+        select distinct reviewer_idx, submission_idx, track
+        from (select reviewer_id, unnest(assigned_submission_ids)::varchar as submission_id from {reviewers})
+        join reviewer_index using (reviewer_id)
+        join submission_index using (submission_id)
+    ),
+    eligible as (
+        select reviewer_idx, submission_idx, track
+        from reviewer_tracks join submission_index using (track)
+        where not ($anyone and track = 'TUT')
+        union all
+        select reviewer_idx, submission_idx, track
+        from reviewer_index, submission_index
+        where $anyone and track = 'TUT'
+    ),
+    allowed as (select * from eligible anti join conflicts using (reviewer_idx, submission_idx)),
+    -- The few pre-assigned pairs are checked against the same rules on their own, so the big join below
+    -- only has to build a hash table of them
+    preassigned_pairs as (
+        select
+            preassigned.*,
+            true as is_preassigned,
+            (reviewer_tracks.reviewer_idx is not null or ($anyone and track = 'TUT'))
+                and conflicts.reviewer_idx is null as is_eligible
+        from
+            preassigned
+            left join reviewer_tracks using (reviewer_idx, track)
+            left join conflicts using (reviewer_idx, submission_idx)
+    ),
+    pairs as (
+        select *, false as is_preassigned, true as is_eligible
+        from allowed anti join preassigned using (reviewer_idx, submission_idx)
+        union all
+        select * from preassigned_pairs
+    )
+select
+    reviewer_idx,
+    submission_idx,
+    is_preassigned,
+    is_eligible,
+    case when track = 'TUT' then $tutorial_coeff else 1.0 end as weight
+from pairs
+"""
+
+
+def create_feasible_pairs(
+    con,
+    reviewers="reviewers_to_assign",
+    submissions="submissions_to_assign",
+    assign_tutorials_to_anyone=False,
+    tutorial_coeff=0.8,
+):
+    # reviewers and submissions are tables or views shaped like reviewers_to_assign and submissions_to_assign,
+    # reviewers may also have an assigned_submission_ids column. Creates reviewer_index, submission_index and
+    # feasible_pairs, where weight is the value of a review, tutorial_coeff for tutorials and 1 otherwise. They are
+    # temporary tables, they only live as long as the connection and are never written to the database file.
+    con.sql(f"""
+        create or replace temp table reviewer_index as
+        select reviewer_id, (row_number() over (order by reviewer_id) - 1)::integer as reviewer_idx from {reviewers}
+    """)
+    con.sql(f"""
+        create or replace temp table submission_index as
+        select submission_id, track, (row_number() over (order by submission_id) - 1)::integer as submission_idx
+        from {submissions}
+    """)
+    if "assigned_submission_ids" not in con.sql(f"select * from {reviewers} limit 0").columns:
+        reviewers = f"(select *, []::varchar[] as assigned_submission_ids from {reviewers})"
+    con.execute(
+        f"create or replace temp table feasible_pairs as {FEASIBLE_PAIRS.format(reviewers=reviewers)}",
+        {"anyone": bool(assign_tutorials_to_anyone), "tutorial_coeff": float(tutorial_coeff)},
+    )
+
+
+# Columns the queries above need from every raw file and their types. Every column, also the ones that look like
+# numbers (IDs, durations), is read as VARCHAR unless declared otherwise, so multi-event exports always load with
+# the same types. Files may have more columns than these.
+RAW_SCHEMAS = dict(
+    scipy_reviewers={"Name": "VARCHAR", "Email": "VARCHAR", "Track(s) to review for (check all that apply)": "VARCHAR"},
+    pretalx_sessions={"ID": "VARCHAR", "Speaker IDs": "VARCHAR", "Track": "VARCHAR"},
+    pretalx_speakers={"ID": "VARCHAR", "Name": "VARCHAR"},
+    pretalx_reviewers={"Email": "VARCHAR"},
+    coi_reviewers={
+        "Email": "VARCHAR",
+        "Mark the speaker(s) or company/organization/affiliation(s) that could pose a conflict of interest": "VARCHAR",
+    },
+    coi_authors={"author": "VARCHAR"},
+    tracks={"name": "VARCHAR", "track_id": "VARCHAR"},
+)
+
+
+def read_header(file_name):
+    # Column names of a CSV file from its first record only, quoted newlines included
+    with open(file_name, newline="", encoding="utf-8-sig") as fp:
+        return next(csv.reader(fp), [])
+
+
+def raw_columns(table_name, file_name):
+    # Name -> type of every column of a raw file, in file order, from RAW_SCHEMAS and VARCHAR for the rest
+    header = read_header(file_name)
+    schema = RAW_SCHEMAS.get(table_name, {})
+    missing = [column for column in schema if column not in header]
+    if missing:
+        raise ValueError(f"{file_name} has no column {', '.join(map(repr, missing))} for {table_name}")
+    return {column: schema.get(column, "VARCHAR") for column in header}
+
+
+def preview_table(con, table_name, n=5):
+    # The first n rows as a DataFrame and the row and non-null counts per column, without materializing the table
+    columns = [name for name, *_ in con.sql(f"describe {table_name}").fetchall()]
+    counts = ", ".join(["count(*)", *(f'count("{column}")' for column in columns)])
+    n_rows, *non_null = con.sql(f"select {counts} from {table_name}").fetchone()
+    return dict(
+        table_name=table_name,
+        n_rows=n_rows,
+        non_null=dict(zip(columns, non_null)),
+        head=con.sql(f"select * from {table_name} limit {int(n)}").df(),
+    )
+
+
+def file_sha256(file_name, chunk_size=2**20):
+    digest = hashlib.sha256()
+    with open(file_name, "rb") as fp:
+        while chunk := fp.read(chunk_size):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def _table_exists(con, table_name):
+    query = "select count(*) from information_schema.tables where table_name = ?"
+    return con.execute(query, [table_name]).fetchone()[0] > 0
+
+
+@contextmanager
+def memory_limit(con, limit):
+    # DuckDB memory limit (like "1GB") for the duration of the block, past it DuckDB spills to disk.
+    # Afterwards the limit goes back to the default.
+    if limit is None:
+        yield
+        return
+    con.execute("set memory_limit = ?", [limit])
+    try:
+        yield
+    finally:
+        con.sql("reset memory_limit")
+
+
+def ingest_raw_files(con, raw_files, force=False, max_memory=None):
+    # Load every raw CSV whose content hash differs from the one recorded in ingest_manifest, or whose table
+    # is missing, and record its hash and schema. Returns the names of the tables that were (re)loaded.
+    # DuckDB streams each file into its table in fixed-size buffers, max_memory bounds what it holds at once.
+    con.sql(MANIFEST)
+    recorded = dict(con.sql("select table_name, sha256 from ingest_manifest").fetchall())
+    loaded = []
+    for table_name, file_name in raw_files.items():
+        sha256 = file_sha256(file_name)
+        if not force and recorded.get(table_name) == sha256 and _table_exists(con, table_name):
+            continue
+        with memory_limit(con, max_memory):
+            con.execute(
+                f"create or replace table {table_name} as select * from read_csv(?, header=true, columns=?)",
+                [str(file_name), raw_columns(table_name, file_name)],
+            )
+        columns = con.sql(f"describe {table_name}").fetchall()
+        con.execute(
+            "insert or replace into ingest_manifest values (?, ?, ?, ?, ?, current_timestamp)",
+            [
+                table_name,
+                str(file_name),
+                sha256,
+                Path(file_name).stat().st_size,
+                json.dumps([[name, column_type] for name, column_type, *_ in columns]),
+            ],
+        )
+        loaded.append(table_name)
+    return loaded
+
+
+def rebuild_derived_tables(con, changed, force=False):
+    # Rebuild the derived tables downstream of the changed tables, and any that don't exist yet.
+    # Returns the names of the rebuilt tables in build order.
+    changed = set(changed)
+    rebuilt = []
+    for table_name, (dependencies, build) in DERIVED_TABLES.items():
+        if not (force or changed.intersection(dependencies) or not _table_exists(con, table_name)):
+            continue
+        if callable(build):
+            build(con)
+        else:
+            con.sql(f"create or replace table {table_name} as {build}")
+        changed.add(table_name)
+        rebuilt.append(table_name)
+    return rebuilt
+
+
+def update_database(con, raw_files, force=False, max_memory=None):
+    # Incremental pre-processing: returns (loaded raw tables, rebuilt derived tables). Loading and rebuilding are
+    # one transaction, so when a rebuild fails or is interrupted the manifest keeps the old hashes and the next
+    # run loads the changed files and rebuilds their derived tables again.
+    con.begin()
+    try:
+        loaded = ingest_raw_files(con, raw_files, force=force, max_memory=max_memory)
+        rebuilt = rebuild_derived_tables(con, loaded, force=force)
+    except BaseException:
+        con.rollback()
+        raise
+    con.commit()
+    return loaded, rebuilt
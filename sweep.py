@@ -0,0 +1,134 @@
+# %%
+###########
+## SWEEP ##
+###########
+# Parameter sweeps for one assignment step of run-assignments.py: every combination of a grid of limits and
+# tutorial coefficients is screened and solved in a process pool, and the outcomes come back as one table.
+# The feasible-pair structure is built once and handed to every worker once, read-only, when it starts.
+import itertools
+import time
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+
+import numpy as np
+import pandas as pd
+
+from assign_reviews import create_lb_ub, screen_feasibility, solve_model
+from pipeline import ASSIGN_DEFAULTS, STAGES
+
+PARAMETERS = ("min_reviews", "max_reviews", "min_reviewers", "max_reviewers", "tutorial_coeff")
+
+# Set by _init_worker in every worker process, and in the parent for serial sweeps
+_shared = {}
+
+
+def _init_worker(lb, ub, is_tutorial, submission_tracks):
+    lb.flags.writeable = False
+    ub.flags.writeable = False
+    _shared.update(lb=lb, ub=ub, is_tutorial=is_tutorial, submission_tracks=submission_tracks)
+
+
+def expand_grid(grid, base=None):
+    # All combinations of the values in grid, on top of base, in the order of the grid
+    unknown = set(grid) - set(PARAMETERS)
+    if unknown:
+        raise ValueError(f"Unknown sweep parameters {sorted(unknown)}, expected some of {PARAMETERS}")
+    base = base or {}
+    missing = set(PARAMETERS) - set(grid) - set(base)
+    if missing:
+        raise ValueError(f"No value for {sorted(missing)}, sweep them or pick a stage")
+    names = list(grid)
+    return [{**base, **dict(zip(names, values))} for values in itertools.product(*(grid[name] for name in names))]
+
+
+def _solve_point(point, engine, feasible_pairs_only, solver_options):
+    lb, ub = _shared["lb"], _shared["ub"]
+    n_reviewers, n_submissions = lb.shape
+    limits = [point[name] for name in PARAMETERS[:4]]
+
+    start = time.perf_counter()
+    report = {}
+    screening = screen_feasibility(lb, ub, *limits, submission_tracks=_shared["submission_tracks"])
+    if screening["feasible"]:
+        costs = np.where(_shared["is_tutorial"], -point["tutorial_coeff"], -1.0)
+        objective_fun = np.tile(costs, (n_reviewers, 1))
+        solution = solve_model(
+            objective_fun,
+            lb,
+            ub,
+            *limits,
+            feasible_pairs_only=feasible_pairs_only,
+            engine=engine,
+            report=report,
+            **solver_options,
+        )
+    else:
+        solution = None
+        report.update(
+            status=2,
+            message=(
+                f"screening: {len(screening['submissions'])} submissions, {len(screening['tracks'])} tracks "
+                f"and {len(screening['reviewers'])} reviewers fall short"
+            ),
+        )
+    seconds = time.perf_counter() - start
+
+    row = {
+        **point,
+        "feasible": solution is not None,
+        "status": report.get("status"),
+        "objective": np.nan,
+        "n_reviews": 0,
+        "coverage": np.nan,
+        "min_reviewers_assigned": 0,
+        "reviewers_used": 0.0,
+        "seconds": seconds,
+        "message": report.get("message"),
+    }
+    if solution is not None:
+        reviewers_per_submission = solution.sum(axis=0)
+        row.update(
+            objective=float(objective_fun[solution].sum()),
+            n_reviews=int(solution.sum()),
+            # Share of the review slots up to max_reviewers that got filled
+            coverage=float(solution.sum() / max(1, n_submissions * point["max_reviewers"])),
+            min_reviewers_assigned=int(reviewers_per_submission.min(initial=0)),
+            reviewers_used=float(solution.any(axis=1).mean()) if n_reviewers else 0.0,
+        )
+    return row
+
+
+def sweep(
+    df_reviewers,
+    df_submissions,
+    grid,
+    stage=None,
+    assign_tutorials_to_anyone=False,
+    engine="milp",
+    feasible_pairs_only=True,
+    n_jobs=None,
+    **solver_options,
+):
+    # grid maps some of PARAMETERS to the values to try, the others come from the stage defaults in
+    # pipeline.STAGES. Returns a DataFrame with one row per combination: the parameters, whether it is
+    # feasible, the objective, the number of reviews, the share of review slots filled (coverage),
+    # the fewest reviewers any submission got, the share of reviewers used and the solve time.
+    base = {**STAGES[stage], "tutorial_coeff": ASSIGN_DEFAULTS["tutorial_coeff"]} if stage is not None else None
+    points = expand_grid(grid, base)
+
+    lb, ub = create_lb_ub(
+        df_reviewers.to_dict("records"), df_submissions.to_dict("records"), assign_tutorials_to_anyone
+    )
+    submission_tracks = np.asarray(df_submissions["track"], dtype=object)
+    shared = (lb, ub, submission_tracks == "TUT", submission_tracks)
+
+    solve_point = partial(
+        _solve_point, engine=engine, feasible_pairs_only=feasible_pairs_only, solver_options=solver_options
+    )
+    if len(points) > 1 and n_jobs != 1:
+        with ProcessPoolExecutor(max_workers=n_jobs, initializer=_init_worker, initargs=shared) as pool:
+            rows = list(pool.map(solve_point, points))
+    else:
+        _init_worker(*shared)
+        rows = [solve_point(point) for point in points]
+    return pd.DataFrame(rows)
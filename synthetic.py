@@ -0,0 +1,100 @@
+# %%
+##########################
+## SYNTHETIC CONFERENCE ##
+##########################
+# Seeded generator for reviewer and submission tables shaped like reviewers_to_assign and
+# submissions_to_assign, so the assignment pipeline can be tested and benchmarked without the pretalx exports
+import numpy as np
+import pandas as pd
+
+# Roughly the size of one SciPy conference review round
+BASE_REVIEWERS = 150
+BASE_SUBMISSIONS = 250
+
+TUTORIAL_TRACK = "TUT"
+TALK_TRACKS = ["GEN", "ML", "DATA", "HPC", "VIS", "BIO", "EARTH", "PHYS", "EDU", "MAINT", "SOC"]
+
+
+def _codes(rng, n, length=6):
+    # Unique pretalx-style uppercase codes
+    codes = set()
+    while len(codes) < n:
+        letters = rng.integers(0, 26, size=(n - len(codes), length))
+        codes.update("".join(chr(65 + c) for c in row) for row in letters)
+    return rng.permutation(sorted(codes)).tolist()
+
+
+def generate_conference(
+    scale=1.0,
+    seed=0,
+    tutorial_share=0.1,
+    tutorial_reviewer_share=0.25,
+    conflicts_per_reviewer=0.8,
+    in_track_conflict_share=0.8,
+):
+    rng = np.random.default_rng(seed)
+    n_reviewers = max(1, round(BASE_REVIEWERS * scale))
+    n_submissions = max(1, round(BASE_SUBMISSIONS * scale))
+
+    # Track popularity falls off like Zipf's law: a few big tracks and a long tail of small ones
+    popularity = 1 / np.arange(1, len(TALK_TRACKS) + 1)
+    popularity /= popularity.sum()
+
+    submission_ids = _codes(rng, n_submissions)
+    submission_tracks = np.where(
+        rng.random(n_submissions) < tutorial_share,
+        TUTORIAL_TRACK,
+        rng.choice(TALK_TRACKS, size=n_submissions, p=popularity),
+    )
+
+    # One to three speakers per submission from a shared pool, so some speakers have several submissions
+    n_speakers = max(1, round(1.2 * n_submissions))
+    speaker_ids = _codes(rng, n_speakers, length=5)
+    n_authors = rng.choice([1, 2, 3], size=n_submissions, p=[0.6, 0.3, 0.1])
+    authors = np.split(rng.integers(0, n_speakers, size=n_authors.sum()), np.cumsum(n_authors)[:-1])
+    submissions_by_speaker = [[] for _ in range(n_speakers)]
+    for j, speakers in enumerate(authors):
+        for speaker in speakers:
+            submissions_by_speaker[speaker].append(j)
+    speakers_by_track = {
+        track: np.unique(np.concatenate([authors[j] for j in np.flatnonzero(submission_tracks == track)] or [[]]))
+        for track in [TUTORIAL_TRACK, *TALK_TRACKS]
+    }
+
+    # Reviewers sign up for one to four talk tracks, preferring popular ones, and some also review tutorials
+    reviewer_tracks = []
+    for n_tracks, tutorials in zip(
+        rng.integers(1, 5, size=n_reviewers), rng.random(n_reviewers) < tutorial_reviewer_share
+    ):
+        tracks = rng.choice(TALK_TRACKS, size=n_tracks, replace=False, p=popularity).tolist()
+        reviewer_tracks.append([TUTORIAL_TRACK] + tracks if tutorials else tracks)
+
+    # Most reviewers declare no conflicts, the rest name a few speakers, mostly from their own tracks.
+    # A conflict with a speaker covers every submission of that speaker.
+    conflicts = []
+    for tracks, n_conflicts in zip(reviewer_tracks, rng.poisson(conflicts_per_reviewer, size=n_reviewers)):
+        own = np.concatenate([speakers_by_track[track] for track in tracks]).astype(np.intp)
+        speakers = [
+            rng.choice(own) if own.size and rng.random() < in_track_conflict_share else rng.integers(n_speakers)
+            for _ in range(n_conflicts)
+        ]
+        conflict_ids = {submission_ids[j] for speaker in speakers for j in submissions_by_speaker[speaker]}
+        conflicts.append(sorted(conflict_ids))
+
+    df_reviewers = pd.DataFrame(
+        {
+            "reviewer_id": [f"reviewer{i:05d}@example.org" for i in range(n_reviewers)],
+            "tracks": reviewer_tracks,
+            "conflicts_submission_ids": conflicts,
+            "assigned_submission_ids": [[] for _ in range(n_reviewers)],
+        }
+    )
+    df_submissions = pd.DataFrame(
+        {
+            "submission_id": submission_ids,
+            "author_ids": [[speaker_ids[speaker] for speaker in speakers] for speakers in authors],
+            "track": submission_tracks,
+            "assigned_reviewer_ids": [[] for _ in range(n_submissions)],
+        }
+    )
+    return df_reviewers, df_submissions
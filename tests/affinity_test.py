@@ -0,0 +1,50 @@
+import numpy as np
+import pandas as pd
+
+from affinity import affinity_matrix, tfidf, tokenize
+from assign_reviews import solve_milp
+
+REVIEWER_TEXTS = ["Sparse linear algebra on GPUs", "", "Deep learning for image segmentation"]
+SUBMISSION_TEXTS = ["Fast sparse solvers for GPUs", "Segmentation of microscopy images with deep learning", "Astronomy"]
+
+
+def test_tokenize():
+    assert tokenize("The GPU-accelerated solver, for 3D data!") == ["gpu", "accelerated", "solver", "3d", "data"]
+    assert tokenize(None) == []
+
+
+def test_tfidf_is_cosine_similarity():
+    reviewer_vectors, submission_vectors = tfidf(REVIEWER_TEXTS, SUBMISSION_TEXTS)
+
+    assert reviewer_vectors.shape[0] == 3 and submission_vectors.shape[0] == 3
+    norms = np.sqrt(reviewer_vectors.multiply(reviewer_vectors).sum(axis=1))
+    np.testing.assert_allclose(norms, [1, 0, 1])
+    similarity = (reviewer_vectors @ submission_vectors.T).toarray()
+    assert similarity[0].argmax() == 0 and similarity[2].argmax() == 1
+
+
+def test_affinity_matrix_only_scores_feasible_pairs():
+    ub = np.ones((3, 3))
+    ub[0, 0] = 0
+    affinity = affinity_matrix(REVIEWER_TEXTS, SUBMISSION_TEXTS, ub)
+    reviewer_vectors, submission_vectors = tfidf(REVIEWER_TEXTS, SUBMISSION_TEXTS)
+
+    np.testing.assert_allclose(affinity, (reviewer_vectors @ submission_vectors.T).toarray() * ub)
+    assert affinity[2, 1] > 0 and affinity[1].sum() == 0
+
+
+def test_solve_milp_prefers_matching_expertise():
+    df_reviewers = pd.DataFrame(
+        {
+            "reviewer_id": ["gpu@x.org", "vision@x.org"],
+            "tracks": [["ML"], ["ML"]],
+            "conflicts_submission_ids": [[], []],
+            "assigned_submission_ids": [[], []],
+        }
+    )
+    df_submissions = pd.DataFrame({"submission_id": ["S1", "S2"], "track": ["ML", "ML"]})
+    texts = (["Sparse GPU solvers", "Deep learning for images"], ["Deep image segmentation", "GPU sparse kernels"])
+
+    # One review per reviewer and submission: without texts both matchings are optimal
+    solution = solve_milp(df_reviewers, df_submissions, 1, 1, 1, 1, 0.8, False, texts=texts)
+    np.testing.assert_array_equal(solution, [[False, True], [True, False]])
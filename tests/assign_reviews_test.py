@@ -0,0 +1,536 @@
+import json
+import time
+
+import duckdb
+import numpy as np
+import pandas as pd
+import pytest
+from scipy.optimize import Bounds, LinearConstraint
+
+import assign_reviews
+from assign_reviews import (
+    create_constraints,
+    create_lb_ub,
+    create_lb_ub_arrow,
+    create_objective_fun,
+    find_components,
+    load_tables,
+    repair_assignments,
+    screen_feasibility,
+    solve_milp,
+    solve_relaxation,
+)
+
+
+@pytest.fixture
+def df_reviewers():
+    return pd.DataFrame(
+        {
+            "reviewer_id": ["a@x.org", "b@x.org", "c@x.org", "d@x.org"],
+            "tracks": [["TUT", "ML"], ["ML"], ["ML", "VIS"], ["VIS", "TUT"]],
+            "conflicts_submission_ids": [["S2"], [], ["S4"], []],
+            "assigned_submission_ids": [[], ["S2"], [], []],
+        }
+    )
+
+
+@pytest.fixture
+def df_submissions():
+    return pd.DataFrame(
+        {
+            "submission_id": ["S1", "S2", "S3", "S4", "S5"],
+            "track": ["TUT", "ML", "ML", "VIS", "VIS"],
+        }
+    )
+
+
+def create_lb_ub_reference(reviewers, submissions, assign_tutorials_to_anyone):
+    # Original pairwise implementation of create_lb_ub
+    lb = np.zeros((len(reviewers), len(submissions)))
+    ub = np.zeros((len(reviewers), len(submissions)))
+    for i, reviewer in enumerate(reviewers):
+        for j, submission in enumerate(submissions):
+            in_domain = submission["track"] in reviewer["tracks"] or (
+                assign_tutorials_to_anyone and submission["track"] == "TUT"
+            )
+            no_conflict = submission["submission_id"] not in reviewer["conflicts_submission_ids"]
+            ub[i, j] = in_domain and no_conflict
+            lb[i, j] = submission["submission_id"] in reviewer["assigned_submission_ids"]
+    return lb, ub
+
+
+@pytest.mark.parametrize("assign_tutorials_to_anyone", [False, True])
+def test_create_lb_ub_matches_reference(assign_tutorials_to_anyone):
+    rng = np.random.default_rng(42)
+    tracks = ["TUT", "ML", "VIS", "HPC", "EDU"]
+    submissions = [{"submission_id": f"S{j}", "track": rng.choice(tracks)} for j in range(40)]
+    submission_ids = [submission["submission_id"] for submission in submissions]
+    reviewers = [
+        {
+            "tracks": np.array(rng.choice(tracks + ["NOPE"], size=rng.integers(0, 4), replace=False)),
+            "conflicts_submission_ids": list(rng.choice(submission_ids, size=rng.integers(0, 3))) + [None],
+            "assigned_submission_ids": list(rng.choice(submission_ids, size=rng.integers(0, 2))),
+        }
+        for _ in range(25)
+    ]
+
+    lb, ub = create_lb_ub(reviewers, submissions, assign_tutorials_to_anyone)
+    expected_lb, expected_ub = create_lb_ub_reference(reviewers, submissions, assign_tutorials_to_anyone)
+
+    np.testing.assert_array_equal(lb, expected_lb)
+    np.testing.assert_array_equal(ub, expected_ub)
+
+
+@pytest.mark.parametrize("assign_tutorials_to_anyone", [False, True])
+def test_create_lb_ub_arrow_matches_records(df_reviewers, df_submissions, assign_tutorials_to_anyone):
+    con = duckdb.connect()
+    con.sql("create table reviewers_to_assign as select * from df_reviewers")
+    con.sql("create table submissions_to_assign as select * from df_submissions")
+    reviewers, submissions = load_tables(con)
+
+    assert submissions.column("assigned_reviewer_ids").to_pylist() == [[]] * len(df_submissions)
+    lb, ub = create_lb_ub_arrow(reviewers, submissions, assign_tutorials_to_anyone)
+    lb_ref, ub_ref = create_lb_ub(
+        df_reviewers.to_dict("records"),
+        df_submissions.assign(assigned_reviewer_ids=[[]] * len(df_submissions)).to_dict("records"),
+        assign_tutorials_to_anyone,
+    )
+    np.testing.assert_array_equal(lb, lb_ref)
+    np.testing.assert_array_equal(ub, ub_ref)
+
+    solution = solve_milp(reviewers, submissions, 1, 3, 1, 2, 0.8, assign_tutorials_to_anyone)
+    np.testing.assert_array_equal(
+        solution, solve_milp(df_reviewers, df_submissions, 1, 3, 1, 2, 0.8, assign_tutorials_to_anyone)
+    )
+
+
+def test_format_and_output_result_arrow(tmp_path, df_reviewers, df_submissions):
+    con = duckdb.connect()
+    con.sql("create table reviewers_to_assign as select * from df_reviewers")
+    con.sql("create table submissions_to_assign as select * from df_submissions")
+    reviewers, submissions = load_tables(con)
+    solution = solve_milp(reviewers, submissions, 1, 3, 1, 2, 0.8, True)
+
+    (tmp_path / "arrow").mkdir()
+    (tmp_path / "pandas").mkdir()
+    arrow = assign_reviews.format_and_output_result(reviewers, submissions, solution, output_dir=tmp_path / "arrow")
+    frames = assign_reviews.format_and_output_result(
+        df_reviewers, df_submissions, solution, output_dir=tmp_path / "pandas"
+    )
+    for name in ["review-assignments.json", "submission-assignments.json", "review-assignments-debug.json"]:
+        assert (tmp_path / "arrow" / name).read_text() == (tmp_path / "pandas" / name).read_text()
+    assert [reviewer["assigned_submission_ids"] for reviewer in arrow[0]] == [
+        reviewer["assigned_submission_ids"] for reviewer in frames[0]
+    ]
+
+
+def test_create_constraints_sparse_matches_dense(df_reviewers, df_submissions):
+    n_reviewers, n_submissions = len(df_reviewers), len(df_submissions)
+    reviewer_constraint, submission_constraint = create_constraints(
+        df_reviewers.to_dict("records"), df_submissions.to_dict("records"), 0, 3, 1, 2
+    )
+
+    expected_reviewer = np.zeros((n_reviewers, n_reviewers, n_submissions))
+    for i in range(n_reviewers):
+        expected_reviewer[i, i, :] = 1
+    expected_submission = np.zeros((n_submissions, n_reviewers, n_submissions))
+    for j in range(n_submissions):
+        expected_submission[j, :, j] = 1
+
+    assert reviewer_constraint.A.nnz == n_reviewers * n_submissions
+    assert submission_constraint.A.nnz == n_reviewers * n_submissions
+    np.testing.assert_array_equal(reviewer_constraint.A.toarray(), expected_reviewer.reshape(n_reviewers, -1))
+    np.testing.assert_array_equal(submission_constraint.A.toarray(), expected_submission.reshape(n_submissions, -1))
+
+
+def test_solve_milp(df_reviewers, df_submissions):
+    solution = solve_milp(df_reviewers, df_submissions, 1, 3, 1, 2, 0.8, False)
+
+    _, ub = create_lb_ub(df_reviewers.to_dict("records"), df_submissions.to_dict("records"), False)
+    assert solution.shape == (len(df_reviewers), len(df_submissions))
+    assert not (solution & (ub == 0)).any()
+    assert solution[1, 1]
+    assert (solution.sum(axis=1) >= 1).all() and (solution.sum(axis=1) <= 3).all()
+    assert (solution.sum(axis=0) >= 1).all() and (solution.sum(axis=0) <= 2).all()
+
+
+def test_solve_milp_feasible_pairs_only(df_reviewers, df_submissions):
+    full = solve_milp(df_reviewers, df_submissions, 1, 3, 1, 2, 0.8, False)
+    compact = solve_milp(df_reviewers, df_submissions, 1, 3, 1, 2, 0.8, False, feasible_pairs_only=True)
+
+    assert compact.dtype == bool and compact.shape == full.shape
+    assert compact[1, 1]
+    # Both models have the same optimum
+    objective_fun = create_objective_fun(df_reviewers, df_submissions, 0.8)
+    assert objective_fun @ compact.ravel() == pytest.approx(objective_fun @ full.ravel())
+
+
+def random_conference(seed, n_reviewers=30, n_submissions=40):
+    rng = np.random.default_rng(seed)
+    tracks = ["TUT", "ML", "VIS", "HPC"]
+    df_submissions = pd.DataFrame(
+        {
+            "submission_id": [f"S{j}" for j in range(n_submissions)],
+            "track": rng.choice(tracks, size=n_submissions),
+        }
+    )
+    submission_ids = df_submissions.submission_id.tolist()
+    df_reviewers = pd.DataFrame(
+        {
+            "reviewer_id": [f"r{i}@x.org" for i in range(n_reviewers)],
+            "tracks": [list(rng.choice(tracks, size=rng.integers(1, 3), replace=False)) for _ in range(n_reviewers)],
+            "conflicts_submission_ids": [list(rng.choice(submission_ids, size=2)) for _ in range(n_reviewers)],
+            "assigned_submission_ids": [[] for _ in range(n_reviewers)],
+        }
+    )
+    return df_reviewers, df_submissions
+
+
+@pytest.mark.parametrize("seed", range(4))
+def test_solve_milp_flow_engine_matches_milp(seed):
+    df_reviewers, df_submissions = random_conference(seed)
+    lb, ub = create_lb_ub(df_reviewers.to_dict("records"), df_submissions.to_dict("records"), True)
+    # Pin one feasible pair to exercise the lower bounds
+    i, j = np.argwhere(ub > 0)[seed]
+    df_reviewers.at[i, "assigned_submission_ids"] = [df_submissions.submission_id[j]]
+    args = (df_reviewers, df_submissions, 1, 6, 2, 4, 0.8, True)
+
+    milp_solution = solve_milp(*args)
+    flow_solution = solve_milp(*args, engine="flow")
+
+    objective_fun = create_objective_fun(df_reviewers, df_submissions, 0.8)
+    assert flow_solution[i, j]
+    assert not (flow_solution & (ub == 0)).any()
+    assert objective_fun @ flow_solution.ravel() == pytest.approx(objective_fun @ milp_solution.ravel())
+    assert (flow_solution.sum(axis=1) >= 1).all() and (flow_solution.sum(axis=1) <= 6).all()
+    assert (flow_solution.sum(axis=0) >= 2).all() and (flow_solution.sum(axis=0) <= 4).all()
+
+
+@pytest.mark.parametrize("feasible_pairs_only", [False, True])
+def test_solve_milp_lp_engine_matches_milp(feasible_pairs_only):
+    df_reviewers, df_submissions = random_conference(0)
+    args = (df_reviewers, df_submissions, 1, 6, 2, 4, 0.8, True, feasible_pairs_only)
+
+    milp_solution = solve_milp(*args)
+    lp_solution, report = solve_milp(*args, engine="lp", return_report=True)
+
+    objective_fun = create_objective_fun(df_reviewers, df_submissions, 0.8)
+    assert report["lp_integral"]
+    assert objective_fun @ lp_solution.ravel() == pytest.approx(objective_fun @ milp_solution.ravel())
+
+
+def test_solve_milp_lp_engine_infeasible():
+    # 6 reviewers per submission need more than 4 reviews per reviewer, the infeasible LP is final
+    df_reviewers, df_submissions = random_conference(0)
+    solution, report = solve_milp(
+        df_reviewers, df_submissions, 1, 4, 6, 8, 0.8, True, engine="lp", screen=False, return_report=True
+    )
+    assert solution is None
+    assert report["lp_status"] == 2
+    assert report["status"] == 2
+
+
+def test_solve_relaxation_detects_fractional_vertex():
+    # A side constraint x0 + x1 <= 1.5 breaks total unimodularity
+    objective_fun = -np.ones(2)
+    bounds = Bounds(np.zeros(2), np.ones(2))
+    assert solve_relaxation(objective_fun, bounds, [LinearConstraint(np.ones((1, 2)), 0, 2)]).integral
+    assert not solve_relaxation(objective_fun, bounds, [LinearConstraint(np.ones((1, 2)), 0, 1.5)]).integral
+
+
+def test_solve_milp_flow_engine_infeasible(df_reviewers, df_submissions):
+    assert solve_milp(df_reviewers, df_submissions, 4, 5, 1, 2, 0.8, False, engine="flow") is None
+
+
+@pytest.mark.parametrize("seed", range(4))
+def test_solve_milp_greedy_engine(seed):
+    df_reviewers, df_submissions = random_conference(seed)
+    _, ub = create_lb_ub(df_reviewers.to_dict("records"), df_submissions.to_dict("records"), True)
+    args = (df_reviewers, df_submissions, 2, 5, 2, 3, 0.8, True)
+
+    greedy_solution = solve_milp(*args, engine="greedy")
+    polished_solution = solve_milp(*args, engine="greedy", polish=True)
+    flow_solution = solve_milp(*args, engine="flow")
+
+    objective_fun = create_objective_fun(df_reviewers, df_submissions, 0.8)
+    assert not (greedy_solution & (ub == 0)).any()
+    assert (greedy_solution.sum(axis=1) >= 2).all() and (greedy_solution.sum(axis=1) <= 5).all()
+    assert (greedy_solution.sum(axis=0) >= 2).all() and (greedy_solution.sum(axis=0) <= 3).all()
+    optimum = objective_fun @ flow_solution.ravel()
+    assert objective_fun @ greedy_solution.ravel() >= optimum - 1e-9
+    assert objective_fun @ polished_solution.ravel() == pytest.approx(optimum)
+
+
+def test_solve_milp_greedy_polish_report():
+    df_reviewers, df_submissions = random_conference(0)
+    solution, report = solve_milp(
+        df_reviewers, df_submissions, 2, 5, 2, 3, 0.8, True, engine="greedy", polish=True, return_report=True
+    )
+    assert solution is not None
+    # One row per reviewer and per submission plus the cutoff row
+    assert report["n_constraints"] == len(df_reviewers) + len(df_submissions) + 1
+    assert report["nonzeros"] == 3 * report["n_variables"]
+
+
+def test_solve_milp_greedy_engine_infeasible(df_reviewers, df_submissions):
+    assert solve_milp(df_reviewers, df_submissions, 4, 5, 1, 2, 0.8, False, engine="greedy") is None
+    assert solve_milp(df_reviewers, df_submissions, 4, 5, 1, 2, 0.8, False, engine="greedy", polish=True) is None
+
+
+def test_screen_feasibility_names_bottlenecks(df_reviewers, df_submissions):
+    lb, ub = create_lb_ub(df_reviewers.to_dict("records"), df_submissions.to_dict("records"), False)
+
+    # S4 (index 3) can only go to d, and the VIS reviewers can give three reviews where four are needed
+    screening = screen_feasibility(lb, ub, 0, 3, 2, 2, submission_tracks=df_submissions.track)
+    assert not screening["feasible"]
+    assert screening["submissions"] == {3: 1}
+    assert screening["tracks"] == {"VIS": 1}
+
+    # Every reviewer has enough eligible submissions on their own, but five submissions can't take eight reviews
+    screening = screen_feasibility(lb, ub, 2, 3, 0, 1)
+    assert not screening["feasible"]
+    assert sum(screening["reviewers"].values()) == 3
+
+    assert screen_feasibility(lb, ub, 1, 3, 1, 2, submission_tracks=df_submissions.track)["feasible"]
+
+
+@pytest.mark.parametrize("seed", range(4))
+def test_screen_feasibility_matches_flow(seed):
+    df_reviewers, df_submissions = random_conference(seed, n_reviewers=12, n_submissions=20)
+    lb, ub = create_lb_ub(df_reviewers.to_dict("records"), df_submissions.to_dict("records"), False)
+    for limits in [(0, 6, 1, 3), (1, 4, 2, 3), (2, 4, 2, 2), (3, 5, 2, 2)]:
+        screening = screen_feasibility(lb, ub, *limits, submission_tracks=df_submissions.track)
+        solution = solve_milp(df_reviewers, df_submissions, *limits, 0.8, False, engine="flow", screen=False)
+        assert screening["feasible"] == (solution is not None)
+
+
+def test_solve_milp_screening_skips_solver(df_reviewers, df_submissions, monkeypatch):
+    monkeypatch.setattr(assign_reviews, "milp", pytest.fail)
+    solution, report = solve_milp(df_reviewers, df_submissions, 0, 3, 2, 2, 0.8, False, return_report=True)
+
+    assert solution is None
+    assert report["status"] == 2
+    assert report["screening"]["submissions"] == {"S4": 1}
+    assert "S4 (1 short)" in report["message"] and "VIS (1 short)" in report["message"]
+
+
+@pytest.mark.parametrize("engine", ["milp", "flow"])
+def test_solve_milp_decompose(engine):
+    df_reviewers, df_submissions = random_conference(0)
+    # One track per reviewer splits the pair graph into one component per track
+    df_reviewers["tracks"] = df_reviewers.tracks.str[:1]
+    args = (df_reviewers, df_submissions, 0, 6, 1, 3, 0.8, False)
+
+    _, labels, _ = find_components(
+        *create_lb_ub(df_reviewers.to_dict("records"), df_submissions.to_dict("records"), False)
+    )
+    assert len(np.unique(labels)) > 1
+
+    monolithic = solve_milp(*args, engine=engine)
+    decomposed = solve_milp(*args, engine=engine, decompose=True, n_jobs=2)
+
+    objective_fun = create_objective_fun(df_reviewers, df_submissions, 0.8)
+    assert objective_fun @ decomposed.ravel() == pytest.approx(objective_fun @ monolithic.ravel())
+
+
+def test_solve_milp_decompose_shares_the_time_limit(monkeypatch):
+    df_reviewers, df_submissions = random_conference(0)
+    df_reviewers["tracks"] = df_reviewers.tracks.str[:1]
+    time_limits = []
+    solve_model = assign_reviews.solve_model
+
+    def slow_solve_model(*args, time_limit=None, **kwargs):
+        time_limits.append(time_limit)
+        time.sleep(0.2)
+        return solve_model(*args, time_limit=time_limit, **kwargs)
+
+    monkeypatch.setattr(assign_reviews, "solve_model", slow_solve_model)
+    solve_milp(df_reviewers, df_submissions, 0, 6, 1, 3, 0.8, False, decompose=True, n_jobs=1, time_limit=60)
+
+    # Every component gets what the ones before it left of the 60 seconds
+    assert len(time_limits) > 1
+    assert time_limits[0] <= 60
+    assert all(later <= earlier - 0.2 for earlier, later in zip(time_limits, time_limits[1:]))
+
+
+def test_solve_milp_decompose_isolated_submission(df_reviewers, df_submissions):
+    # Nobody can review the tutorial unless tutorials can go to anyone
+    df_reviewers["tracks"] = [["ML"], ["ML"], ["ML", "VIS"], ["VIS"]]
+    assert solve_milp(df_reviewers, df_submissions, 0, 3, 1, 2, 0.8, False, decompose=True) is None
+    assert solve_milp(df_reviewers, df_submissions, 0, 3, 1, 2, 0.8, True, decompose=True) is not None
+
+
+def assignments_from_solution(df_reviewers, df_submissions, solution):
+    return {
+        reviewer_id: df_submissions.submission_id[row].tolist()
+        for reviewer_id, row in zip(df_reviewers.reviewer_id, solution)
+    }
+
+
+def test_repair_assignments_reviewer_drops_out():
+    df_reviewers, df_submissions = random_conference(1)
+    args = (1, 8, 2, 4, 0.8, True)
+    previous = assignments_from_solution(df_reviewers, df_submissions, solve_milp(df_reviewers, df_submissions, *args))
+    removed = df_reviewers.reviewer_id[0]
+
+    df_reviewers, df_submissions, solution = repair_assignments(
+        df_reviewers, df_submissions, previous, *args, removed_reviewer_ids=[removed]
+    )
+
+    assert removed not in df_reviewers.reviewer_id.values
+    assert (solution.sum(axis=1) >= 1).all() and (solution.sum(axis=1) <= 8).all()
+    assert (solution.sum(axis=0) >= 2).all() and (solution.sum(axis=0) <= 4).all()
+    repaired = assignments_from_solution(df_reviewers, df_submissions, solution)
+    # Only the submissions of the removed reviewer are re-optimized
+    untouched = set(df_submissions.submission_id) - set(previous[removed])
+    for reviewer_id, submission_ids in repaired.items():
+        assert set(previous[reviewer_id]) & untouched == set(submission_ids) & untouched
+
+
+def test_repair_assignments_added_conflict():
+    df_reviewers, df_submissions = random_conference(2)
+    args = (1, 8, 2, 4, 0.8, True)
+    previous = assignments_from_solution(df_reviewers, df_submissions, solve_milp(df_reviewers, df_submissions, *args))
+    reviewer_id = df_reviewers.reviewer_id[3]
+    conflict = (reviewer_id, previous[reviewer_id][0])
+
+    df_reviewers, df_submissions, solution = repair_assignments(
+        df_reviewers, df_submissions, previous, *args, added_conflicts=[conflict], engine="flow"
+    )
+
+    repaired = assignments_from_solution(df_reviewers, df_submissions, solution)
+    assert conflict[1] not in repaired[reviewer_id]
+    assert (solution.sum(axis=0) >= 2).all()
+    changed = sum(set(previous[r]) != set(repaired[r]) for r in repaired)
+    assert changed < len(repaired) // 2
+
+
+@pytest.mark.parametrize(
+    "engine,decompose", [("milp", False), ("lp", False), ("flow", False), ("greedy", False), ("milp", True)]
+)
+def test_solve_milp_report(tmp_path, engine, decompose):
+    df_reviewers, df_submissions = random_conference(0)
+    solution, report = solve_milp(
+        df_reviewers,
+        df_submissions,
+        1,
+        6,
+        2,
+        4,
+        0.8,
+        True,
+        engine=engine,
+        decompose=decompose,
+        return_report=True,
+        output_dir=tmp_path,
+    )
+
+    assert solution is not None
+    assert report["status"] == 0
+    assert report["n_variables"] > 0 and report["nonzeros"] > 0 and report["n_constraints"] > 0
+    objective_fun = create_objective_fun(df_reviewers, df_submissions, 0.8)
+    assert report["objective"] == pytest.approx(objective_fun @ solution.ravel())
+    solve_phases = {"heuristic"} if engine == "greedy" else {"build_model", "solve"}
+    assert {"create_objective_fun", "create_lb_ub", *solve_phases} <= report["phases"].keys()
+    assert all(phase["seconds"] >= 0 and phase["peak_mib"] >= 0 for phase in report["phases"].values())
+
+    lines = (tmp_path / "solver-report.jsonl").read_text().splitlines()
+    assert len(lines) == 1
+    assert json.loads(lines[0])["engine"] == engine
+
+
+def test_solve_milp_cache(tmp_path):
+    df_reviewers, df_submissions = random_conference(3)
+    args = (df_reviewers, df_submissions, 1, 6, 2, 4)
+
+    _, report = solve_milp(*args, 0.8, True, engine="flow", cache_dir=tmp_path, return_report=True)
+    assert report["cache"] == "miss"
+    # Only the tutorial coefficient changed, so the bounds come from the cache
+    solution, report = solve_milp(*args, 0.5, True, engine="flow", cache_dir=tmp_path, return_report=True)
+    assert report["cache"] == "hit"
+    np.testing.assert_array_equal(solution, solve_milp(*args, 0.5, True, engine="flow"))
+
+    _, report = solve_milp(*args, 0.5, False, engine="flow", cache_dir=tmp_path, return_report=True)
+    assert report["cache"] == "miss"
+    assert len(list(tmp_path.glob("*.npz"))) == 2
+
+
+def test_solve_milp_solver_options(df_reviewers, df_submissions, monkeypatch):
+    calls = []
+    milp = assign_reviews.milp
+
+    def time_limited_milp(*args, **kwargs):
+        # Report the optimum as an incumbent cut off by the time limit
+        calls.append(kwargs["options"])
+        res = milp(*args, **kwargs)
+        res.status, res.success, res.message = 1, False, "Time limit reached."
+        return res
+
+    monkeypatch.setattr(assign_reviews, "milp", time_limited_milp)
+    solution, report = solve_milp(
+        df_reviewers,
+        df_submissions,
+        1,
+        3,
+        1,
+        2,
+        0.8,
+        False,
+        time_limit=30,
+        mip_rel_gap=0.01,
+        presolve=False,
+        return_report=True,
+    )
+
+    assert calls == [{"presolve": False, "time_limit": 30, "mip_rel_gap": 0.01}]
+    assert solution is not None and solution[1, 1]
+    assert report["status"] == 1 and report["time_limit"] == 30
+
+
+@pytest.mark.parametrize(
+    "mapping", [{}, {"a": []}, {"a@x.org": ["S1", "Ünïcødé"], "b": [], "c": ["S2"]}, {"r": [False, True]}]
+)
+def test_write_json_matches_json_dumps(tmp_path, mapping):
+    assign_reviews.write_json(tmp_path / "out.json", mapping)
+    assert (tmp_path / "out.json").read_text() == json.dumps(mapping, indent=4)
+
+
+def test_format_and_output_result(tmp_path, df_reviewers, df_submissions):
+    solution = solve_milp(df_reviewers, df_submissions, 1, 3, 1, 2, 0.8, True)
+    solution[0] = False
+
+    reviewers, submissions = assign_reviews.format_and_output_result(
+        df_reviewers, df_submissions, solution, output_dir=tmp_path
+    )
+
+    expected = {
+        reviewer_id: df_submissions.submission_id[row].tolist()
+        for reviewer_id, row in zip(df_reviewers.reviewer_id, solution)
+    }
+    assert (tmp_path / "review-assignments.json").read_text() == json.dumps(expected, indent=4)
+    expected = {
+        submission_id: df_reviewers.reviewer_id[column].tolist()
+        for submission_id, column in zip(df_submissions.submission_id, solution.T)
+    }
+    assert (tmp_path / "submission-assignments.json").read_text() == json.dumps(expected, indent=4)
+    assert [submission["assigned_reviewer_ids"] for submission in submissions] == list(expected.values())
+
+    for reviewer, row in zip(reviewers, solution):
+        tracks = df_submissions.track[row]
+        assert reviewer["is_tutorial"] == (tracks == "TUT").tolist()
+        assert reviewer["num_tutorials"] == (tracks == "TUT").sum()
+        assert reviewer["num_submissions"] == row.sum()
+        assert reviewer["tutorial_reviewer"] == ("TUT" in reviewer["tracks"])
+        assert reviewer["track_in_domain"] == [track in reviewer["tracks"] for track in tracks]
+    debug = json.loads((tmp_path / "review-assignments-debug.json").read_text())
+    assert debug == {reviewer["reviewer_id"]: sorted(reviewer["is_tutorial"]) for reviewer in reviewers}
+
+
+def test_format_and_output_result_without_tutorials(tmp_path, df_reviewers, df_submissions):
+    # Steps 2 and 3 only pass talks, tutorial reviewers are still known from their own tracks
+    df_talks = df_submissions[df_submissions.track != "TUT"].reset_index(drop=True)
+    solution = solve_milp(df_reviewers, df_talks, 0, 3, 0, 2, 0.8, False)
+
+    reviewers, _ = assign_reviews.format_and_output_result(df_reviewers, df_talks, solution, output_dir=tmp_path)
+    assert [reviewer["tutorial_reviewer"] for reviewer in reviewers] == [True, False, False, True]
+    assert all(reviewer["num_tutorials"] == 0 for reviewer in reviewers)
@@ -0,0 +1,71 @@
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pytest
+
+from assign_reviews import create_lb_ub
+from entities import entity_bounds, in_track, intern_entities, is_tutorial, submission_costs
+from synthetic import generate_conference
+
+
+def test_intern_entities():
+    df_reviewers = pd.DataFrame(
+        {
+            "reviewer_id": ["a@x.org", "b@x.org"],
+            "tracks": [["TUT", "ML"], np.array(["VIS"])],
+            "conflicts_submission_ids": [["S2", "S9"], [None]],
+        }
+    )
+    df_submissions = pd.DataFrame({"submission_id": ["S1", "S2", "S3"], "track": ["ML", "TUT", "VIS"]})
+    entities = intern_entities(df_reviewers, df_submissions)
+
+    assert entities["track_ids"].tolist() == ["ML", "TUT", "VIS"]
+    assert entities["submission_track"].tolist() == [0, 1, 2]
+    assert entities["reviewer_tracks"].tolist() == [0b011, 0b100]
+    assert entities["tutorial_track"] == 1
+    assert entities["conflicts"].toarray().tolist() == [[False, True, False], [False, False, False]]
+    assert entities["assigned"].nnz == 0
+    assert is_tutorial(entities).tolist() == [False, True, False]
+    assert submission_costs(entities, 0.8).tolist() == [-1.0, -0.8, -1.0]
+    assert in_track(entities, np.array([0, 0, 1, 1]), np.array([0, 2, 1, 2])).tolist() == [True, False, False, True]
+
+
+@pytest.mark.parametrize("assign_tutorials_to_anyone", [False, True])
+def test_entity_bounds_match_create_lb_ub(assign_tutorials_to_anyone):
+    df_reviewers, df_submissions = generate_conference(0.3, seed=6)
+    df_reviewers.at[1, "assigned_submission_ids"] = [df_submissions.submission_id[2]]
+    expected = create_lb_ub(
+        df_reviewers.to_dict("records"), df_submissions.to_dict("records"), assign_tutorials_to_anyone
+    )
+
+    for reviewers, submissions in [
+        (df_reviewers, df_submissions),
+        (pa.Table.from_pandas(df_reviewers), pa.Table.from_pandas(df_submissions)),
+    ]:
+        lb, ub = entity_bounds(intern_entities(reviewers, submissions), assign_tutorials_to_anyone)
+        np.testing.assert_array_equal(lb, expected[0])
+        np.testing.assert_array_equal(ub, expected[1])
+
+
+def test_many_tracks_fall_back_to_a_track_matrix():
+    rng = np.random.default_rng(3)
+    track_ids = [f"T{k}" for k in range(70)]
+    df_reviewers = pd.DataFrame(
+        {
+            "reviewer_id": [f"r{i}@x.org" for i in range(20)],
+            "tracks": [list(rng.choice(track_ids, size=3, replace=False)) for _ in range(20)],
+            "conflicts_submission_ids": [[] for _ in range(20)],
+            "assigned_submission_ids": [[] for _ in range(20)],
+        }
+    )
+    df_submissions = pd.DataFrame(
+        {"submission_id": [f"S{k}" for k in range(140)], "track": track_ids + list(rng.choice(track_ids, size=70))}
+    )
+    entities = intern_entities(df_reviewers, df_submissions)
+    assert entities["reviewer_tracks"].shape == (20, 71)
+
+    _, ub = entity_bounds(entities, False)
+    _, expected = create_lb_ub(df_reviewers.to_dict("records"), df_submissions.to_dict("records"), False)
+    np.testing.assert_array_equal(ub, expected)
+    rows, cols = np.nonzero(expected)
+    assert in_track(entities, rows, cols).all()
@@ -1,5 +1,82 @@
-from main import add_numbers
+import json
+import subprocess
+import sys
+
+import duckdb
+import pytest
+
+from main import add_numbers, main, parse_args, resolve_settings
+from synthetic import generate_conference
 
 
 def test_add_numbers():
     assert add_numbers(2, 2) == 4
+
+
+def test_import_is_lazy():
+    code = "import sys, main; print(sorted({'duckdb', 'pandas', 'scipy'} & set(sys.modules)))"
+    result = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True, check=True)
+    assert result.stdout.strip() == "[]"
+
+
+def test_resolve_settings_flags_over_config():
+    config = {
+        "preprocess": {"data_dir": "exports"},
+        "assign": {"engine": "flow", "time_limit": 60, "output_dir": "out", "stages": {"talks": {"min_reviews": 3}}},
+    }
+    settings = resolve_settings(parse_args(["assign", "--time-limit", "5", "--no-presolve"]), config)
+
+    assert str(settings["database_file"]) == "exports/assign_reviews.db"
+    assert str(settings["output_dir"]) == "out"
+    assert settings["options"] == {"engine": "flow", "time_limit": 5, "presolve": False}
+    assert settings["stages"] == {"talks": {"min_reviews": 3}}
+
+
+@pytest.mark.parametrize("eligibility", ["duckdb", "python"])
+def test_main_assign(tmp_path, eligibility):
+    df_reviewers, df_submissions = generate_conference(0.2, seed=1)
+    database_file = tmp_path / "assign_reviews.db"
+    con = duckdb.connect(str(database_file))
+    con.sql(
+        "create table reviewers_to_assign as select reviewer_id, tracks, conflicts_submission_ids from df_reviewers"
+    )
+    con.sql("create table submissions_to_assign as select submission_id, author_ids, track from df_submissions")
+    con.close()
+    config_file = tmp_path / "config.toml"
+    config_file.write_text("""
+[assign]
+engine = "flow"
+
+[assign.stages.tutorials]
+min_reviewers = 1
+
+[assign.stages.talks]
+min_reviews = 0
+min_reviewers = 0
+
+[assign.stages.tutorial_reviewer_talks]
+min_reviewers = 0
+""")
+
+    main(
+        [
+            "assign",
+            "--config",
+            str(config_file),
+            "--database",
+            str(database_file),
+            "--output-dir",
+            str(tmp_path),
+            "--eligibility",
+            eligibility,
+        ]
+    )
+
+    assignments = json.loads((tmp_path / "reviewer-assignments.json").read_text())
+    assert set(assignments) == set(df_reviewers.reviewer_id)
+    n_reviews = sum(len(submission_ids) for submission_ids in assignments.values())
+    assert n_reviews > 0
+    con = duckdb.connect(str(database_file))
+    submissions = con.sql("select submission_id, assigned_reviewer_ids from submission_assignments_02").fetchall()
+    assert sum(len(reviewer_ids) for _, reviewer_ids in submissions) == n_reviews
+    con.close()
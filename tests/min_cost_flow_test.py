@@ -0,0 +1,41 @@
+import numpy as np
+import pytest
+from scipy.optimize import linprog
+
+from min_cost_flow import min_cost_flow
+
+
+@pytest.mark.parametrize("seed", range(10))
+def test_min_cost_flow_matches_linprog(seed):
+    rng = np.random.default_rng(seed)
+    n_nodes = 12
+    pairs = np.array([(u, v) for u in range(n_nodes) for v in range(u + 1, n_nodes) if rng.random() < 0.4])
+    flip = rng.random(len(pairs)) < 0.5
+    tails = np.where(flip, pairs[:, 1], pairs[:, 0])
+    heads = np.where(flip, pairs[:, 0], pairs[:, 1])
+    lower = (rng.random(len(pairs)) < 0.1).astype(int)
+    upper = lower + rng.integers(1, 5, size=len(pairs))
+    cost = rng.normal(size=len(pairs))
+
+    flow = min_cost_flow(n_nodes, tails, heads, lower, upper, cost)
+
+    incidence = np.zeros((n_nodes, len(pairs)))
+    incidence[tails, np.arange(len(pairs))] = -1
+    incidence[heads, np.arange(len(pairs))] = 1
+    expected = linprog(cost, A_eq=incidence, b_eq=np.zeros(n_nodes), bounds=np.column_stack([lower, upper]))
+    if not expected.success:
+        assert flow is None
+        return
+    np.testing.assert_array_equal(incidence @ flow, 0)
+    assert ((flow >= lower) & (flow <= upper)).all()
+    assert cost @ flow == pytest.approx(expected.fun)
+
+
+def test_min_cost_flow_infeasible():
+    # A single arc with a lower bound cannot carry flow without a way back
+    assert min_cost_flow(2, [0], [1], [1], [2], [0.0]) is None
+
+
+def test_min_cost_flow_rejects_parallel_arcs():
+    with pytest.raises(ValueError, match="unordered pair"):
+        min_cost_flow(2, [0, 1], [1, 0], [0, 0], [1, 1], [1.0, 1.0])
@@ -0,0 +1,53 @@
+import os
+
+import numpy as np
+import pyarrow as pa
+
+from entities import intern_entities
+from model_cache import evict, input_fingerprint, load_bounds, save_bounds
+from synthetic import generate_conference
+
+
+def test_input_fingerprint():
+    df_reviewers, df_submissions = generate_conference(0.1, seed=0)
+
+    def fingerprint(df_reviewers, assign_tutorials_to_anyone=False):
+        return input_fingerprint(intern_entities(df_reviewers, df_submissions), assign_tutorials_to_anyone)
+
+    key = fingerprint(df_reviewers)
+    assert fingerprint(df_reviewers.copy()) == key
+    assert input_fingerprint(intern_entities(pa.Table.from_pandas(df_reviewers), df_submissions), False) == key
+    assert fingerprint(df_reviewers, True) != key
+    # The bounds are positional, reordering the reviewers changes the key
+    assert fingerprint(df_reviewers.iloc[::-1].reset_index(drop=True)) != key
+    df_reviewers.at[0, "conflicts_submission_ids"] = [df_submissions.submission_id[0]]
+    assert fingerprint(df_reviewers) != key
+
+
+def test_save_and_load_bounds(tmp_path):
+    rng = np.random.default_rng(0)
+    ub = (rng.random((4, 6)) < 0.5).astype(float)
+    lb = ub * (rng.random((4, 6)) < 0.3)
+
+    assert load_bounds(tmp_path, "missing") is None
+    save_bounds(tmp_path, "key", lb, ub, ["a", "b", "c", "d"], [f"S{j}" for j in range(6)])
+    cached_lb, cached_ub, reviewer_ids, submission_ids = load_bounds(tmp_path, "key")
+
+    np.testing.assert_array_equal(cached_lb, lb)
+    np.testing.assert_array_equal(cached_ub, ub)
+    assert reviewer_ids.tolist() == ["a", "b", "c", "d"]
+    assert submission_ids.tolist() == [f"S{j}" for j in range(6)]
+
+
+def test_evicts_least_recently_used(tmp_path):
+    bounds = (np.zeros((1, 1)), np.ones((1, 1)), ["a"], ["S1"])
+    for n, key in enumerate(["old", "new"]):
+        os.utime(save_bounds(tmp_path, key, *bounds), (n, n))
+
+    # Reading the old entry makes it the most recently used one
+    assert load_bounds(tmp_path, "old") is not None
+    save_bounds(tmp_path, "newest", *bounds, max_entries=2)
+    assert sorted(path.stem for path in tmp_path.glob("*.npz")) == ["newest", "old"]
+
+    evict(tmp_path, 0)
+    assert not list(tmp_path.glob("*.npz"))
@@ -0,0 +1,52 @@
+import pytest
+
+from assign_reviews import solve_milp
+from entities import entity_bounds, intern_entities
+from model_size import choose_model, count_pairs, estimate_model, find_configuration
+from synthetic import generate_conference
+
+
+@pytest.mark.parametrize("assign_tutorials_to_anyone", [False, True])
+def test_count_pairs(assign_tutorials_to_anyone):
+    df_reviewers, df_submissions = generate_conference(0.3, seed=6)
+    # One pin in track and one that conflicts, both stay variables
+    df_reviewers.at[1, "assigned_submission_ids"] = [df_submissions.submission_id[2]]
+    df_reviewers.at[3, "assigned_submission_ids"] = list(df_reviewers.conflicts_submission_ids[3])[:1]
+    entities = intern_entities(df_reviewers, df_submissions)
+    lb, ub = entity_bounds(entities, assign_tutorials_to_anyone)
+
+    n_pairs, component_pairs = count_pairs(entities, assign_tutorials_to_anyone)
+    assert n_pairs == ((lb > 0) | (ub > 0)).sum()
+    assert component_pairs.sum() == n_pairs
+    assert (component_pairs[:-1] >= component_pairs[1:]).all()
+
+
+def test_choose_model():
+    estimate = estimate_model(400, 300, 40_000, [30_000, 10_000])
+    assert find_configuration(estimate, "milp", True, True)["variables"] == 40_000
+    assert find_configuration(estimate, "lp", False, False)["variables"] == 120_000
+    assert choose_model(estimate, memory_limit=2**40)["engine"] == "flow"
+
+    # Nothing fits, the smallest model is picked and flagged
+    choice = choose_model(estimate, memory_limit=2**20)
+    assert not choice["fits"]
+    assert choice["peak_mib"] == min(configuration["peak_mib"] for configuration in estimate["configurations"])
+
+    # Without the flow engine the decomposed MILP is faster than the monolithic one
+    choice = choose_model(estimate, memory_limit=2**40, engines=("milp",))
+    assert choice["decompose"] and choice["feasible_pairs_only"]
+
+
+def test_solve_milp_auto():
+    df_reviewers, df_submissions = generate_conference(0.3, seed=2)
+    df_submissions = df_submissions[df_submissions.track != "TUT"]
+    solution, report = solve_milp(
+        df_reviewers, df_submissions, 0, 9, 2, 4, 0.8, False, engine="auto", return_report=True
+    )
+    assert solution is not None
+    assert report["engine"] == "flow"
+    assert report["model_choice"]["fits"]
+    assert (
+        report["model_estimate"]["n_pairs"]
+        == report["model_choice"]["variables"] - len(solution) - solution.shape[1] - 1
+    )
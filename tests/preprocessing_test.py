@@ -0,0 +1,279 @@
+import json
+
+import duckdb
+import numpy as np
+import pandas as pd
+import pytest
+
+from affinity import affinity_matrix
+from assign_reviews import create_lb_ub, create_objective_fun, load_feasible_pairs, matrices_from_pairs, solve_milp
+from preprocessing import (
+    DERIVED_TABLES,
+    REVIEWER_TEXTS,
+    create_feasible_pairs,
+    create_reviewers_with_coi,
+    create_submission_texts,
+    file_sha256,
+    ingest_raw_files,
+    preview_table,
+    update_database,
+)
+from synthetic import generate_conference
+
+
+@pytest.fixture
+def con():
+    con = duckdb.connect()
+    tables = dict(
+        pretalx_sessions=pd.DataFrame({"ID": ["S1", "S2", "S3"], "Speaker IDs": ["AB1", "AB12\nCD3", "EF4\n"]}),
+        pretalx_speakers=pd.DataFrame(
+            {"ID": ["AB1", "AB12", "CD3", "EF4"], "Name": ["Ann Lee", "Joann Lee", "José Pérez", "Wu"]}
+        ),
+        coi_authors=pd.DataFrame({"author": ["Ann Lee (Acme)", "Joann Lee", "Jose Perez", "Kim Wu"]}),
+        reviewers=pd.DataFrame(
+            {
+                "name": ["R1", "R2", "R3"],
+                "email": ["r1@x.org", "r2@x.org", "r3@x.org"],
+                "tracks": ["ML", "ML", "VIS"],
+                "coi": ["Ann Lee (Acme), Jose Perez", "Kim Wu", None],
+            }
+        ),
+    )
+    for table_name, df in tables.items():
+        con.from_df(df).create(table_name)
+    yield con
+    con.close()
+
+
+def test_create_reviewers_with_coi(con):
+    create_reviewers_with_coi(con)
+    df = con.sql("table reviewers_with_coi").df().set_index("email")
+
+    # Whole names only: Ann Lee is not Joann Lee, and speaker AB1 is not AB12
+    assert sorted(df.speaker_ids["r1@x.org"]) == ["AB1", "CD3"]
+    assert sorted(df.submission_ids["r1@x.org"]) == ["S1", "S2"]
+    # The entry Kim Wu names the speaker Wu
+    assert list(df.submission_ids["r2@x.org"]) == ["S3"]
+    assert list(df.submission_ids["r3@x.org"]) == [None]
+
+
+def test_submission_speakers_split_on_newlines(con):
+    create_reviewers_with_coi(con)
+    rows = con.sql("select * from submission_speakers order by all").fetchall()
+    assert rows == [("S1", "AB1"), ("S2", "AB12"), ("S2", "CD3"), ("S3", "EF4")]
+
+
+def test_reviewer_texts_come_from_their_submissions(con):
+    con.sql("""alter table pretalx_sessions add column "Proposal title" varchar""")
+    con.sql("""update pretalx_sessions set "Proposal title" = 'Title ' || ID""")
+    con.sql("insert into reviewers values ('José Pérez', 'jp@x.org', 'ML', null)")
+    create_reviewers_with_coi(con)
+    create_submission_texts(con)
+    texts = dict(con.sql(REVIEWER_TEXTS).fetchall())
+
+    assert con.sql("select text from submission_texts where submission_id = 'S2'").fetchone() == ("Title S2",)
+    assert texts == {"r1@x.org": "", "r2@x.org": "", "r3@x.org": "", "jp@x.org": "Title S2"}
+
+
+def test_reviewers_conflict_with_their_own_submissions(con):
+    con.sql("""alter table pretalx_sessions add column "Proposal title" varchar""")
+    con.sql("""update pretalx_sessions set "Proposal title" = 'Sparse solvers for ' || ID""")
+    # Ann Lee speaks in S1 and names Jose Perez (S2), José Pérez speaks in S2 and names nobody
+    con.sql("insert into reviewers values ('Ann Lee', 'al@x.org', 'ML', 'Jose Perez')")
+    con.sql("insert into reviewers values ('José Pérez', 'jp@x.org', 'ML', null)")
+    create_reviewers_with_coi(con)
+    create_submission_texts(con)
+    conflicts = dict(con.sql("select email, submission_ids from reviewers_with_coi").fetchall())
+    assert sorted(conflicts["al@x.org"]) == ["S1", "S2"]
+    assert conflicts["jp@x.org"] == ["S2"]
+
+    # So their own submission, the best textual match, is never a pair the objective can reward
+    texts = dict(con.sql(REVIEWER_TEXTS).fetchall())
+    submission_texts = dict(con.sql("select submission_id, text from submission_texts").fetchall())
+    reviewer = dict(reviewer_id="jp@x.org", tracks=["ML"], assigned_submission_ids=[])
+    reviewers = [dict(reviewer, conflicts_submission_ids=conflicts["jp@x.org"])]
+    submissions = [dict(submission_id=submission_id, track="ML") for submission_id in submission_texts]
+    _, ub = create_lb_ub(reviewers, submissions, False)
+    affinity = affinity_matrix([texts["jp@x.org"]], list(submission_texts.values()), ub)
+    assert ub[0, list(submission_texts).index("S2")] == 0
+    assert affinity[0, list(submission_texts).index("S2")] == 0
+
+
+@pytest.mark.parametrize("assign_tutorials_to_anyone", [False, True])
+def test_create_feasible_pairs_matches_create_lb_ub(assign_tutorials_to_anyone):
+    df_reviewers, df_submissions = generate_conference(0.3, seed=5)
+    # One pin the reviewer may keep and one on a submission they now conflict with
+    conflict = df_reviewers.conflicts_submission_ids.map(len).idxmax()
+    df_reviewers.at[0, "assigned_submission_ids"] = [df_submissions.submission_id[0]]
+    df_reviewers.at[conflict, "assigned_submission_ids"] = [df_reviewers.conflicts_submission_ids[conflict][0]]
+    con = duckdb.connect()
+    con.register("stage_reviewers", df_reviewers)
+    con.register("stage_submissions", df_submissions)
+    create_feasible_pairs(con, "stage_reviewers", "stage_submissions", assign_tutorials_to_anyone, 0.7)
+    pairs = load_feasible_pairs(con)
+    temporary = con.sql("select table_name from duckdb_tables() where temporary").fetchall()
+    con.close()
+    assert sorted(temporary) == [("feasible_pairs",), ("reviewer_index",), ("submission_index",)]
+
+    objective_fun, lb, ub = matrices_from_pairs(
+        pairs, df_reviewers.reviewer_id.to_numpy(), df_submissions.submission_id.to_numpy()
+    )
+    expected_lb, expected_ub = create_lb_ub(
+        df_reviewers.to_dict("records"), df_submissions.to_dict("records"), assign_tutorials_to_anyone
+    )
+    np.testing.assert_array_equal(lb, expected_lb)
+    np.testing.assert_array_equal(ub, expected_ub)
+    assert lb.sum() == 2 and ub.sum() == len(pairs["weight"]) - 1
+    expected_objective = create_objective_fun(df_reviewers, df_submissions, 0.7).reshape(lb.shape)
+    np.testing.assert_array_equal(objective_fun[(lb > 0) | (ub > 0)], expected_objective[(lb > 0) | (ub > 0)])
+
+
+def test_solve_milp_feasible_pairs_without_cache(tmp_path):
+    df_reviewers, df_submissions = generate_conference(0.3, seed=5)
+    con = duckdb.connect()
+    con.register("stage_reviewers", df_reviewers)
+    con.register("stage_submissions", df_submissions)
+    create_feasible_pairs(con, "stage_reviewers", "stage_submissions")
+    pairs = load_feasible_pairs(con)
+    con.close()
+
+    solution, report = solve_milp(
+        df_reviewers,
+        df_submissions,
+        0,
+        9,
+        0,
+        4,
+        0.8,
+        False,
+        engine="flow",
+        cache_dir=tmp_path,
+        feasible_pairs=pairs,
+        return_report=True,
+    )
+    assert solution is not None
+    assert report["cache"] == "unused"
+    assert not list(tmp_path.iterdir())
+
+
+def write_raw_files(data_dir):
+    tables = dict(
+        scipy_reviewers=pd.DataFrame(
+            {
+                "Name": ["R1", "R2"],
+                "Email": ["r1@x.org", "r2@x.org"],
+                "Track(s) to review for (check all that apply)": ["Machine Learning", "Machine Learning, Tutorials"],
+            }
+        ),
+        pretalx_sessions=pd.DataFrame(
+            {"ID": ["S1", "S2"], "Speaker IDs": ["AB1", "CD3"], "Track": ["Machine Learning", "Tutorials"]}
+        ),
+        pretalx_speakers=pd.DataFrame({"ID": ["AB1", "CD3"], "Name": ["Ann Lee", "Jose Perez"]}),
+        pretalx_reviewers=pd.DataFrame({"Name": ["R1", "R2"], "Email": ["r1@x.org", "r2@x.org"]}),
+        coi_reviewers=pd.DataFrame(
+            {
+                "Email": ["r1@x.org", "r2@x.org"],
+                "Mark the speaker(s) or company/organization/affiliation(s) that could pose a conflict of interest": [
+                    "Ann Lee",
+                    "none",
+                ],
+            }
+        ),
+        coi_authors=pd.DataFrame({"author": ["Ann Lee", "Jose Perez"]}),
+        tracks=pd.DataFrame({"name": ["Machine Learning", "Tutorials"], "track_id": ["ML", "TUT"]}),
+    )
+    raw_files = {}
+    for table_name, df in tables.items():
+        raw_files[table_name] = data_dir / f"{table_name}.csv"
+        df.to_csv(raw_files[table_name], index=False)
+    return raw_files
+
+
+def test_update_database_is_incremental(tmp_path):
+    raw_files = write_raw_files(tmp_path)
+    con = duckdb.connect(str(tmp_path / "assign_reviews.db"))
+
+    loaded, rebuilt = update_database(con, raw_files)
+    assert loaded == list(raw_files)
+    assert rebuilt == list(DERIVED_TABLES)
+    reviewers = con.sql("select * from reviewers_to_assign order by reviewer_id").fetchall()
+    assert reviewers == [("r1@x.org", ["ML"], ["S1"]), ("r2@x.org", ["ML", "TUT"], [None])]
+
+    # Nothing changed, nothing to do, also after reconnecting
+    con.close()
+    con = duckdb.connect(str(tmp_path / "assign_reviews.db"))
+    assert update_database(con, raw_files) == ([], [])
+
+    # A new track name only touches the tables built from tracks
+    pd.DataFrame({"name": ["Machine Learning", "Tutorials"], "track_id": ["ML", "TUTORIAL"]}).to_csv(
+        raw_files["tracks"], index=False
+    )
+    loaded, rebuilt = update_database(con, raw_files)
+    assert loaded == ["tracks"]
+    assert rebuilt == ["reviewers_with_tracks", "reviewers_to_assign", "submissions_to_assign"]
+    assert con.sql("select track from submissions_to_assign where submission_id = 'S2'").fetchone() == ("TUTORIAL",)
+
+    manifest = con.sql("select table_name, sha256, columns from ingest_manifest where table_name = 'tracks'").fetchone()
+    assert manifest[1] == file_sha256(raw_files["tracks"])
+    assert [name for name, _ in json.loads(manifest[2])] == ["name", "track_id"]
+    con.close()
+
+
+def test_update_database_retries_an_interrupted_rebuild(tmp_path, monkeypatch):
+    raw_files = write_raw_files(tmp_path)
+    con = duckdb.connect(str(tmp_path / "assign_reviews.db"))
+    update_database(con, raw_files)
+    pd.DataFrame({"name": ["Machine Learning", "Tutorials"], "track_id": ["ML", "TUTORIAL"]}).to_csv(
+        raw_files["tracks"], index=False
+    )
+
+    def interrupt(con):
+        raise KeyboardInterrupt
+
+    dependencies, _ = DERIVED_TABLES["reviewers_to_assign"]
+    monkeypatch.setitem(DERIVED_TABLES, "reviewers_to_assign", (dependencies, interrupt))
+    with pytest.raises(KeyboardInterrupt):
+        update_database(con, raw_files)
+    monkeypatch.undo()
+
+    # Nothing of the interrupted run was kept, the new tracks file is loaded and rebuilt again
+    assert con.sql("select track from submissions_to_assign where submission_id = 'S2'").fetchone() == ("TUT",)
+    con.close()
+    con = duckdb.connect(str(tmp_path / "assign_reviews.db"))
+    loaded, rebuilt = update_database(con, raw_files)
+    assert loaded == ["tracks"]
+    assert rebuilt == ["reviewers_with_tracks", "reviewers_to_assign", "submissions_to_assign"]
+    assert con.sql("select track from submissions_to_assign where submission_id = 'S2'").fetchone() == ("TUTORIAL",)
+    con.close()
+
+
+def test_ingest_raw_files_uses_declared_types(tmp_path):
+    raw_files = write_raw_files(tmp_path)
+    # IDs and speaker IDs that look like numbers, and an extra numeric column
+    pd.DataFrame(
+        {
+            "ID": ["007", "12"],
+            "Speaker IDs": ["1\n2", "3"],
+            "Track": ["Machine Learning", "Tutorials"],
+            "Duration": [30, 45],
+        }
+    ).to_csv(raw_files["pretalx_sessions"], index=False)
+    con = duckdb.connect()
+    memory_limit = con.sql("select current_setting('memory_limit')").fetchone()[0]
+
+    assert ingest_raw_files(con, raw_files, max_memory="256MB") == list(raw_files)
+    assert {column_type for _, column_type, *_ in con.sql("describe pretalx_sessions").fetchall()} == {"VARCHAR"}
+    assert con.sql('select ID, "Speaker IDs", Duration from pretalx_sessions').fetchall() == [
+        ("007", "1\n2", "30"),
+        ("12", "3", "45"),
+    ]
+    assert con.sql("select current_setting('memory_limit')").fetchone()[0] == memory_limit
+
+    preview = preview_table(con, "pretalx_sessions", n=1)
+    assert preview["n_rows"] == 2
+    assert preview["non_null"] == {"ID": 2, "Speaker IDs": 2, "Track": 2, "Duration": 2}
+    assert preview["head"].ID.tolist() == ["007"]
+
+    pd.DataFrame({"name": ["Machine Learning"]}).to_csv(raw_files["tracks"], index=False)
+    with pytest.raises(ValueError, match="track_id"):
+        ingest_raw_files(con, raw_files)
@@ -0,0 +1,51 @@
+import numpy as np
+import pytest
+
+from assign_reviews import solve_milp
+from sweep import expand_grid, sweep
+from synthetic import generate_conference
+
+
+def test_expand_grid():
+    base = {"min_reviews": 3, "max_reviews": 9, "min_reviewers": 2, "max_reviewers": 4, "tutorial_coeff": 0.8}
+    points = expand_grid({"min_reviews": [0, 1], "tutorial_coeff": [0.5, 0.8]}, base=base)
+    assert [(point["min_reviews"], point["tutorial_coeff"]) for point in points] == [
+        (0, 0.5),
+        (0, 0.8),
+        (1, 0.5),
+        (1, 0.8),
+    ]
+    assert all(point["max_reviews"] == 9 for point in points)
+    with pytest.raises(ValueError, match="No value"):
+        expand_grid({"min_reviews": [0]})
+    with pytest.raises(ValueError, match="Unknown"):
+        expand_grid({"min_review": [0]}, base=base)
+
+
+@pytest.mark.parametrize("n_jobs", [1, 2])
+def test_sweep(n_jobs):
+    df_reviewers, df_submissions = generate_conference(0.2, seed=2)
+    grid = {"min_reviews": [0, 2, 40], "max_reviewers": [3, 4], "tutorial_coeff": [0.5]}
+
+    table = sweep(df_reviewers, df_submissions, grid, stage="talks", engine="flow", n_jobs=n_jobs)
+
+    assert len(table) == 6
+    assert (table.min_reviewers == 2).all() and (table.max_reviews == 9).all()
+    # Nobody has 40 eligible submissions
+    assert not table.feasible[table.min_reviews == 40].any()
+    assert table.feasible[table.min_reviews == 0].all()
+    assert (table.seconds > 0).all()
+
+    point = table[table.feasible].iloc[-1]
+    solution = solve_milp(
+        df_reviewers,
+        df_submissions,
+        *point[["min_reviews", "max_reviews", "min_reviewers", "max_reviewers"]],
+        0.5,
+        False,
+    )
+    assert point.objective == pytest.approx(
+        -np.where(df_submissions.track == "TUT", 0.5, 1.0)[solution.nonzero()[1]].sum()
+    )
+    assert point.n_reviews == solution.sum()
+    assert point.coverage == pytest.approx(solution.sum() / (len(df_submissions) * point.max_reviewers))
@@ -0,0 +1,36 @@
+import numpy as np
+import pandas as pd
+
+from assign_reviews import create_lb_ub
+from synthetic import BASE_REVIEWERS, BASE_SUBMISSIONS, TUTORIAL_TRACK, generate_conference
+
+
+def test_generate_conference_is_seeded():
+    df_reviewers, df_submissions = generate_conference(0.5, seed=3)
+    other_reviewers, other_submissions = generate_conference(0.5, seed=3)
+
+    pd.testing.assert_frame_equal(df_reviewers, other_reviewers)
+    pd.testing.assert_frame_equal(df_submissions, other_submissions)
+    assert not generate_conference(0.5, seed=4)[1].equals(df_submissions)
+
+
+def test_generate_conference_shape():
+    df_reviewers, df_submissions = generate_conference(2)
+
+    assert len(df_reviewers) == 2 * BASE_REVIEWERS
+    assert len(df_submissions) == 2 * BASE_SUBMISSIONS
+    assert list(df_reviewers.columns) == [
+        "reviewer_id",
+        "tracks",
+        "conflicts_submission_ids",
+        "assigned_submission_ids",
+    ]
+    assert list(df_submissions.columns) == ["submission_id", "author_ids", "track", "assigned_reviewer_ids"]
+    assert df_submissions.submission_id.is_unique and df_reviewers.reviewer_id.is_unique
+    assert (df_submissions.track == TUTORIAL_TRACK).any()
+
+    # Conflicts point at real submissions, and most submissions have someone who can review them
+    submission_ids = set(df_submissions.submission_id)
+    assert all(set(conflicts) <= submission_ids for conflicts in df_reviewers.conflicts_submission_ids)
+    _, ub = create_lb_ub(df_reviewers.to_dict("records"), df_submissions.to_dict("records"), False)
+    assert np.mean(ub.sum(axis=0) > 0) > 0.9
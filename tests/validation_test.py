@@ -0,0 +1,61 @@
+import numpy as np
+import pandas as pd
+
+from assign_reviews import solve_milp
+from entities import intern_entities
+from pipeline import STAGES, final_limits
+from synthetic import generate_conference
+from validation import describe_violations, validate_assignments
+
+
+def test_validate_solution():
+    df_reviewers, df_submissions = generate_conference(0.3, seed=2)
+    df_submissions = df_submissions[df_submissions.track != "TUT"].reset_index(drop=True)
+    solution = solve_milp(df_reviewers, df_submissions, 0, 9, 2, 4, 0.8, False, engine="flow")
+    entities = intern_entities(df_reviewers, df_submissions)
+    assignments = {
+        reviewer_id: df_submissions.submission_id[row].tolist()
+        for reviewer_id, row in zip(df_reviewers.reviewer_id, solution)
+    }
+
+    report = validate_assignments(entities, assignments, 0, 9, 2, 4)
+    assert report["valid"], describe_violations(report)
+    assert report["n_pairs"] == solution.sum()
+
+
+def test_validate_violations():
+    df_reviewers = pd.DataFrame(
+        {
+            "reviewer_id": ["a@x.org", "b@x.org", "c@x.org"],
+            "tracks": [["ML"], ["ML", "VIS"], ["VIS"]],
+            "conflicts_submission_ids": [["S2"], [], []],
+        }
+    )
+    df_submissions = pd.DataFrame({"submission_id": ["S1", "S2", "S3"], "track": ["ML", "ML", "TUT"]})
+    entities = intern_entities(df_reviewers, df_submissions)
+    assignments = {"a@x.org": ["S1", "S2", "S1"], "b@x.org": ["S1", "S3"], "d@x.org": ["S2"], "c@x.org": ["S9"]}
+
+    report = validate_assignments(entities, assignments, 1, 2, np.array([1, 1, 0]), 1)
+    violations = report["violations"]
+    assert not report["valid"]
+    assert violations["unknown_reviewers"]["examples"] == ["d@x.org"]
+    assert violations["unknown_submissions"]["examples"] == ["S9"]
+    assert violations["duplicate_pairs"]["examples"] == ["a@x.org -> S1"]
+    assert violations["conflicts"]["examples"] == ["a@x.org -> S2"]
+    assert violations["out_of_track"]["examples"] == ["b@x.org -> S3"]
+    assert violations["reviews_below_min"]["examples"] == ["c@x.org (0)"]
+    assert violations["reviews_above_max"]["examples"] == ["a@x.org (3)"]
+    assert violations["reviewers_above_max"]["examples"] == ["S1 (3)"]
+    assert "conflicts: 1 (a@x.org -> S2)" in describe_violations(report)
+
+    # Tutorials may go to anyone
+    report = validate_assignments(entities, {"b@x.org": ["S3"]}, 0, 1, 0, 1, assign_tutorials_to_anyone=True)
+    assert report["valid"]
+
+
+def test_final_limits():
+    min_reviews, max_reviews, min_reviewers, max_reviewers = final_limits(STAGES, [True, False], [True, False])
+    assert min_reviews.tolist() == [0, 5]
+    assert max_reviews.tolist() == [9, 9]
+    assert min_reviewers.tolist() == [3, 2]
+    assert max_reviewers.tolist() == [4, 4]
@@ -0,0 +1,121 @@
+# %%
+################
+## VALIDATION ##
+################
+# Checks of the final assignment of all steps together, in place of eyeballing group-by queries. The assigned
+# pairs become integer (reviewer, submission) coordinates over the interned entities of entities.py, and every
+# invariant is one vectorized test over them: no duplicate pairs, no conflicts of interest, no pairs outside
+# the reviewer's tracks (except tutorials when they go to anyone) and the number of reviews per reviewer and
+# of reviewers per submission within their limits.
+import numpy as np
+import pyarrow as pa
+import pyarrow.compute as pc
+
+from entities import in_track, is_tutorial
+
+# Number of offending reviewers, submissions or pairs named per check
+MAX_EXAMPLES = 5
+
+
+def assignment_coordinates(entities, assignments):
+    # Rows and columns of the pairs of assignments (reviewer ID -> submission IDs, like reviewer-assignments.json),
+    # duplicates included, and the reviewer and submission IDs that aren't in entities
+    reviewer_ids = pa.array(list(assignments), type=pa.string())
+    submission_ids = pa.array(list(assignments.values()), type=pa.list_(pa.string()))
+    reviewers = pc.index_in(reviewer_ids, value_set=pa.array(entities["reviewer_ids"], type=pa.string()))
+    parents = pc.list_parent_indices(submission_ids)
+    flat = pc.list_flatten(submission_ids)
+    submissions = pc.index_in(flat, value_set=pa.array(entities["submission_ids"], type=pa.string()))
+    rows = pc.take(reviewers, parents)
+
+    found = pc.and_(pc.is_valid(rows), pc.is_valid(submissions))
+    unknown = (
+        reviewer_ids.filter(pc.is_null(reviewers)).to_pylist(),
+        pc.unique(flat.filter(pc.is_null(submissions))).to_pylist(),
+    )
+    return (
+        rows.filter(found).to_numpy().astype(np.intp),
+        submissions.filter(found).to_numpy().astype(np.intp),
+        unknown,
+    )
+
+
+def _violation(count, examples):
+    return dict(count=int(count), examples=[str(example) for example in examples[:MAX_EXAMPLES]])
+
+
+def _count_violations(counts, minimum, maximum, ids):
+    # Entities with fewer than minimum or more than maximum pairs, as "ID (count)"
+    minimum = np.broadcast_to(minimum, counts.shape)
+    maximum = np.broadcast_to(maximum, counts.shape)
+    violations = {}
+    for name, outside in [("below_min", counts < minimum), ("above_max", counts > maximum)]:
+        if outside.any():
+            (index,) = np.nonzero(outside)
+            violations[name] = _violation(len(index), [f"{ids[i]} ({counts[i]})" for i in index[:MAX_EXAMPLES]])
+    return violations
+
+
+def validate_assignments(
+    entities,
+    assignments,
+    min_reviews,
+    max_reviews,
+    min_reviewers,
+    max_reviewers,
+    assign_tutorials_to_anyone=False,
+):
+    # entities from intern_entities for every reviewer and submission, assignments maps reviewer IDs to the
+    # submission IDs of all steps. The limits are scalars or arrays in the order of the entities. Returns a
+    # report with "valid" and, per failed check, the number of violations and a few examples.
+    reviewer_ids, submission_ids = entities["reviewer_ids"], entities["submission_ids"]
+    n_reviewers, n_submissions = len(reviewer_ids), len(submission_ids)
+    rows, cols, (unknown_reviewers, unknown_submissions) = assignment_coordinates(entities, assignments)
+
+    def pairs(mask):
+        return [f"{reviewer_ids[i]} -> {submission_ids[j]}" for i, j in zip(rows[mask][:MAX_EXAMPLES], cols[mask])]
+
+    violations = {}
+    if unknown_reviewers:
+        violations["unknown_reviewers"] = _violation(len(unknown_reviewers), unknown_reviewers)
+    if unknown_submissions:
+        violations["unknown_submissions"] = _violation(len(unknown_submissions), unknown_submissions)
+
+    # Pairs as one integer key, so duplicates and conflicts are a sort and a search away
+    keys = rows.astype(np.int64) * n_submissions + cols
+    order = np.argsort(keys, kind="stable")
+    duplicate = np.zeros(len(keys), dtype=bool)
+    duplicate[order[1:]] = keys[order[1:]] == keys[order[:-1]]
+    if duplicate.any():
+        violations["duplicate_pairs"] = _violation(duplicate.sum(), pairs(duplicate))
+
+    conflict_rows, conflict_cols = entities["conflicts"].nonzero()
+    conflict = np.isin(keys, conflict_rows.astype(np.int64) * n_submissions + conflict_cols)
+    if conflict.any():
+        violations["conflicts"] = _violation(conflict.sum(), pairs(conflict))
+
+    allowed = in_track(entities, rows, cols)
+    if assign_tutorials_to_anyone:
+        allowed |= is_tutorial(entities)[cols]
+    if not allowed.all():
+        violations["out_of_track"] = _violation((~allowed).sum(), pairs(~allowed))
+
+    reviews = np.bincount(rows, minlength=n_reviewers)
+    for name, violation in _count_violations(reviews, min_reviews, max_reviews, reviewer_ids).items():
+        violations[f"reviews_{name}"] = violation
+    reviewers = np.bincount(cols, minlength=n_submissions)
+    for name, violation in _count_violations(reviewers, min_reviewers, max_reviewers, submission_ids).items():
+        violations[f"reviewers_{name}"] = violation
+
+    return dict(valid=not violations, n_pairs=len(keys), violations=violations)
+
+
+def describe_violations(report):
+    # One line per failed check, e.g. "conflicts: 2 (a@x.org -> S1, b@x.org -> S7)"
+    if report["valid"]:
+        return f"assignment valid: {report['n_pairs']} pairs"
+    lines = [f"assignment invalid: {report['n_pairs']} pairs"]
+    for name, violation in report["violations"].items():
+        more = ", ..." if violation["count"] > len(violation["examples"]) else ""
+        lines.append(f"  {name}: {violation['count']} ({', '.join(violation['examples'])}{more})")
+    return "\n".join(lines)